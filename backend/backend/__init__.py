@@ -1,2 +0,0 @@
-import pymysql
-pymysql.install_as_MySQLdb()
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -20,8 +21,16 @@ INSTALLED_APPS = [
     "users",
 ]
 
+# CINEMA_ADMIN=0 (API-only worker pools): no django.contrib.admin, so no admin autodiscovery / registration
+# at boot and no admin/ URLs; keep it on wherever staff use /admin/
+CINEMA_ADMIN = os.environ.get("CINEMA_ADMIN", "1") != "0"
+if not CINEMA_ADMIN:
+    INSTALLED_APPS.remove("django.contrib.admin")
+
 
 MIDDLEWARE = [
+    "cinema.tracing.TracingMiddleware",
+    "cinema.traffic.TrafficCaptureMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -30,6 +39,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "cinema.tracing.TracedViewMiddleware",
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -67,6 +77,31 @@ DATABASES = {
     }
 }
 
+# horizontal sharding (cinema.sharding): Show / Booking / booking seats live on these aliases,
+# everything else on "default"; empty = unsharded. Add each shard to DATABASES and run
+# `migrate --database <alias>` for it. CINEMA_LOCAL_SHARDS=N runs the whole stack on
+# SQLite files (db.sqlite3 + shard0..N-1.sqlite3) for local testing.
+CINEMA_SHARDS = []
+DATABASE_ROUTERS = ["cinema.sharding.ShardRouter"]
+
+_local_shards = int(os.environ.get("CINEMA_LOCAL_SHARDS") or 0)
+if _local_shards:
+    DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db.sqlite3"}}
+    for _i in range(_local_shards):
+        DATABASES[f"shard{_i}"] = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"shard{_i}.sqlite3"}
+    CINEMA_SHARDS = [f"shard{_i}" for _i in range(_local_shards)]
+
+
+CACHES = {
+    "default": {
+        "BACKEND": "cinema.tracing.TracedCache",
+        "OPTIONS": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+}
+# with a per-process cache (LocMem, as above) a worker re-reads screen layout versions and show prices
+# this often, so edits made through another worker show up within it; unused with a shared backend
+CINEMA_LOCAL_VERSION_TTL_S = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -86,15 +121,90 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "cinema.authentication.TracedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "cinema.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "EXCEPTION_HANDLER": "cinema.degraded.exception_handler",
 }
 
+# "auto" uses orjson when installed, "json" forces the stdlib encoder
+CINEMA_JSON_BACKEND = "auto"
+
+# batch seat availability: hard cap on shows per request, "filling fast" threshold
+CINEMA_AVAILABILITY_MAX_SHOWS = 100
+CINEMA_FILLING_FAST_AT = 0.7
+
+# scheduling: minutes a screen needs between one show's end and the next start
+CINEMA_CLEANING_GAP_MIN = 15
+
+# archive_bookings: bookings of shows that started more than this many days ago move to ArchivedBooking
+CINEMA_ARCHIVE_AFTER_DAYS = 30
+
+# trending leaderboards: seats sold, halving every HALF_LIFE_S; readers reload every REFRESH_S;
+# a show is "selling fast" at a decayed score of SELLING_FAST_SCORE seats or more
+CINEMA_TRENDING_HALF_LIFE_S = 6 * 3600
+CINEMA_TRENDING_REFRESH_S = 30
+CINEMA_SELLING_FAST_SCORE = 10
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=24),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+
+# booking write path: "locking" (SELECT ... FOR UPDATE on the show) or "optimistic"
+# (lock-free read + UPDATE ... WHERE version = ?, retried with jittered backoff)
+CINEMA_BOOKING_MODE = "locking"
+CINEMA_BOOKING_CAS_RETRIES = 8
+
+# waitlist: seats freed by a cancellation are held for the next waiting user this long (then expire_holds
+# offers them onward); one request may queue up to WAITLIST_MAX_SEATS seats
+CINEMA_HOLD_MINUTES = 10
+CINEMA_WAITLIST_MAX_SEATS = 6
+
+# degraded mode: the breaker opens after FAILURES consecutive DB connection errors and probes again
+# after RESET_S; meanwhile reads use snapshots (refreshed at most every SNAPSHOT_EVERY_S) and bookings
+# go to a local queue under DEGRADED_DIR, replayed when the DB is back
+CINEMA_BREAKER_FAILURES = 5
+CINEMA_BREAKER_RESET_S = 10
+CINEMA_SNAPSHOT_EVERY_S = 30
+CINEMA_DEGRADED_DIR = BASE_DIR / "degraded"
+CINEMA_DEGRADED_AUTO_REPLAY = True
+
+# background tasks: modules that register handlers; EAGER runs them on commit in-process (dev/tests)
+CINEMA_TASK_MODULES = ("cinema.rollups", "cinema.catalog")
+CINEMA_TASKS_EAGER = False
+
+# catalog snapshots: the movie list and per-movie upcoming shows (with availability) as static, precompressed
+# JSON under CATALOG_DIR, served from CATALOG_URL by static hosting (Django serves it only with DEBUG);
+# Movie/Show changes queue a republish (AUTO_PUBLISH), the frontend trusts an entry for MAX_AGE_S
+CINEMA_CATALOG_DIR = BASE_DIR / "catalog"
+CINEMA_CATALOG_URL = "catalog/"
+CINEMA_CATALOG_MAX_AGE_S = 300
+CINEMA_CATALOG_AUTO_PUBLISH = True
+
+# tickets: rendered by a process pool into a content-addressed disk cache
+CINEMA_TICKET_DIR = BASE_DIR / "ticket_cache"
+CINEMA_TICKET_WORKERS = 2
+
+# tracing: opt-in, sampled; Chrome trace-event JSON in a size-rotated file
+CINEMA_TRACE_ENABLED = False
+CINEMA_TRACE_SAMPLE_RATE = 0.01
+CINEMA_TRACE_FILE = BASE_DIR / "traces" / "trace.json"
+CINEMA_TRACE_MAX_BYTES = 20 * 1024 * 1024
+CINEMA_TRACE_BACKUPS = 5
+
+# traffic capture for replay_traffic / compare_replays: sanitized JSON lines, size-rotated
+CINEMA_CAPTURE_ENABLED = False
+CINEMA_CAPTURE_SAMPLE_RATE = 1.0
+CINEMA_CAPTURE_EXCLUDE = ("/api/auth/",)
+CINEMA_CAPTURE_FILE = BASE_DIR / "traffic" / "capture.jsonl"
+CINEMA_CAPTURE_MAX_BYTES = 50 * 1024 * 1024
+CINEMA_CAPTURE_BACKUPS = 10
+CINEMA_CAPTURE_USER_BUCKETS = 64
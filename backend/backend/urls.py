@@ -1,16 +1,37 @@
-from django.contrib import admin
+from django.apps import apps
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.views.decorators.csrf import csrf_exempt
 
-urlpatterns = [
-    path("admin/", admin.site.urls),
+
+def token_view(name):
+    """simplejwt's token views, imported by the first token request instead of at URLconf load."""
+    view = None
+
+    @csrf_exempt
+    def lazy(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from rest_framework_simplejwt import views
+            view = getattr(views, name).as_view()
+        return view(request, *args, **kwargs)
+    return lazy
 
 
-    path("api/auth/token", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("api/auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair_slash"),
-    path("api/auth/token/refresh", TokenRefreshView.as_view(), name="token_refresh"),
-    path("api/auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh_slash"),
+urlpatterns = [
+    path("api/auth/token", token_view("TokenObtainPairView"), name="token_obtain_pair"),
+    path("api/auth/token/", token_view("TokenObtainPairView"), name="token_obtain_pair_slash"),
+    path("api/auth/token/refresh", token_view("TokenRefreshView"), name="token_refresh"),
+    path("api/auth/token/refresh/", token_view("TokenRefreshView"), name="token_refresh_slash"),
 
     path("api/users/", include("users.urls")),  
     path("api/cinema/", include("cinema.urls")),  
 ]
+
+if apps.is_installed("django.contrib.admin"):  # off with CINEMA_ADMIN=0
+    from django.contrib import admin
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
+
+# dev only (DEBUG): production serves the catalog snapshots from static hosting
+urlpatterns += static(settings.CINEMA_CATALOG_URL, document_root=settings.CINEMA_CATALOG_DIR)
@@ -1,8 +1,346 @@
 from django.contrib import admin
-from .models import Movie, Screen, Show, Seat, Booking
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.db import connections, router
+from django.db.models import Exists, F, OuterRef
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 
-admin.site.register(Movie)
-admin.site.register(Screen)
-admin.site.register(Show)
-admin.site.register(Seat)
-admin.site.register(Booking)
+from . import sharding
+from .models import ArchivedBooking, Movie, PriceZone, Screen, Show, Seat, Booking, WaitlistEntry
+
+
+# -------------------------------------------------------------------
+# cheap counts for big tables
+# -------------------------------------------------------------------
+def estimate_rows(model, using="default"):
+    """Planner/catalog row estimate for a table, or None if the backend has none."""
+    conn = connections[using]
+    table = model._meta.db_table
+    with conn.cursor() as cur:
+        if conn.vendor == "mysql":
+            cur.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])
+        elif conn.vendor == "postgresql":
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif conn.vendor == "sqlite":
+            # rowid upper bound; served from the b-tree, no scan
+            cur.execute(f'SELECT MAX(rowid) FROM "{table}"')
+        else:
+            return None
+        row = cur.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    # below this many rows an exact COUNT(*) is cheap enough
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        query = getattr(qs, "query", None)
+        if query is None or query.where:
+            return super().count
+        est = estimate_rows(qs.model, qs.db)
+        if est is None or est < self.threshold:
+            return super().count
+        return est
+
+
+class HighVolumeAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+# -------------------------------------------------------------------
+# sharded models (Show, Booking)
+# -------------------------------------------------------------------
+class ShardFilter(admin.SimpleListFilter):
+    """Which shard the changelist reads; there is no "all" (one query per page, one database)."""
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def queryset(self, request, queryset):
+        return queryset  # ShardedAdmin.get_queryset applies it
+
+    def choices(self, changelist):
+        current = self.value() if self.value() in sharding.shards() else sharding.shards()[0]
+        for alias in sharding.shards():
+            yield {"selected": alias == current, "display": alias,
+                   "query_string": changelist.get_query_string({self.parameter_name: alias})}
+
+
+class ShardedAdmin(HighVolumeAdmin):
+    """
+    Admin for a model that lives on the shards. With sharding on, the changelist reads one shard at a time
+    (ShardFilter, the first by default), an object opens on the shard its id names, relations to models on
+    "default" are prefetched rather than joined, and searches through them (remote_search: search field ->
+    (FK, lookup)) resolve the related ids on "default" first. Unsharded (or for the legacy unsharded copies
+    in users.admin) it is a plain HighVolumeAdmin.
+    """
+    shard_for = staticmethod(sharding.shard_for_show)
+    local_related = ()
+    remote_related = ()
+    remote_search = {}
+
+    def sharded(self):
+        return sharding.enabled() and sharding.is_sharded(self.model)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if not self.sharded():
+            return qs
+        alias = request.GET.get(ShardFilter.parameter_name)
+        alias = alias if alias in sharding.shards() else sharding.shards()[0]
+        return sharding.with_related(qs.using(alias), local=self.local_related, remote=self.remote_related)
+
+    def get_search_fields(self, request):
+        return getattr(request, "local_search_fields", None) or super().get_search_fields(request)
+
+    def get_list_select_related(self, request):
+        # () rather than False: False makes the changelist select_related() every FK in list_display
+        return () if self.sharded() else super().get_list_select_related(request)
+
+    def get_list_filter(self, request):
+        filters = tuple(super().get_list_filter(request))
+        return (ShardFilter,) + filters if self.sharded() else filters
+
+    def get_object(self, request, object_id, from_field=None):
+        if not self.sharded() or from_field is not None:
+            return super().get_object(request, object_id, from_field)
+        try:
+            pk = int(object_id)
+        except (TypeError, ValueError):
+            return None
+        return self.get_queryset(request).using(self.shard_for(pk)).filter(pk=pk).first()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not self.sharded() or not search_term or not self.remote_search:
+            return super().get_search_results(request, queryset, search_term)
+        local = [f for f in self.get_search_fields(request) if f not in self.remote_search]
+        found, duplicates = queryset.none(), False
+        if local:
+            request.local_search_fields = local
+            try:
+                found, duplicates = super().get_search_results(request, queryset, search_term)
+            finally:
+                del request.local_search_fields
+        for fk, lookup in self.remote_search.values():
+            related = self.model._meta.get_field(fk).related_model
+            ids = list(related._default_manager.filter(**{lookup: search_term}).values_list("pk", flat=True)[:1000])
+            found = found | queryset.filter(**{f"{fk}_id__in": ids})
+        return found, duplicates
+
+    def get_deleted_objects(self, objs, request):
+        if not self.sharded():
+            return super().get_deleted_objects(objs, request)
+        # Django's collector would look on "default"; the delete itself cascades on the row's shard
+        objs = list(objs)
+        perms = set() if self.has_delete_permission(request) else {self.model._meta.verbose_name}
+        return [str(o) for o in objs], {self.model._meta.verbose_name_plural: len(objs)}, perms, []
+
+
+# -------------------------------------------------------------------
+# catalog
+# -------------------------------------------------------------------
+@admin.register(Movie)
+class MovieAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "duration_min", "rating", "created_at")
+    search_fields = ("title",)
+
+
+class PriceZoneInline(admin.TabularInline):
+    model = PriceZone
+    extra = 0
+
+
+@admin.register(Screen)
+class ScreenAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "rows", "cols")
+    search_fields = ("name",)
+    inlines = (PriceZoneInline,)
+
+
+@admin.register(Show)
+class ShowAdmin(ShardedAdmin):
+    list_display = ("id", "movie", "screen", "start_time", "price", "price_multiplier", "seat_map_link")
+    list_select_related = ("movie", "screen")
+    remote_related = ("movie", "screen")
+    list_filter = ("screen",)
+    date_hierarchy = "start_time"
+    autocomplete_fields = ("movie", "screen")
+    search_fields = ("movie__title",)
+    remote_search = {"movie__title": ("movie", "title__icontains")}
+
+    @admin.display(description="Seat map")
+    def seat_map_link(self, obj):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return format_html('<a href="{}">view</a>', reverse("admin:%s_%s_seat_map" % info, args=[obj.pk]))
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path("<int:object_id>/seat-map/", self.admin_site.admin_view(self.seat_map_view),
+                 name="%s_%s_seat_map" % info),
+        ] + super().get_urls()
+
+    def seat_map_view(self, request, object_id):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            object_id = int(object_id)
+        except ValueError:
+            raise Http404
+        BookingModel = self.model._meta.get_field("bookings").related_model
+        SeatModel = BookingModel._meta.get_field("seats").related_model
+        MovieModel = self.model._meta.get_field("movie").related_model
+        alias = self.shard_for(object_id) if self.sharded() else router.db_for_read(self.model)
+        if {router.db_for_read(SeatModel), router.db_for_read(MovieModel)} == {alias}:
+            head, seats = self._seat_map_joined(alias, object_id, BookingModel, SeatModel)
+        else:
+            head, seats = self._seat_map_per_database(alias, object_id, BookingModel, SeatModel, MovieModel)
+
+        grid = {}
+        for s in seats:
+            grid.setdefault(s["row"], []).append(s)
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Seat map",
+            "object_id": object_id,
+            "movie_title": head["movie_title"],
+            "screen_name": head["screen_name"],
+            "show_start": head["show_start"],
+            "rows": [grid[r] for r in sorted(grid)],
+            "total": len(seats),
+            "taken": sum(1 for s in seats if s["taken"]),
+        }
+        return TemplateResponse(request, "admin/cinema/show/seat_map.html", context)
+
+    def _seat_map_joined(self, alias, object_id, BookingModel, SeatModel):
+        """Show, seats and movie on one database: one query (seats of the show's screen + show/movie columns)."""
+        Through = BookingModel.seats.through
+        taken = (Through.objects.filter(seat_id=OuterRef("pk"), booking__show_id=object_id)
+                 .exclude(booking__status=BookingModel.CANCELLED))
+        seats = list(
+            SeatModel.objects.using(alias).filter(screen__shows__id=object_id)
+            .annotate(
+                taken=Exists(taken),
+                screen_name=F("screen__name"),
+                show_start=F("screen__shows__start_time"),
+                movie_title=F("screen__shows__movie__title"),
+            )
+            .order_by("row", "col")
+            .values("id", "row", "col", "taken", "screen_name", "show_start", "movie_title")
+        )
+        if seats:
+            return seats[0], seats
+        # no rows: a screen without seats, or no such show (the only case that costs a second query)
+        show = (self.model._default_manager.using(alias).filter(pk=object_id)
+                .values("screen__name", "start_time", "movie__title").first())
+        if show is None:
+            raise Http404
+        return {"screen_name": show["screen__name"], "show_start": show["start_time"],
+                "movie_title": show["movie__title"]}, []
+
+    def _seat_map_per_database(self, alias, object_id, BookingModel, SeatModel, MovieModel):
+        """The show and its bookings on a shard, seats and movies on "default": a query per database."""
+        Through = BookingModel.seats.through
+        show = (self.model._default_manager.using(alias).filter(pk=object_id)
+                .values("screen_id", "movie_id", "start_time").first())
+        if show is None:
+            raise Http404
+        taken = set(Through.objects.using(alias).filter(booking__show_id=object_id)
+                    .exclude(booking__status=BookingModel.CANCELLED).values_list("seat_id", flat=True))
+        seats = list(
+            SeatModel.objects.filter(screen_id=show["screen_id"])
+            .annotate(screen_name=F("screen__name"))
+            .order_by("row", "col")
+            .values("id", "row", "col", "screen_name")
+        )
+        for seat in seats:
+            seat["taken"] = seat["id"] in taken
+        movie_title = MovieModel._default_manager.filter(pk=show["movie_id"]).values_list("title", flat=True).first()
+        return {"screen_name": seats[0]["screen_name"] if seats else None, "show_start": show["start_time"],
+                "movie_title": movie_title}, seats
+
+
+@admin.register(Seat)
+class SeatAdmin(HighVolumeAdmin):
+    list_display = ("id", "screen", "row", "col")
+    list_select_related = ("screen",)
+    list_filter = ("screen",)
+    search_fields = ("=id",)
+    autocomplete_fields = ("screen",)
+
+
+# -------------------------------------------------------------------
+# bookings
+# -------------------------------------------------------------------
+@admin.register(Booking)
+class BookingAdmin(ShardedAdmin):
+    list_display = ("id", "user", "show", "status", "total_amount", "created_at")
+    list_select_related = ("user", "show__movie")
+    shard_for = staticmethod(sharding.shard_for_booking)
+    local_related = ("show",)
+    remote_related = ("user", "show__movie")
+    list_filter = ("status",)
+    date_hierarchy = "created_at"
+    raw_id_fields = ("user", "show", "seats")
+    search_fields = ("=id", "=user__username")
+    remote_search = {"=user__username": ("user", "username")}
+
+    # sharded: a booking stays on its show's shard, and its seat rows are there while the seats are on
+    # "default" (no M2M join across them): show and seats are read-only, bookings are made through the API
+    def has_add_permission(self, request):
+        return not self.sharded() and super().has_add_permission(request)
+
+    def get_exclude(self, request, obj=None):
+        return ("seats",) if self.sharded() else super().get_exclude(request, obj)
+
+    def get_readonly_fields(self, request, obj=None):
+        fields = tuple(super().get_readonly_fields(request, obj))
+        return fields + ("show", "seat_list") if self.sharded() else fields
+
+    @admin.display(description="Seats")
+    def seat_list(self, obj):
+        Through = type(obj).seats.through
+        ids = Through.objects.using(obj._state.db).filter(booking_id=obj.pk).values_list("seat_id", flat=True)
+        SeatModel = type(obj)._meta.get_field("seats").related_model
+        return ", ".join(f"{r}-{c}" for r, c in SeatModel.objects.filter(id__in=list(ids))
+                         .order_by("row", "col").values_list("row", "col"))
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(HighVolumeAdmin):
+    list_display = ("id", "user", "show_id", "status", "booking_id", "created_at")
+    list_select_related = ("user",)
+    list_filter = ("status",)
+    raw_id_fields = ("user",)
+    search_fields = ("=show_id", "=user__username")
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(HighVolumeAdmin):
+    list_display = ("id", "user", "movie_title", "show_start_time", "status", "total_amount", "created_at")
+    list_select_related = ("user",)
+    list_filter = ("status",)
+    date_hierarchy = "created_at"
+    raw_id_fields = ("user",)
+    search_fields = ("=id", "=user__username")
+
+    # written only by archive_bookings
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CinemaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cinema'
+
+    def __init__(self, app_name, app_module):
+        super().__init__(app_name, app_module)
+        # MySQL goes through PyMySQL, imported only when an alias uses it. Not in ready(): every AppConfig
+        # is built before any models are imported, and importing models already loads the DB backend.
+        if any(db.get("ENGINE") == "django.db.backends.mysql" for db in settings.DATABASES.values()):
+            import pymysql
+            pymysql.install_as_MySQLdb()
+
+    def ready(self):
+        from . import sharding, signals  # noqa: F401
+        sharding.install_cascades()
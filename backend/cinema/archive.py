@@ -0,0 +1,138 @@
+# backend/cinema/archive.py
+"""
+Archival of bookings for shows that played more than CINEMA_ARCHIVE_AFTER_DAYS ago.
+
+Nothing operational reads those rows again (seat maps, conflict checks and the
+booking paths only look at upcoming shows), but every hot query pays for them
+in table and index size. archive_batch() moves up to `size` of them from one
+shard to ArchivedBooking on "default":
+
+    1. read the bookings + their seat rows (one query each) and the movie titles
+    2. bulk insert the archive rows, ignoring ids already there
+    3. delete the seat rows and bookings, in one transaction on the shard
+
+Step 2 commits before step 3, so a batch interrupted anywhere is redone
+harmlessly by the next run: the rows left on the shard are exactly what still
+needs moving, and there is no checkpoint to keep. Rollups (ShowStats and the
+day rows) are not touched; they already hold the history's totals.
+
+Reads stay transparent: history() returns archived bookings in the same order
+as the hot ones, and MyBookingsView merges the two.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from . import layout, sharding
+from .models import ArchivedBooking, Booking, Movie
+
+Through = Booking.seats.through
+
+
+def cutoff(days=None):
+    days = getattr(settings, "CINEMA_ARCHIVE_AFTER_DAYS", 30) if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def candidates(alias, before):
+    return Booking.objects.using(alias).filter(show__start_time__lt=before).order_by()
+
+
+def archive_batch(alias, before, size=1000):
+    """Move up to `size` bookings of shows that started before `before` off `alias`; returns how many."""
+    rows = list(candidates(alias, before).values_list(
+        "id", "user_id", "show_id", "show__movie_id", "show__screen_id", "show__start_time",
+        "total_amount", "status", "created_at")[:size])
+    if not rows:
+        return 0
+    ids = [r[0] for r in rows]
+    seats = {}
+    for booking_id, seat_id in Through.objects.using(alias).filter(booking_id__in=ids).values_list("booking_id",
+                                                                                                   "seat_id"):
+        seats.setdefault(booking_id, []).append(seat_id)
+    titles = dict(Movie.objects.filter(id__in={r[3] for r in rows}).values_list("id", "title"))
+
+    out = []
+    for bid, user_id, show_id, movie_id, screen_id, start, amount, status, created in rows:
+        mine = sorted(seats.get(bid, ()))
+        lay = layout.get_layout(screen_id)
+        idx = lay.indices_of(mine) if lay else []
+        out.append(ArchivedBooking(
+            id=bid, user_id=user_id, show_id=show_id, movie_id=movie_id, screen_id=screen_id,
+            movie_title=titles.get(movie_id, ""), show_start_time=start,
+            seat_ids=",".join(map(str, mine)), seat_number=",".join(str(i + 1) for i in sorted(idx)),
+            total_amount=amount, status=status, created_at=created,
+        ))
+    ArchivedBooking.objects.bulk_create(out, batch_size=1000, ignore_conflicts=True)
+
+    with transaction.atomic(using=alias):
+        Through.objects.using(alias).filter(booking_id__in=ids).delete()
+        Booking.objects.using(alias).filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive(days=None, size=1000, max_batches=None, progress=None):
+    """Run batches on every shard until nothing is left (or max_batches); returns {alias: moved}."""
+    before = cutoff(days)
+    moved = {}
+    for alias in sharding.all_aliases():
+        moved[alias] = batches = 0
+        while max_batches is None or batches < max_batches:
+            n = archive_batch(alias, before, size)
+            if not n:
+                break
+            moved[alias] += n
+            batches += 1
+            if progress:
+                progress(alias, moved[alias])
+    return moved
+
+
+# -------------------------------------------------------------------
+# reads
+# -------------------------------------------------------------------
+def history(user_id, limit):
+    """A user's archived bookings, newest first (same order as the hot ones)."""
+    return list(ArchivedBooking.objects.filter(user_id=user_id).order_by("-created_at", "-id")[:limit])
+
+
+# -------------------------------------------------------------------
+# size report
+# -------------------------------------------------------------------
+def _table_size(alias, model):
+    """(rows, bytes or None) of the model's table on `alias`."""
+    conn = connections[alias]
+    table = model._meta.db_table
+    rows = model.objects.using(alias).count()
+    size = None
+    with conn.cursor() as cur:
+        try:
+            if conn.vendor == "mysql":
+                cur.execute("SELECT DATA_LENGTH + INDEX_LENGTH FROM information_schema.TABLES "
+                            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [table])
+            elif conn.vendor == "sqlite":
+                # the table plus its indexes; needs SQLITE_ENABLE_DBSTAT_VTAB
+                cur.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                            [table, table])
+            else:
+                return rows, None
+            row = cur.fetchone()
+            size = int(row[0]) if row and row[0] is not None else None
+        except DatabaseError:
+            pass
+    return rows, size
+
+
+def table_sizes():
+    """{"<alias>.<table>": (rows, bytes or None)} for the hot tables on every shard and the archive table."""
+    out = {}
+    for alias in sharding.all_aliases():
+        for model in (Booking, Through):
+            out[f"{alias}.{model._meta.db_table}"] = _table_size(alias, model)
+    out[f"default.{ArchivedBooking._meta.db_table}"] = _table_size("default", ArchivedBooking)
+    return out
@@ -0,0 +1,243 @@
+# backend/cinema/audit.py
+"""
+Seat-integrity audit: proof that no seat was sold twice.
+
+The database pass splits every shard's shows into chunks of CHUNK_SHOWS ids
+and audits the chunks in a process pool (audit_seats --workers). A chunk is
+one query per shard that streams the live claims ordered by (show, seat):
+
+    SELECT show_id, seat_id, booking_id FROM booking_seats JOIN booking ...
+    WHERE show_id IN (chunk) AND status <> 'CANCELLED' ORDER BY show_id, seat_id
+
+so a duplicate is two neighbouring rows. Seats are checked against the show's
+screen layout (an in-memory index per screen), so memory stays bounded by one
+chunk's shows and their layouts, however many bookings there are. Findings:
+
+    duplicate_claim   two live bookings hold the same seat of a show
+    wrong_screen      a booking holds a seat of another screen
+    missing_seat      a booking holds a seat that no longer exists
+
+The file pass compares what lives outside the database with it:
+
+    queue_conflict    a degraded-mode queued booking whose seat is taken in the DB
+                      (the replay will reject it)
+    outcome_mismatch  a replay outcome says CONFIRMED but the booking is gone,
+                      cancelled, or holds another seat
+    file_missing      a claim from an exported / legacy bookings file that the DB
+                      does not have
+    file_other_user   ... that the DB has, for a different user
+
+Every kind is counted exactly; the examples listed are capped at MAX_ISSUES.
+"""
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.db import connections
+
+from . import degraded, importer, layout, sharding
+from .models import Booking, Seat, Show
+
+Through = Booking.seats.through
+
+CHUNK_SHOWS = 500
+STREAM_ROWS = 5000
+MAX_ISSUES = 1000
+
+KINDS = ("duplicate_claim", "wrong_screen", "missing_seat",
+         "queue_conflict", "outcome_mismatch", "file_missing", "file_other_user")
+
+
+class Report:
+    def __init__(self, max_issues=MAX_ISSUES):
+        self.max_issues = max_issues
+        self.counts = dict.fromkeys(KINDS, 0)
+        self.issues = {k: [] for k in KINDS}
+        self.shards = {}
+
+    def add(self, kind, **detail):
+        self.counts[kind] += 1
+        if len(self.issues[kind]) < self.max_issues:
+            self.issues[kind].append(detail)
+
+    def merge(self, part):
+        s = self.shards.setdefault(part["alias"], {"shows": 0, "claims": 0})
+        s["shows"] += part["shows"]
+        s["claims"] += part["claims"]
+        for kind, n in part["counts"].items():
+            self.counts[kind] += n
+            room = self.max_issues - len(self.issues[kind])
+            self.issues[kind].extend(part["issues"][kind][:max(room, 0)])
+
+    @property
+    def ok(self):
+        return not any(self.counts.values())
+
+    def as_dict(self, **extra):
+        return {**extra, "ok": self.ok, "shards": self.shards, "counts": self.counts,
+                "issues": {k: v for k, v in self.issues.items() if v}}
+
+
+# -------------------------------------------------------------------
+# database pass (runs in the worker processes)
+# -------------------------------------------------------------------
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:  # spawn / forkserver start methods
+        django.setup()
+
+
+def audit_chunk(alias, show_ids, max_issues=MAX_ISSUES):
+    """Audit the live claims of these shows (all on `alias`); returns a partial report as a plain dict."""
+    report = Report(max_issues)
+    screens = dict(Show.objects.using(alias).filter(id__in=show_ids).values_list("id", "screen_id"))
+    layouts = {sid: layout.get_layout(sid) for sid in set(screens.values())}
+    rows = (Through.objects.using(alias).filter(booking__show_id__in=show_ids)
+            .exclude(booking__status=Booking.CANCELLED)
+            .order_by("booking__show_id", "seat_id", "booking_id")
+            .values_list("booking__show_id", "seat_id", "booking_id").iterator(chunk_size=STREAM_ROWS))
+
+    claims, strangers = 0, []
+    prev_key, holders = None, []
+
+    def close_run():
+        if len(holders) > 1:
+            report.add("duplicate_claim", show_id=prev_key[0], seat_id=prev_key[1], booking_ids=list(holders))
+
+    for show_id, seat_id, booking_id in rows:
+        claims += 1
+        key = (show_id, seat_id)
+        if key != prev_key:
+            close_run()
+            prev_key, holders = key, []
+            lay = layouts.get(screens.get(show_id))
+            if lay is None or seat_id not in lay.index:
+                strangers.append((show_id, seat_id, booking_id))
+        holders.append(booking_id)
+    close_run()
+
+    if strangers:
+        seat_screens = dict(Seat.objects.filter(id__in={s for _, s, _ in strangers}).values_list("id", "screen_id"))
+        for show_id, seat_id, booking_id in strangers:
+            if seat_id in seat_screens:
+                report.add("wrong_screen", show_id=show_id, seat_id=seat_id, booking_id=booking_id,
+                           show_screen_id=screens.get(show_id), seat_screen_id=seat_screens[seat_id])
+            else:
+                report.add("missing_seat", show_id=show_id, seat_id=seat_id, booking_id=booking_id)
+    return {"alias": alias, "shows": len(show_ids), "claims": claims, "counts": report.counts,
+            "issues": report.issues}
+
+
+def show_chunks(alias, size=CHUNK_SHOWS):
+    # show ids only (a few bytes per show, however many bookings): read up front so no cursor is open across fork
+    ids = list(Show.objects.using(alias).order_by("id").values_list("id", flat=True))
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def audit_database(report, workers=0, chunk=CHUNK_SHOWS, progress=None):
+    """Run audit_chunk over every shard's shows; workers=0 runs in this process (tests, small data)."""
+    jobs = [(alias, ids) for alias in sharding.all_aliases() for ids in show_chunks(alias, chunk)]
+    if not workers:
+        for alias, ids in jobs:
+            report.merge(audit_chunk(alias, ids, report.max_issues))
+            if progress:
+                progress(report, len(jobs))
+        return report
+
+    connections.close_all()  # forked workers must not share the parent's sockets
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        running = set()
+        for alias, ids in jobs:
+            running.add(pool.submit(audit_chunk, alias, ids, report.max_issues))
+            if len(running) >= workers * 2:  # bounded: never more than this many partial reports pending
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for f in done:
+                    report.merge(f.result())
+                if progress:
+                    progress(report, len(jobs))
+        for f in wait(running).done:
+            report.merge(f.result())
+    return report
+
+
+# -------------------------------------------------------------------
+# file pass (main process)
+# -------------------------------------------------------------------
+def audit_queue(report):
+    """The degraded-mode queue and its replay outcomes against the database."""
+    pending = degraded.pending()
+    for part in importer.batched(pending, STREAM_ROWS):
+        live = layout.live_claims((e["show_id"], e["seat_id"]) for e in part)
+        for e in part:
+            hit = live.get((e["show_id"], e["seat_id"]))
+            if hit is not None:
+                report.add("queue_conflict", ref=e["ref"], show_id=e["show_id"], seat_id=e["seat_id"],
+                           user_id=e["user_id"], booking_id=hit[0])
+
+    confirmed = [o for o in degraded.outcomes() if o["outcome"] == degraded.CONFIRMED and o.get("booking_id")]
+    for part in importer.batched(confirmed, STREAM_ROWS):
+        found = {}
+        for alias, ids in _group_bookings([o["booking_id"] for o in part]).items():
+            for booking_id, seat_id, show_id, status in (
+                    Through.objects.using(alias).filter(booking_id__in=ids)
+                    .values_list("booking_id", "seat_id", "booking__show_id", "booking__status")):
+                found.setdefault(booking_id, []).append((seat_id, show_id, status))
+        for o in part:
+            rows = found.get(o["booking_id"], [])
+            if not any(seat == o["seat_id"] and show == o["show_id"] and st != Booking.CANCELLED
+                       for seat, show, st in rows):
+                report.add("outcome_mismatch", ref=o["ref"], booking_id=o["booking_id"], show_id=o["show_id"],
+                           seat_id=o["seat_id"], found=[{"seat_id": s, "show_id": sh, "status": st}
+                                                        for s, sh, st in rows])
+    return len(pending), len(confirmed)
+
+
+def _group_bookings(ids):
+    out = {}
+    for i in ids:
+        out.setdefault(sharding.shard_for_booking(i), []).append(i)
+    return out
+
+
+def _seat_of(claim, screens):
+    """Seat id of a file claim (seat_id, or seat_number through the show's layout), or None."""
+    if claim.get("seat_id") not in (None, ""):
+        return int(claim["seat_id"])
+    lay = layout.get_layout(screens.get(int(claim["show_id"])) or 0)
+    i = lay.index_of_number(claim.get("seat_number")) if lay is not None else None
+    return lay.seat_ids[i] if i is not None else None
+
+
+def audit_file(report, path):
+    """Claims recorded in a bookings file that the database should hold; returns how many were read."""
+    n = 0
+    for part in importer.batched(importer.read_rows(path), STREAM_ROWS):
+        n += len(part)
+        screens = layout.screens_for_shows(list({int(c["show_id"]) for c in part}))
+        resolved = [(c, int(c["show_id"]), _seat_of(c, screens)) for c in part]
+        live = layout.live_claims((show, seat) for _, show, seat in resolved if seat is not None)
+        for c, show_id, seat_id in resolved:
+            hit = live.get((show_id, seat_id)) if seat_id is not None else None
+            if hit is None:
+                report.add("file_missing", file=os.path.basename(path), show_id=show_id,
+                           seat_id=seat_id, seat_number=c.get("seat_number"))
+            elif c.get("user_id") not in (None, "") and str(c["user_id"]) != str(hit[1]):
+                report.add("file_other_user", file=os.path.basename(path), show_id=show_id, seat_id=seat_id,
+                           user_id=c["user_id"], db_user_id=hit[1], booking_id=hit[0])
+    return n
+
+
+def run(workers=0, files=(), queue=True, chunk=CHUNK_SHOWS, max_issues=MAX_ISSUES, progress=None):
+    t0 = time.time()
+    report = Report(max_issues)
+    audit_database(report, workers=workers, chunk=chunk, progress=progress)
+    sources = {}
+    if queue:
+        sources["queue"] = dict(zip(("pending", "confirmed_outcomes"), audit_queue(report)))
+    for path in files:
+        sources[path] = {"claims": audit_file(report, path)}
+    return report.as_dict(started_at=t0, elapsed_s=round(time.time() - t0, 3), workers=workers,
+                          chunk_shows=chunk, sources=sources)
@@ -0,0 +1,49 @@
+# backend/cinema/authentication.py
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+
+from . import degraded, tracing
+
+_jwt = None
+
+
+def _setting(name, default):
+    return getattr(settings, "SIMPLE_JWT", {}).get(name, default)
+
+
+def jwt():
+    """
+    The simplejwt authenticator, built on first use: simplejwt (and the django.test
+    import its settings module makes) loads with the first request carrying a token,
+    not while the URLconf loads.
+    """
+    global _jwt
+    if _jwt is None:
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.models import TokenUser
+
+        class DegradedJWTAuthentication(JWTAuthentication):
+            def get_user(self, validated_token):
+                # degraded mode: the signed token is enough to know who is asking (id only, no DB row)
+                try:
+                    with degraded.db_call():
+                        return super().get_user(validated_token)
+                except degraded.Unavailable:
+                    return TokenUser(validated_token)
+
+        _jwt = DegradedJWTAuthentication()
+    return _jwt
+
+
+class TracedJWTAuthentication(BaseAuthentication):
+    """simplejwt auth with a tracing span around token validation + user lookup."""
+
+    def authenticate(self, request):
+        if not request.META.get(_setting("AUTH_HEADER_NAME", "HTTP_AUTHORIZATION")):
+            return None  # as JWTAuthentication answers a request without the header
+        with tracing.span("auth.jwt", cat="auth"):
+            return jwt().authenticate(request)
+
+    def authenticate_header(self, request):
+        types = _setting("AUTH_HEADER_TYPES", ("Bearer",))
+        return f'{types if isinstance(types, str) else types[0]} realm="api"'
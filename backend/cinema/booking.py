@@ -0,0 +1,108 @@
+# backend/cinema/booking.py
+"""
+Seat booking write paths.
+
+"locking" (default): lock the show row with SELECT ... FOR UPDATE, re-check the
+seat, insert. Bookings for one show queue behind each other for the whole
+transaction.
+
+"optimistic": read the show's version and the seat's state without locks,
+then in a short transaction bump the version with
+UPDATE ... SET version = version + 1 WHERE id = ? AND version = ?; if that
+matched a row, nobody booked this show since our read and we insert the
+booking rows; otherwise retry with jittered backoff. The show row is held only
+for the UPDATE + two INSERTs.
+
+CINEMA_BOOKING_MODE picks the path per deployment. Both price the seat from
+the Show row they read (cinema.pricing); clients never send an amount.
+"""
+from __future__ import annotations
+
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import layout, pricing, sharding, tasks
+from .models import Booking, Show
+
+LOCKING = "locking"
+OPTIMISTIC = "optimistic"
+MODES = (LOCKING, OPTIMISTIC)
+
+
+class SeatTaken(Exception):
+    pass
+
+
+class Contention(Exception):
+    """Optimistic path gave up after CINEMA_BOOKING_CAS_RETRIES lost races."""
+
+
+def mode():
+    m = getattr(settings, "CINEMA_BOOKING_MODE", LOCKING)
+    return m if m in MODES else LOCKING
+
+
+def _seat_taken(db, show_id, seat_id):
+    Through = Booking.seats.through
+    return (Through.objects.using(db).filter(booking__show_id=show_id, seat_id=seat_id)
+            .exclude(booking__status=Booking.CANCELLED).exists())
+
+
+def _amount(lay, seat_id, price, multiplier):
+    return pricing.as_decimal(pricing.total(pricing.vector(lay, price, multiplier), lay.indices_of([seat_id])))
+
+
+def _insert(db, user, show_id, seat_id, amount):
+    b = Booking.objects.using(db).create(user=user, show_id=show_id, total_amount=amount)
+    Booking.seats.through.objects.using(db).create(booking_id=b.id, seat_id=seat_id)
+    tasks.enqueue("rollups.record_booking", using=db, show_id=show_id, seats=1, amount=str(b.total_amount),
+                  at=b.created_at.timestamp())
+    return b
+
+
+def book_locking(user, show_id, seat_id, lay=None):
+    """Lock the show row, re-check the seat, insert the booking + its seat row (all on the show's shard)."""
+    db = sharding.shard_for_show(show_id)
+    lay = lay or layout.layout_for_show(show_id)
+    with transaction.atomic(using=db):
+        show = Show.objects.using(db).select_for_update().only("id", "price", "price_multiplier").get(id=show_id)
+        if _seat_taken(db, show_id, seat_id):
+            raise SeatTaken
+        # keep the version moving so optimistic writers (e.g. mid-rollout) see this booking
+        Show.objects.using(db).filter(id=show_id).update(version=F("version") + 1)
+        return _insert(db, user, show_id, seat_id, _amount(lay, seat_id, show.price, show.price_multiplier))
+
+
+def backoff_seconds(attempt, base=0.002, cap=0.05):
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+def book_optimistic(user, show_id, seat_id, stats=None, lay=None):
+    db = sharding.shard_for_show(show_id)
+    lay = lay or layout.layout_for_show(show_id)
+    retries = getattr(settings, "CINEMA_BOOKING_CAS_RETRIES", 8)
+    for attempt in range(retries + 1):
+        row = Show.objects.using(db).filter(id=show_id).values_list("version", "price", "price_multiplier").first()
+        if row is None:
+            raise Show.DoesNotExist
+        version, price, multiplier = row
+        if _seat_taken(db, show_id, seat_id):
+            raise SeatTaken
+        with transaction.atomic(using=db):
+            if Show.objects.using(db).filter(id=show_id, version=version).update(version=F("version") + 1):
+                return _insert(db, user, show_id, seat_id, _amount(lay, seat_id, price, multiplier))
+        if stats is not None:
+            stats["retries"] = stats.get("retries", 0) + 1
+        time.sleep(backoff_seconds(attempt))
+    raise Contention
+
+
+def book(user, show_id, seat_id, stats=None, lay=None):
+    """`lay`: the show's ScreenLayout when the caller already has it (it prices the seat)."""
+    if mode() == OPTIMISTIC:
+        return book_optimistic(user, show_id, seat_id, stats=stats, lay=lay)
+    return book_locking(user, show_id, seat_id, lay=lay)
@@ -0,0 +1,219 @@
+# backend/cinema/cancellation.py
+"""
+Cancellation, seat release and the per-show waitlist.
+
+Cancelling never deletes anything: the bookings' status becomes CANCELLED in
+one UPDATE ... WHERE id IN (...), which is all it takes to free their seats
+(occupancy ignores cancelled bookings). release() is the single path for that,
+shared by a user's cancellation, a show called off and expired holds:
+
+    1. lock the bookings, read their seat rows                      O(released)
+    2. one UPDATE to CANCELLED, one version bump for their shows (optimistic
+       writers re-read)
+    3. rollups.record_release for those that were CONFIRMED (queued on commit)
+    4. offer the freed seats to the show's waitlist
+
+The waitlist holds one WaitlistEntry per wanted seat, served in id order.
+Offering k freed seats reads the first k WAITING entries through the
+(show_id, status, id) index and turns each one into a PENDING booking of one
+freed seat, held until now + CINEMA_HOLD_MINUTES. That is work in proportion to
+the freed seats, never to the show's bookings or the length of the queue. The
+holder confirms (confirm_hold); expire_holds() releases what was not confirmed
+in time, which offers those seats to the next in line.
+
+Entries live on "default" and bookings on the show's shard: both transactions
+are held together (as in scheduling.apply) and committed back to back.
+"""
+from __future__ import annotations
+
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import layout, pricing, sharding, tasks
+from .models import Booking, Show, WaitlistEntry
+
+Through = Booking.seats.through
+
+
+class SeatsAvailable(Exception):
+    """Joining a waitlist while the show still has the seats: book them instead."""
+
+
+class HoldExpired(Exception):
+    pass
+
+
+def hold_minutes():
+    return getattr(settings, "CINEMA_HOLD_MINUTES", 10)
+
+
+def _atomic(alias):
+    stack = ExitStack()
+    for a in sorted({alias, "default"}):
+        stack.enter_context(transaction.atomic(using=a))
+    return stack
+
+
+def _result(cancelled=0, released=0, offered=0):
+    return {"cancelled": cancelled, "released": released, "offered": offered}
+
+
+# -------------------------------------------------------------------
+# release (call inside _atomic(alias))
+# -------------------------------------------------------------------
+def release(alias, qs, offer=True, hold_status=WaitlistEntry.EXPIRED, now=None):
+    """Cancel the not-yet-cancelled bookings of `qs` (on `alias`) and offer their seats to the waitlist."""
+    now = now or timezone.now()
+    rows = list(qs.select_for_update().exclude(status=Booking.CANCELLED).order_by()
+                .values_list("id", "show_id", "status", "total_amount", "created_at"))
+    if not rows:
+        return _result()
+    ids = [r[0] for r in rows]
+    seats = {}
+    for booking_id, seat_id in Through.objects.using(alias).filter(booking_id__in=ids).values_list(
+            "booking_id", "seat_id"):
+        seats.setdefault(booking_id, []).append(seat_id)
+
+    Booking.objects.using(alias).filter(id__in=ids).update(status=Booking.CANCELLED, hold_until=None)
+    Show.objects.using(alias).filter(id__in={r[1] for r in rows}).update(version=F("version") + 1)
+    for booking_id, show_id, status, amount, created in rows:
+        if status == Booking.CONFIRMED:
+            tasks.enqueue("rollups.record_release", using=alias, show_id=show_id,
+                          seats=len(seats.get(booking_id, ())), amount=str(amount), at=created.timestamp())
+    held = [r[0] for r in rows if r[2] == Booking.PENDING]
+    if held:
+        WaitlistEntry.objects.filter(booking_id__in=held, status=WaitlistEntry.OFFERED).update(status=hold_status)
+
+    offered = 0
+    if offer:
+        freed = {}
+        for booking_id, show_id, *_ in rows:
+            freed.setdefault(show_id, []).extend(seats.get(booking_id, ()))
+        offered = _offer(alias, freed, now)
+    return _result(len(rows), sum(len(s) for s in seats.values()), offered)
+
+
+def _offer(alias, freed, now):
+    """Hold freed seats ({show_id: [seat_id]}) for the first waiting entries of each show; returns holds made."""
+    shows = {i: rest for i, *rest in Show.objects.using(alias).filter(id__in=list(freed), start_time__gt=now)
+             .order_by().values_list("id", "screen_id", "price", "price_multiplier")}
+    until = now + timedelta(minutes=hold_minutes())
+    made = 0
+    for show_id, (screen_id, price, multiplier) in shows.items():
+        seat_ids = sorted(freed[show_id])
+        entries = list(WaitlistEntry.objects.select_for_update()
+                       .filter(show_id=show_id, status=WaitlistEntry.WAITING).order_by("id")[:len(seat_ids)])
+        if not entries:
+            continue
+        lay = layout.get_layout(screen_id)
+        vec = pricing.vector(lay, price, multiplier)
+        rows = []
+        for entry, seat_id in zip(entries, seat_ids):
+            b = Booking.objects.using(alias).create(
+                user_id=entry.user_id, show_id=show_id, status=Booking.PENDING, hold_until=until,
+                total_amount=pricing.as_decimal(pricing.total(vec, lay.indices_of([seat_id]))),
+            )
+            rows.append(Through(booking_id=b.id, seat_id=seat_id))
+            entry.status, entry.booking_id = WaitlistEntry.OFFERED, b.id
+        Through.objects.using(alias).bulk_create(rows)
+        WaitlistEntry.objects.bulk_update(entries, ["status", "booking_id"])
+        made += len(entries)
+    return made
+
+
+# -------------------------------------------------------------------
+# cancellation
+# -------------------------------------------------------------------
+def cancel_booking(user, booking_id):
+    """One booking (the user's own, or any for staff); a declined hold is cancelled the same way."""
+    alias = sharding.shard_for_booking(booking_id)
+    qs = Booking.objects.using(alias).filter(id=booking_id)
+    if not user.is_staff:
+        qs = qs.filter(user_id=user.id)
+    with _atomic(alias):
+        return release(alias, qs, hold_status=WaitlistEntry.CANCELLED)
+
+
+def cancel_show(user, show_id, everyone=False):
+    """
+    All of the user's bookings for a show; with everyone=True (staff) every booking of the show, which
+    calls the show off: nothing is offered and its waitlist is closed.
+    """
+    alias = sharding.shard_for_show(show_id)
+    qs = Booking.objects.using(alias).filter(show_id=show_id)
+    if not everyone:
+        qs = qs.filter(user_id=user.id)
+    with _atomic(alias):
+        out = release(alias, qs, offer=not everyone, hold_status=WaitlistEntry.CANCELLED)
+        if everyone:
+            WaitlistEntry.objects.filter(show_id=show_id, status=WaitlistEntry.WAITING).update(
+                status=WaitlistEntry.CANCELLED)
+    return out
+
+
+# -------------------------------------------------------------------
+# waitlist
+# -------------------------------------------------------------------
+def join(user, show_id, seats=1):
+    """Queue `seats` entries for a sold-out show; returns {"position", "waiting"} (1-based, first entry)."""
+    alias = sharding.shard_for_show(show_id)
+    row = Show.objects.using(alias).filter(id=show_id).values_list("screen_id", "start_time").first()
+    if row is None:
+        raise Show.DoesNotExist
+    if row[1] <= timezone.now():
+        raise ValueError("show has started")
+    lay = layout.get_layout(row[0])
+    if len(lay) - layout.taken_seat_ids(show_id).count() >= seats:
+        raise SeatsAvailable
+    WaitlistEntry.objects.bulk_create([WaitlistEntry(user=user, show_id=show_id) for _ in range(seats)])
+    waiting = WaitlistEntry.objects.filter(show_id=show_id, status=WaitlistEntry.WAITING).count()
+    return {"position": waiting - seats + 1, "waiting": waiting}
+
+
+def leave(user, show_id):
+    return WaitlistEntry.objects.filter(user=user, show_id=show_id, status=WaitlistEntry.WAITING).update(
+        status=WaitlistEntry.CANCELLED)
+
+
+def confirm_hold(user, booking_id, now=None):
+    """PENDING -> CONFIRMED while the hold lasts; returns the booking's amount. Raises HoldExpired after."""
+    now = now or timezone.now()
+    alias = sharding.shard_for_booking(booking_id)
+    with _atomic(alias):
+        row = (Booking.objects.using(alias).select_for_update().filter(id=booking_id, user_id=user.id)
+               .values_list("show_id", "status", "hold_until", "total_amount").first())
+        if row is None:
+            raise Booking.DoesNotExist
+        show_id, status, until, amount = row
+        if status == Booking.CONFIRMED:
+            return amount
+        if status != Booking.PENDING or until is None or until <= now:
+            raise HoldExpired
+        Booking.objects.using(alias).filter(id=booking_id).update(status=Booking.CONFIRMED, hold_until=None)
+        WaitlistEntry.objects.filter(booking_id=booking_id).update(status=WaitlistEntry.CONFIRMED)
+        tasks.enqueue("rollups.record_booking", using=alias, show_id=show_id,
+                      seats=Through.objects.using(alias).filter(booking_id=booking_id).count(),
+                      amount=str(amount), at=now.timestamp())
+    return amount
+
+
+def expire_holds(now=None, batch=500):
+    """Release holds past their time (offering the seats onward); returns {"expired", "offered"}."""
+    now = now or timezone.now()
+    out = {"expired": 0, "offered": 0}
+    for alias in sharding.all_aliases():
+        while True:
+            with _atomic(alias):
+                ids = list(Booking.objects.using(alias).filter(status=Booking.PENDING, hold_until__lte=now)
+                           .values_list("id", flat=True)[:batch])
+                if not ids:
+                    break
+                r = release(alias, Booking.objects.using(alias).filter(id__in=ids, status=Booking.PENDING), now=now)
+            out["expired"] += r["cancelled"]
+            out["offered"] += r["offered"]
+    return out
@@ -0,0 +1,235 @@
+# backend/cinema/catalog.py
+"""
+Static catalog snapshots: the movie list and each movie's upcoming shows (with
+availability) pre-rendered to JSON files that static hosting serves without
+touching Django.
+
+    CINEMA_CATALOG_DIR/
+        manifest.json                  {"version", "generated_at", "max_age_s",
+                                        "files": {key: {"path", "sha256", "bytes", "checked_at"}}}
+        movies.<sha256[:16]>.json      as GET movies/
+        shows-<movie>.<sha[:16]>.json  {"movie_id", "shows": [{"id", "start_time", "selling_fast",
+                                                               "availability": {...}}]}
+
+Every file is written next to .gz and (with the brotli package) .br copies,
+for gzip_static / brotli_static style hosting. Data files are named by their
+content hash, so they never change once written and can be cached for good;
+only manifest.json (small, revalidated) moves. A publish renders, hashes, and
+writes only the documents whose hash changed; the others just get a new
+checked_at. The frontend trusts an entry while checked_at is less than
+max_age_s (CINEMA_CATALOG_MAX_AGE_S) old by its own clock, and asks the API
+otherwise.
+
+Movie and Show saves / deletes (and scheduled batches) queue a catalog.refresh
+task for their movies, so the show lists follow the schedule within one task
+run. Availability moves with every booking and is refreshed by the periodic
+full pass (publish_catalog --every), which also removes deleted movies' files.
+Files no manifest references are deleted after KEEP_OLD_S, so a client that
+read the previous manifest can still fetch what it lists.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from . import layout, sharding, tasks, trending
+from .models import Movie, Show
+from .tasks import task
+
+try:
+    import brotli
+except ImportError:  # optional; gzip copies are always written
+    brotli = None
+
+try:  # POSIX: serialises publishers (task workers, cron) on the manifest
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+MANIFEST = "manifest.json"
+MOVIES = "movies"
+KEEP_OLD_S = 3600
+SUFFIXES = ("", ".gz", ".br")
+
+
+def catalog_dir():
+    path = str(getattr(settings, "CINEMA_CATALOG_DIR", os.path.join(settings.BASE_DIR, "catalog")))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def max_age():
+    return getattr(settings, "CINEMA_CATALOG_MAX_AGE_S", 300)
+
+
+def shows_key(movie_id):
+    return f"shows-{movie_id}"
+
+
+# -------------------------------------------------------------------
+# rendering
+# -------------------------------------------------------------------
+def movie_entry(m):
+    """One movie as GET movies/ lists it."""
+    return {
+        "id": m.id,
+        "title": getattr(m, "title", getattr(m, "name", f"Movie {m.id}")),
+        "language": getattr(m, "language", ""),
+        "certificate": getattr(m, "certificate", ""),
+        "poster_url": getattr(m, "poster_url", "") or f"https://picsum.photos/seed/{m.id}-poster/300/420",
+    }
+
+
+def render_shows(movie_ids, now):
+    """{movie_id: document} for these movies: upcoming shows by start time, one query per shard + counts."""
+    rows = sharding.merged(
+        lambda db: (Show.objects.using(db).filter(movie_id__in=movie_ids, start_time__gte=now)
+                    .order_by("start_time", "id").values_list("start_time", "id", "movie_id", "screen_id")),
+        key=lambda r: (r[0], r[1]))
+    taken = layout.taken_counts([r[1] for r in rows])
+    layouts = {sc: layout.get_layout(sc) for sc in {r[3] for r in rows}}
+    docs = {m: {"movie_id": m, "shows": []} for m in movie_ids}
+    for start, show_id, movie_id, screen_id in rows:
+        lay = layouts.get(screen_id)
+        docs[movie_id]["shows"].append({
+            "id": show_id, "start_time": start, "selling_fast": trending.selling_fast(show_id),
+            "availability": layout.availability(lay, taken.get(show_id, 0)) if lay is not None else None,
+        })
+    return docs
+
+
+def _encode(doc):
+    # canonical: equal documents hash equal, so an unchanged document is never rewritten
+    return json.dumps(doc, cls=DjangoJSONEncoder, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+# -------------------------------------------------------------------
+# files
+# -------------------------------------------------------------------
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write_variants(name, body):
+    path = os.path.join(catalog_dir(), name)
+    _write(path, body)
+    _write(path + ".gz", gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write(path + ".br", brotli.compress(body, quality=11))
+
+
+@contextmanager
+def _locked():
+    with open(os.path.join(catalog_dir(), ".lock"), "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_manifest():
+    try:
+        with open(os.path.join(catalog_dir(), MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read(key):
+    """The published document for `key` (tests, debugging), or None."""
+    entry = ((load_manifest() or {}).get("files") or {}).get(key)
+    if entry is None:
+        return None
+    with open(os.path.join(catalog_dir(), entry["path"]), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def prune(manifest, keep_s=KEEP_OLD_S):
+    """Delete data files the manifest no longer lists, once they are `keep_s` old; returns how many."""
+    live = {e["path"] + s for e in manifest["files"].values() for s in SUFFIXES}
+    cutoff = time.time() - keep_s
+    removed = 0
+    with os.scandir(catalog_dir()) as it:
+        for entry in it:
+            if (entry.is_file() and entry.name.endswith(tuple(".json" + s for s in SUFFIXES))
+                    and not entry.name.startswith(MANIFEST) and entry.name not in live
+                    and entry.stat().st_mtime < cutoff):
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+# -------------------------------------------------------------------
+# publishing
+# -------------------------------------------------------------------
+def publish(movie_ids=None, include_list=True, now=None, keep_s=KEEP_OLD_S):
+    """
+    Render and publish. movie_ids=None is a full pass (the list and every movie, dropping deleted movies);
+    otherwise only those movies' show lists (+ the movie list with include_list). Returns counts.
+    """
+    now = now or timezone.now()
+    docs = {}
+    if movie_ids is None:
+        movies = list(Movie.objects.order_by("id"))
+        existing = [m.id for m in movies]
+        docs[MOVIES] = [movie_entry(m) for m in movies]
+    else:
+        wanted = sorted(set(movie_ids))
+        existing = list(Movie.objects.filter(id__in=wanted).order_by("id").values_list("id", flat=True))
+        if include_list:
+            docs[MOVIES] = [movie_entry(m) for m in Movie.objects.order_by("id")]
+    for movie_id, doc in render_shows(existing, now).items():
+        docs[shows_key(movie_id)] = doc
+
+    with _locked():
+        manifest = load_manifest() or {"version": 0, "files": {}}
+        files = manifest["files"]
+        if movie_ids is None:
+            gone = [k for k in files if k.startswith("shows-") and k not in docs]
+        else:
+            gone = [shows_key(m) for m in wanted if m not in existing and shows_key(m) in files]
+        written = 0
+        for key, doc in docs.items():
+            body = _encode(doc)
+            digest = hashlib.sha256(body).hexdigest()
+            entry = files.get(key)
+            if entry is None or entry["sha256"] != digest:
+                entry = files[key] = {"path": f"{key}.{digest[:16]}.json", "sha256": digest, "bytes": len(body)}
+                _write_variants(entry["path"], body)
+                written += 1
+            entry["checked_at"] = now.timestamp()
+        for key in gone:
+            del files[key]
+        if written or gone:
+            manifest["version"] += 1
+        manifest.update(generated_at=now.timestamp(), max_age_s=max_age())
+        _write_variants(MANIFEST, _encode(manifest))
+        removed = prune(manifest, keep_s)
+    return {"version": manifest["version"], "rendered": len(docs), "written": written,
+            "unchanged": len(docs) - written, "dropped": len(gone), "removed_files": removed}
+
+
+@task("catalog.refresh")
+def refresh(movie_ids=(), movies=False):
+    publish(movie_ids, include_list=movies)
+
+
+def schedule_refresh(movie_ids, movies=False, using=None):
+    """Queue catalog.refresh for these movies once the surrounding transaction on `using` commits."""
+    if getattr(settings, "CINEMA_CATALOG_AUTO_PUBLISH", True):
+        tasks.enqueue("catalog.refresh", using=using, movie_ids=sorted(set(movie_ids)), movies=movies)
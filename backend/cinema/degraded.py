@@ -0,0 +1,519 @@
+# backend/cinema/degraded.py
+"""
+Degraded mode: what the API does while the database is unreachable.
+
+A per-process circuit breaker watches database calls. After
+CINEMA_BREAKER_FAILURES consecutive connection errors it opens: requests stop
+waiting on the database and fail fast. After CINEMA_BREAKER_RESET_S one
+request is let through as a probe; success closes the breaker, failure re-opens
+it. Only connection-level failures count (is_unreachable()). A lock-wait
+timeout or deadlock means the database answered and the row is busy: it is
+raised as booking.Contention (503, retry) and leaves the breaker alone.
+
+While it is open:
+  * catalog and seat-map reads are answered from last-known-good snapshots,
+    written to CINEMA_DEGRADED_DIR/snapshots by the normal read paths (at most
+    once per CINEMA_SNAPSHOT_EVERY_S per key), with an X-Cinema-Degraded header;
+  * bookings are checked against the seat-map snapshot and the other queued
+    bookings, then appended (fsync'd) to a local queue and answered with 202;
+  * anything else answers 503 with Retry-After.
+
+When the breaker closes, replay() books the queued entries in the order they
+were accepted. The database wins conflicts: a seat somebody booked meanwhile
+rejects the queued entry (unless the same user already holds it, e.g. after
+an interrupted replay). Every outcome is appended to outcomes.jsonl, which
+also makes the replay safe to resume.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import InterfaceError, OperationalError, connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import booking, layout, sharding
+from .models import Booking, Show
+
+try:  # POSIX: lets several worker processes share one queue file
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# what the drivers raise for connection problems; constraint / programming errors say nothing about DB health.
+# Busy rows land here too, so is_lock_error() / is_unreachable() sort them out.
+DB_ERRORS = (OperationalError, InterfaceError)
+# busy, not down: MySQL lock-wait timeout / deadlock, PostgreSQL serialization failure / deadlock /
+# lock_not_available, a locked SQLite file
+LOCK_ERRNOS = frozenset({1205, 1213})
+LOCK_SQLSTATES = frozenset({"40001", "40P01", "55P03"})
+LOCK_MESSAGES = ("database is locked", "database table is locked", "deadlock", "lock wait timeout",
+                 "could not obtain lock")
+# down: MySQL too many connections, server shutdown, client can't connect / gone away / lost connection
+UNREACHABLE_ERRNOS = frozenset({1040, 1053, 2002, 2003, 2005, 2006, 2013, 2055})
+UNREACHABLE_MESSAGES = ("gone away", "lost connection", "can't connect", "could not connect", "connection refused",
+                        "server closed the connection", "connection already closed", "terminating connection",
+                        "unable to open database file")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Unavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Database unavailable, please retry shortly."
+    default_code = "db_unavailable"
+
+
+# -------------------------------------------------------------------
+# circuit breaker
+# -------------------------------------------------------------------
+def _errno(exc):
+    # MySQLdb / PyMySQL put the error number first; Django re-raises with the driver's error as __cause__
+    for e in (exc, exc.__cause__):
+        if e is not None and e.args and isinstance(e.args[0], int):
+            return e.args[0]
+    return None
+
+
+def _sqlstate(exc):
+    cause = exc.__cause__
+    return getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+
+
+def is_lock_error(exc):
+    """A lock-wait timeout or deadlock: the database answered, the rows were busy."""
+    if not isinstance(exc, OperationalError):
+        return False
+    return (_errno(exc) in LOCK_ERRNOS or _sqlstate(exc) in LOCK_SQLSTATES
+            or any(m in str(exc).lower() for m in LOCK_MESSAGES))
+
+
+def is_unreachable(exc):
+    """A connection-level failure, the only kind that counts against the breaker."""
+    if isinstance(exc, InterfaceError):
+        return True
+    if not isinstance(exc, OperationalError) or is_lock_error(exc):
+        return False
+    code = _errno(exc)
+    if code is not None:
+        return code in UNREACHABLE_ERRNOS
+    if any(m in str(exc).lower() for m in UNREACHABLE_MESSAGES):
+        return True
+    # no number, no known wording: ask the open connections (MySQL / PostgreSQL ping; SQLite is always usable)
+    return not all(c.is_usable() for c in connections.all(initialized_only=True) if c.connection is not None)
+
+
+class Busy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Busy, please retry."
+    default_code = "busy"
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+        self.last_error = ""
+        self.trips = 0
+
+    def allow(self):
+        """May this request use the database? In half-open state only one probe at a time is let through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            reset_s = _setting("CINEMA_BREAKER_RESET_S", 10)
+            if self.state == OPEN and now - self.opened_at >= reset_s:
+                self.state = HALF_OPEN
+                self.probe_at = now
+                return True
+            if self.state == HALF_OPEN and now - self.probe_at >= reset_s:
+                self.probe_at = now  # the last probe never reported back
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            recovered = self.state != CLOSED
+            self.state, self.failures, self.opened_at = CLOSED, 0, None
+        if recovered:
+            log.warning("database reachable again, circuit closed")
+            _on_recovery()
+
+    def failure(self, exc=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = repr(exc)[:300] if exc is not None else ""
+            if self.state == HALF_OPEN or self.failures >= _setting("CINEMA_BREAKER_FAILURES", 5):
+                if self.state != OPEN:
+                    self.trips += 1
+                    log.warning("database unreachable, circuit open: %s", self.last_error)
+                self.state, self.opened_at = OPEN, time.monotonic()
+
+    def trip(self, reason="forced"):
+        with self._lock:
+            self.state, self.opened_at, self.last_error = OPEN, time.monotonic(), reason
+            self.trips += 1
+
+    def snapshot(self):
+        with self._lock:
+            out = {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips,
+                   "last_error": self.last_error}
+            if self.opened_at is not None:
+                out["open_for_s"] = round(time.monotonic() - self.opened_at, 1)
+            return out
+
+
+breaker = CircuitBreaker()
+
+
+@contextmanager
+def db_call():
+    """
+    Run a block of database work under the breaker; raises Unavailable when open or on connection errors,
+    booking.Contention on lock-wait timeouts / deadlocks.
+    """
+    if not breaker.allow():
+        raise Unavailable()
+    try:
+        yield
+    except DB_ERRORS as exc:
+        if is_unreachable(exc):
+            breaker.failure(exc)
+            raise Unavailable() from exc
+        breaker.success()
+        if is_lock_error(exc):
+            raise booking.Contention() from exc
+        raise
+    except BaseException:
+        breaker.success()  # the database answered; the error is the caller's (SeatTaken, Http404, ...)
+        raise
+    breaker.success()
+
+
+def exception_handler(exc, context):
+    """
+    REST_FRAMEWORK["EXCEPTION_HANDLER"]: connection errors from unguarded code also count and answer 503;
+    contention (lock errors included) answers 503 with a short Retry-After and does not count.
+    """
+    if isinstance(exc, booking.Contention) or is_lock_error(exc):
+        exc = Busy()
+    elif is_unreachable(exc):
+        breaker.failure(exc)
+        exc = Unavailable()
+    # rest_framework.views imports the authentication classes (and so this module) while loading
+    from rest_framework.views import exception_handler as drf_exception_handler
+    resp = drf_exception_handler(exc, context)
+    if resp is not None and isinstance(exc, Unavailable):
+        resp["Retry-After"] = str(_setting("CINEMA_BREAKER_RESET_S", 10))
+    elif resp is not None and isinstance(exc, Busy):
+        resp["Retry-After"] = "1"
+    return resp
+
+
+def mark(resp, saved_at):
+    """Tag a response served from a snapshot."""
+    resp["X-Cinema-Degraded"] = "snapshot"
+    resp["Age"] = str(max(0, int(time.time() - saved_at)))
+    return resp
+
+
+# -------------------------------------------------------------------
+# files
+# -------------------------------------------------------------------
+def _dir(*parts):
+    path = os.path.join(str(_setting("CINEMA_DEGRADED_DIR", os.path.join(settings.BASE_DIR, "degraded"))), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, cls=DjangoJSONEncoder)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _flock(path):
+    with open(path, "a+", encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _is_current(f, path):
+    try:
+        return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+_lines = {}   # path -> ((inode, size, mtime), parsed lines)
+
+
+def _read_lines(path):
+    """
+    The JSON lines of `path` ([] when missing). Parsed once per version of the file (inode, size, mtime), so
+    the read paths that merge the queue in (my bookings, health) cost a stat while nothing is queued or
+    replayed. Callers must not modify the returned list.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _lines.pop(path, None)
+        return []
+    stamp = (st.st_ino, st.st_size, st.st_mtime_ns)
+    hit = _lines.get(path)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+    _lines[path] = (stamp, lines)  # stamped before the read: a line appended meanwhile re-parses next time
+    return lines
+
+
+# -------------------------------------------------------------------
+# last-known-good snapshots
+# -------------------------------------------------------------------
+_snap_lock = threading.Lock()
+_snap_mem = {}       # key -> (saved_at, data)
+
+
+def save_snapshot(key, build):
+    """
+    Remember build() as the last good answer for `key`. Called on every good read but only builds and
+    writes when the copy is older than CINEMA_SNAPSHOT_EVERY_S, so the hot path is a dict lookup.
+    """
+    now = time.time()
+    hit = _snap_mem.get(key)
+    if hit is not None and now - hit[0] < _setting("CINEMA_SNAPSHOT_EVERY_S", 30):
+        return
+    data = build()
+    with _snap_lock:
+        _snap_mem[key] = (now, data)
+    try:
+        _write_atomic(os.path.join(_dir("snapshots"), f"{key}.json"), {"saved_at": now, "data": data})
+    except OSError as exc:
+        log.warning("snapshot %s not written: %s", key, exc)
+
+
+def load_snapshot(key):
+    """(saved_at, data) or None; this process's copy first, then the file another process may have written."""
+    hit = _snap_mem.get(key)
+    if hit is not None:
+        return hit
+    try:
+        with open(os.path.join(_dir("snapshots"), f"{key}.json"), "r", encoding="utf-8") as f:
+            doc = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return doc["saved_at"], doc["data"]
+
+
+def forget_snapshots():
+    _snap_mem.clear()
+
+
+# -------------------------------------------------------------------
+# durable write queue
+# -------------------------------------------------------------------
+QUEUED, CONFIRMED, REJECTED = "QUEUED", "CONFIRMED", "REJECTED"
+
+
+def _pending_path():
+    return os.path.join(_dir("queue"), "pending.jsonl")
+
+
+def _outcomes_path():
+    return os.path.join(_dir("queue"), "outcomes.jsonl")
+
+
+def _batches():
+    d = _dir("queue")
+    return sorted(os.path.join(d, n) for n in os.listdir(d) if n.startswith("replaying-"))
+
+
+def pending(show_id=None, user_id=None):
+    """Queued (not yet replayed) bookings, oldest first."""
+    out = []
+    for path in [*_batches(), _pending_path()]:
+        for e in _read_lines(path):
+            if (show_id is None or e["show_id"] == show_id) and (user_id is None or e["user_id"] == str(user_id)):
+                out.append(e)
+    if out:
+        done = {o["ref"] for o in _read_lines(_outcomes_path())}
+        out = [e for e in out if e["ref"] not in done]
+    return out
+
+
+def outcomes():
+    """Replay outcomes still on file (kept CINEMA_DEGRADED_OUTCOMES_TTL_S)."""
+    return list(_read_lines(_outcomes_path()))
+
+
+def rejected(user_id):
+    return [o for o in _read_lines(_outcomes_path()) if o["user_id"] == str(user_id) and o["outcome"] == REJECTED]
+
+
+class SeatTaken(Exception):
+    pass
+
+
+def enqueue_booking(user_id, show_id, seat_number):
+    """
+    Accept a booking while the database is down. Validated against the show's seat-map snapshot and
+    everything already queued; raises LookupError (no snapshot), ValueError (unknown seat) or SeatTaken.
+    """
+    snap = load_snapshot(f"seats-{show_id}")
+    if snap is None:
+        raise LookupError("no seat map snapshot for this show")
+    seats = snap[1]
+    try:
+        i = int(seat_number) - 1
+    except (TypeError, ValueError):
+        i = -1
+    if not 0 <= i < len(seats["seat_ids"]):
+        raise ValueError("unknown seat")
+    if i in set(seats["taken"]):
+        raise SeatTaken
+
+    entry = {
+        # str: token users (degraded auth) carry the id as the JWT claim string
+        "ref": uuid.uuid4().hex, "user_id": str(user_id), "show_id": show_id, "seat_number": str(seat_number),
+        "seat_id": seats["seat_ids"][i], "queued_at": time.time(),
+    }
+    # check-and-append under the file lock so two processes can't queue the same seat
+    while True:
+        with _flock(_pending_path()) as f:
+            if not _is_current(f, _pending_path()):
+                continue  # replay() renamed the file while we waited for the lock
+            f.seek(0)
+            queued = [json.loads(line) for line in f if line.strip()]
+            queued += [e for b in _batches() for e in _read_lines(b)]
+            if any(e["show_id"] == show_id and e["seat_number"] == entry["seat_number"] for e in queued):
+                raise SeatTaken
+            f.seek(0, os.SEEK_END)
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            break
+    return entry
+
+
+def _on_recovery():
+    if _setting("CINEMA_DEGRADED_AUTO_REPLAY", True) and os.path.exists(_pending_path()):
+        threading.Thread(target=_replay_quietly, name="cinema-replay", daemon=True).start()
+
+
+def _replay_quietly():
+    try:
+        replay()
+    except Exception:  # logged; the next recovery or the command retries
+        log.exception("replaying the degraded-mode queue failed")
+    finally:
+        connections.close_all()
+
+
+_replay_lock = threading.Lock()
+
+
+def replay():
+    """Book every queued entry (oldest first); returns {"CONFIRMED": n, "REJECTED": n, "left": n}."""
+    counts = {CONFIRMED: 0, REJECTED: 0, "left": 0}
+    if not _replay_lock.acquire(blocking=False):
+        return counts
+    try:
+        with _flock(os.path.join(_dir("queue"), "replay.lock")):
+            if os.path.exists(_pending_path()):
+                with _flock(_pending_path()):
+                    os.replace(_pending_path(), os.path.join(_dir("queue"), f"replaying-{time.time_ns()}.jsonl"))
+            done = {o["ref"] for o in _read_lines(_outcomes_path())}
+            for batch in _batches():
+                entries = sorted(_read_lines(batch), key=lambda e: e["queued_at"])
+                for n, e in enumerate(entries):
+                    if e["ref"] in done:
+                        continue
+                    try:
+                        outcome = _replay_one(e)
+                    except (booking.Contention, *DB_ERRORS) as exc:
+                        if is_unreachable(exc):
+                            breaker.failure(exc)
+                        counts["left"] += len(entries) - n
+                        return counts
+                    counts[outcome["outcome"]] += 1
+                    with open(_outcomes_path(), "a", encoding="utf-8") as f:
+                        f.write(json.dumps(outcome, cls=DjangoJSONEncoder) + "\n")
+                os.remove(batch)
+            _prune_outcomes()
+        return counts
+    finally:
+        _replay_lock.release()
+
+
+def _replay_one(e):
+    def result(outcome, reason="", booking_id=None):
+        return {**e, "outcome": outcome, "reason": reason, "booking_id": booking_id, "replayed_at": time.time()}
+
+    user = get_user_model().objects.filter(pk=e["user_id"]).first()
+    if user is None:
+        return result(REJECTED, "unknown user")
+    lay = layout.layout_for_show(e["show_id"])
+    i = lay.index_of_number(e["seat_number"]) if lay is not None else None
+    if i is None:
+        return result(REJECTED, "unknown show or seat")
+    seat_id = lay.seat_ids[i]
+    try:
+        return result(CONFIRMED, booking_id=booking.book(user, e["show_id"], seat_id).id)
+    except booking.SeatTaken:
+        mine = (Booking.objects.using(sharding.shard_for_show(e["show_id"]))
+                .filter(show_id=e["show_id"], user_id=user.pk, seats__id=seat_id)
+                .exclude(status=Booking.CANCELLED).values_list("id", flat=True).first())
+        if mine is not None:
+            return result(CONFIRMED, "already booked by this user", booking_id=mine)
+        return result(REJECTED, "seat was booked by someone else while the system was degraded")
+    except Show.DoesNotExist:  # deleted after layout_for_show() read a (cached) screen for it
+        return result(REJECTED, "show was removed while the system was degraded")
+
+
+def _prune_outcomes():
+    keep_s = _setting("CINEMA_DEGRADED_OUTCOMES_TTL_S", 7 * 24 * 3600)
+    outcomes = _read_lines(_outcomes_path())
+    fresh = [o for o in outcomes if time.time() - o["replayed_at"] < keep_s]
+    if len(fresh) != len(outcomes):
+        with open(_outcomes_path() + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(o, cls=DjangoJSONEncoder) + "\n" for o in fresh)
+        os.replace(_outcomes_path() + ".tmp", _outcomes_path())
+
+
+def status_summary():
+    """For the health endpoint."""
+    return {**breaker.snapshot(), "queued_bookings": len(pending())}
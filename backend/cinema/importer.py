@@ -0,0 +1,379 @@
+# backend/cinema/importer.py
+"""
+Bulk import of bookings from files: the demo_bookings.json the old fallback
+path wrote (a JSON list of {"id", "user", "show_id", "seat_number",
+"created_at"}) and partner feeds as .csv or .jsonl with the columns
+
+    show_id, seat_number | seat_id, user_id | username | user, created_at?, status?
+
+Sources are streamed row by row (a JSON list is decoded one element at a time,
+with ijson when it is installed) and imported in batches of BATCH_SIZE rows;
+nothing holds more than one batch. Per batch:
+
+    1. resolve   the shows' (screen, price terms): one query per shard;
+                 seat numbers -> seat ids through the screen's in-memory layout;
+                 usernames -> ids: one query
+    2. dedupe    the batch's (show, seat) pairs against the live bookings (one
+                 query per shard, layout.live_claims) and against earlier rows
+                 of the batch
+    3. insert    bulk_create the bookings (ids from the shard sequence), their
+                 seat rows and the legacy created_at (one UPDATE), one
+                 transaction per shard; rollups get one task per show
+    4. checkpoint  rows consumed so far, written atomically after the batch
+
+Outcomes per row:
+
+    imported      booked now
+    duplicate     the same user already holds the seat (e.g. a re-run)
+    conflict      somebody else holds the seat; the database wins
+    cancelled     a cancelled row of a feed: nothing to claim
+    unknown_show / unknown_seat / unknown_user / invalid
+
+A crashed import resumes from its checkpoint and skips the rows already done
+without touching the database. A batch that committed on one shard but not the
+checkpoint is read again and its rows come back as "duplicate", so a resumed or
+repeated import never books a seat twice.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import layout, pricing, sharding, tasks
+from .models import Booking, Show
+
+try:
+    import ijson
+except ImportError:  # optional; the stock decoder streams plain lists too
+    ijson = None
+
+Through = Booking.seats.through
+
+BATCH_SIZE = 1000
+READ_CHARS = 1 << 16
+
+OUTCOMES = ("imported", "duplicate", "conflict", "cancelled",
+            "unknown_show", "unknown_seat", "unknown_user", "invalid")
+
+
+class CheckpointMismatch(Exception):
+    """The checkpoint was written for a different (or since truncated) file."""
+
+
+# -------------------------------------------------------------------
+# reading
+# -------------------------------------------------------------------
+def _json_list(f, chunk=READ_CHARS):
+    """Elements of a top-level JSON list, decoded one at a time from `chunk`-sized reads."""
+    decode = json.JSONDecoder().raw_decode
+    buf, i, eof = "", 0, False
+
+    def refill():
+        nonlocal buf, i, eof
+        part = f.read(chunk)
+        buf, i, eof = buf[i:] + part, 0, not part
+
+    def skip(chars):
+        nonlocal i
+        while True:
+            while i < len(buf) and (buf[i].isspace() or buf[i] in chars):
+                i += 1
+            if i < len(buf) or eof:
+                return
+            refill()
+
+    skip("")
+    if i >= len(buf):
+        return
+    if buf[i] == "{":  # {"bookings": [...]} (an API export): small, read it whole
+        data = json.loads(buf[i:] + f.read())
+        yield from data.get("bookings", [])
+        return
+    if buf[i] != "[":
+        raise ValueError("expected a JSON list")
+    i += 1
+    while True:
+        skip(",")
+        if i >= len(buf):
+            raise ValueError("unterminated JSON list")
+        if buf[i] == "]":
+            return
+        try:
+            item, end = decode(buf, i)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            refill()  # the element continues in the next chunk
+            continue
+        if end == len(buf) and not eof:  # a bare number might, too
+            refill()
+            continue
+        i = end
+        yield item
+
+
+def _ijson_list(f):
+    head = f.read(1)
+    while head and head.isspace():
+        head = f.read(1)
+    f.seek(0)
+    yield from ijson.items(f, "bookings.item" if head == b"{" else "item", use_float=True)
+
+
+def read_rows(path):
+    """Stream the rows (dicts) of a .csv, .jsonl or .json (list) file."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ijson is not None:
+        with open(path, "rb") as f:
+            yield from _ijson_list(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from _json_list(f)
+
+
+def batched(it, n):
+    it = iter(it)
+    while True:
+        part = list(islice(it, n))
+        if not part:
+            return
+        yield part
+
+
+# -------------------------------------------------------------------
+# one batch
+# -------------------------------------------------------------------
+def _blank(v):
+    return v is None or v == ""
+
+
+def _parse(raw):
+    """(show_id, seat_id, seat_number, user_id, username, created_at, cancelled); ValueError when unusable."""
+    if not isinstance(raw, dict) or _blank(raw.get("show_id")):
+        raise ValueError("no show_id")
+    seat_id = None if _blank(raw.get("seat_id")) else int(raw["seat_id"])
+    number = raw.get("seat_number")
+    if seat_id is None and _blank(number):
+        raise ValueError("no seat")
+    user_id = None if _blank(raw.get("user_id")) else int(raw["user_id"])
+    username = raw.get("username") or raw.get("user") or None
+    created = raw.get("created_at")
+    if not _blank(created):
+        created = parse_datetime(str(created))
+        if created is None:
+            raise ValueError("bad created_at")
+        if timezone.is_naive(created):
+            created = timezone.make_aware(created)
+    else:
+        created = None
+    cancelled = str(raw.get("status") or "").upper() == Booking.CANCELLED
+    return int(raw["show_id"]), seat_id, number, user_id, username, created, cancelled
+
+
+def _shows(show_ids):
+    """{show_id: (screen_id, price, multiplier)}: one query per shard."""
+    out = {}
+    for alias, ids in sharding.group_by_shard(list(show_ids)).items():
+        out.update((i, rest) for i, *rest in Show.objects.using(alias).filter(id__in=ids).order_by()
+                   .values_list("id", "screen_id", "price", "price_multiplier"))
+    return out
+
+
+def _users(ids, names):
+    found = get_user_model().objects.filter(id__in=ids).values_list("id", flat=True) if ids else ()
+    by_name = dict(get_user_model().objects.filter(username__in=names).values_list("username", "id")) if names else {}
+    return set(found), by_name
+
+
+def _resolve(rows, default_user_id, counts):
+    """Parsed, resolved rows as (show_id, seat_id, user_id, created_at); the rest is counted."""
+    parsed = []
+    for raw in rows:
+        try:
+            parsed.append(_parse(raw))
+        except (TypeError, ValueError):
+            counts["invalid"] += 1
+    shows = _shows({p[0] for p in parsed})
+    layouts = {sc: layout.get_layout(sc) for sc in {s[0] for s in shows.values()}}
+    user_ids, by_name = _users({p[3] for p in parsed if p[3] is not None},
+                               {p[4] for p in parsed if p[3] is None and p[4]})
+
+    out = []
+    for show_id, seat_id, number, user_id, username, created, cancelled in parsed:
+        if cancelled:
+            counts["cancelled"] += 1
+            continue
+        show = shows.get(show_id)
+        lay = layouts.get(show[0]) if show else None
+        if lay is None:
+            counts["unknown_show"] += 1
+            continue
+        if seat_id is None:
+            i = lay.index_of_number(number)
+            seat_id = lay.seat_ids[i] if i is not None else None
+        if seat_id not in lay.index:
+            counts["unknown_seat"] += 1
+            continue
+        if user_id is not None:
+            user_id = user_id if user_id in user_ids else None
+        elif username:
+            user_id = by_name.get(username)
+        else:
+            user_id = default_user_id
+        if user_id is None:
+            counts["unknown_user"] += 1
+            continue
+        out.append((show_id, seat_id, user_id, created))
+    return out, shows, layouts
+
+
+def _dedupe(resolved, counts):
+    live = layout.live_claims((show, seat) for show, seat, _, _ in resolved)
+    fresh = []
+    for show, seat, user, created in resolved:
+        hit = live.get((show, seat))
+        if hit is not None:
+            counts["duplicate" if hit[1] == user else "conflict"] += 1
+            continue
+        live[show, seat] = (None, user)  # later rows of the batch claiming it again
+        fresh.append((show, seat, user, created))
+    return fresh
+
+
+def _insert(alias, rows, shows, layouts):
+    """Bookings + seat rows for `rows` (all on `alias`), in the caller's transaction; returns the bookings."""
+    made = []
+    for show, seat, user, _ in rows:
+        screen_id, price, multiplier = shows[show]
+        lay = layouts[screen_id]
+        amount = pricing.total(pricing.vector(lay, price, multiplier), lay.indices_of([seat]))
+        made.append(Booking(user_id=user, show_id=show, total_amount=pricing.as_decimal(amount)))
+    if sharding.enabled() or connections[alias].features.can_return_rows_from_bulk_insert:
+        made = Booking.objects.using(alias).bulk_create(sharding.assign_ids(made, alias), batch_size=BATCH_SIZE)
+    else:  # no keys back from a multi-row insert, and bookings have no natural key to read them by
+        for b in made:
+            b.save(using=alias)
+    Through.objects.using(alias).bulk_create(
+        [Through(booking_id=b.id, seat_id=r[1]) for b, r in zip(made, rows)], batch_size=BATCH_SIZE)
+
+    dated = [When(id=b.id, then=Value(r[3])) for b, r in zip(made, rows) if r[3] is not None]
+    if dated:
+        Booking.objects.using(alias).filter(id__in=[b.id for b, r in zip(made, rows) if r[3] is not None]).update(
+            created_at=Case(*dated, output_field=DateTimeField()))
+        for b, r in zip(made, rows):
+            b.created_at = r[3] or b.created_at
+
+    per_show = {}
+    for b, r in zip(made, rows):
+        n, seats, amount, at = per_show.get(b.show_id, (0, 0, 0, 0))
+        per_show[b.show_id] = (n + 1, seats + 1, amount + pricing.cents(b.total_amount),
+                               max(at, b.created_at.timestamp()))
+    for show_id, (n, seats, amount, at) in per_show.items():
+        tasks.enqueue("rollups.record_booking", using=alias, show_id=show_id, seats=seats, bookings=n,
+                      amount=str(pricing.as_decimal(amount)), at=at)
+    return made
+
+
+def import_batch(rows, default_user_id=None, dry_run=False):
+    """Import one batch of raw rows; returns the outcome counts ("imported": would be, with dry_run)."""
+    counts = dict.fromkeys(OUTCOMES, 0)
+    resolved, shows, layouts = _resolve(rows, default_user_id, counts)
+    fresh = _dedupe(resolved, counts)
+    if dry_run or not fresh:
+        counts["imported"] = len(fresh)
+        return counts
+    by_alias = {}
+    for r in fresh:
+        by_alias.setdefault(sharding.shard_for_show(r[0]), []).append(r)
+    for alias, part in by_alias.items():
+        with transaction.atomic(using=alias):
+            # locks the shows as the booking paths do (and moves their version for optimistic writers), then
+            # looks again: a seat booked since _dedupe read it must not be sold twice
+            Show.objects.using(alias).filter(id__in={r[0] for r in part}).update(version=F("version") + 1)
+            taken = layout.live_claims((show, seat) for show, seat, _, _ in part)
+            keep = []
+            for r in part:
+                hit = taken.get((r[0], r[1]))
+                if hit is None:
+                    keep.append(r)
+                else:
+                    counts["duplicate" if hit[1] == r[2] else "conflict"] += 1
+            if keep:
+                _insert(alias, keep, shows, layouts)
+        counts["imported"] += len(keep)
+    return counts
+
+
+# -------------------------------------------------------------------
+# files, checkpoints
+# -------------------------------------------------------------------
+def checkpoint_path(path):
+    return f"{path}.import-checkpoint.json"
+
+
+def load_checkpoint(cp_path, path):
+    """The checkpoint for `path`, or None; CheckpointMismatch if it belongs to another file."""
+    try:
+        with open(cp_path, encoding="utf-8") as f:
+            cp = json.load(f)
+    except FileNotFoundError:
+        return None
+    if cp.get("source") != os.path.abspath(path) or cp.get("size", 0) > os.path.getsize(path):
+        raise CheckpointMismatch(f"{cp_path} was written for another version of {path}")
+    return cp
+
+
+def _save_checkpoint(cp_path, cp):
+    tmp = f"{cp_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f, cls=DjangoJSONEncoder)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, cp_path)
+
+
+def import_file(path, batch_size=BATCH_SIZE, checkpoint=None, restart=False, default_user_id=None,
+                dry_run=False, progress=None):
+    """Import `path`, resuming from its checkpoint; returns the checkpoint dict (rows done, counts, done)."""
+    cp_path = checkpoint or checkpoint_path(path)
+    cp = None if restart or dry_run else load_checkpoint(cp_path, path)
+    if cp is None:
+        cp = {"source": os.path.abspath(path), "rows": 0, "counts": dict.fromkeys(OUTCOMES, 0), "done": False}
+    if cp["done"]:
+        return cp
+    cp["size"] = os.path.getsize(path)
+
+    t0 = time.perf_counter()
+    rows = islice(read_rows(path), cp["rows"], None)  # parsed, not imported again
+    for part in batched(rows, batch_size):
+        counts = import_batch(part, default_user_id=default_user_id, dry_run=dry_run)
+        cp["rows"] += len(part)
+        for k, n in counts.items():
+            cp["counts"][k] = cp["counts"].get(k, 0) + n
+        cp["updated_at"] = datetime.now().astimezone().isoformat()
+        if not dry_run:
+            _save_checkpoint(cp_path, cp)
+        if progress:
+            progress(cp, time.perf_counter() - t0)
+    cp["done"] = True
+    if not dry_run:
+        _save_checkpoint(cp_path, cp)
+    return cp
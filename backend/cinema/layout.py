@@ -0,0 +1,235 @@
+# backend/cinema/layout.py
+"""
+Per-screen seat layout cache.
+
+A ScreenLayout is the immutable, ordered list of a screen's seats (row-major),
+built once per (screen, version) and shared by every show on that screen.
+Seat "numbers" on the wire are 1-based positions in this order, which keeps
+the frontend's numbering and the compact bitset keyed to the same layout.
+
+Versions live on Screen.layout_version, are bumped by Seat/Screen signals (or
+invalidate() after bulk edits) and are read through the Django cache; the
+built layouts are memoised per process. With a shared cache backend (Redis,
+memcached) a bump reaches every worker at once. A per-process cache (LocMem)
+only sees its own process's bumps, so there a cached version expires after
+CINEMA_LOCAL_VERSION_TTL_S and is re-read from the Screen row: other workers
+serve an edited layout (and its PriceZone prices) within that many seconds.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, F
+
+from . import sharding
+from .models import Booking, Screen, Seat, Show
+
+VERSION_KEY = "cinema:layout-version:{}"
+SHOW_SCREEN_KEY = "cinema:show-screen:{}"
+SHOW_SCREEN_TTL = 60 * 60
+
+_local = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ScreenLayout:
+    screen_id: int
+    version: int
+    rows: int
+    cols: int
+    seat_ids: tuple
+    seat_rows: tuple
+    seat_cols: tuple
+    index: MappingProxyType = field(repr=False, compare=False)
+
+    @property
+    def key(self):
+        return f"{self.screen_id}.{self.version}"
+
+    def __len__(self):
+        return len(self.seat_ids)
+
+    def index_of_number(self, number):
+        """Seat number ("1".."n") -> position, or None."""
+        try:
+            i = int(number) - 1
+        except (TypeError, ValueError):
+            return None
+        return i if 0 <= i < len(self.seat_ids) else None
+
+    def indices_of(self, seat_ids):
+        idx = self.index
+        return [idx[s] for s in seat_ids if s in idx]
+
+
+def _build(screen_id, version):
+    screen = Screen.objects.filter(id=screen_id).values_list("rows", "cols").first()
+    if screen is None:
+        return None
+    rows = Seat.objects.filter(screen_id=screen_id).order_by("row", "col").values_list("id", "row", "col")
+    ids, rs, cs = (tuple(t) for t in zip(*rows)) if rows else ((), (), ())
+    return ScreenLayout(
+        screen_id=screen_id, version=version, rows=screen[0], cols=screen[1],
+        seat_ids=ids, seat_rows=rs, seat_cols=cs,
+        index=MappingProxyType({sid: i for i, sid in enumerate(ids)}),
+    )
+
+
+def shared_cache():
+    """True when the default cache is shared between worker processes (not LocMem / dummy)."""
+    backend = caches["default"]
+    return not isinstance(getattr(backend, "_inner", backend), (LocMemCache, DummyCache))
+
+
+def version_ttl():
+    """Timeout for cached versions: none with a shared cache, else the per-process re-check interval."""
+    return None if shared_cache() else getattr(settings, "CINEMA_LOCAL_VERSION_TTL_S", 5)
+
+
+def current_version(screen_id):
+    key = VERSION_KEY.format(screen_id)
+    v = cache.get(key)
+    if v is None:
+        v = Screen.objects.filter(id=screen_id).values_list("layout_version", flat=True).first() or 1
+        cache.add(key, v, version_ttl())
+    return v
+
+
+def get_layout(screen_id):
+    version = current_version(screen_id)
+    hit = _local.get(screen_id)
+    if hit is not None and hit.version == version:
+        return hit
+    with _lock:
+        hit = _local.get(screen_id)
+        if hit is None or hit.version != version:
+            hit = _build(screen_id, version)
+            if hit is None:
+                return None
+            _local[screen_id] = hit
+    return hit
+
+
+def peek(screen_id):
+    """This process's built layout of the screen if it is current, without building one."""
+    hit = _local.get(screen_id)
+    return hit if hit is not None and hit.version == current_version(screen_id) else None
+
+
+def screen_for_show(show_id):
+    key = SHOW_SCREEN_KEY.format(show_id)
+    screen_id = cache.get(key)
+    if screen_id is None:
+        screen_id = (Show.objects.using(sharding.shard_for_show(show_id))
+                     .filter(id=show_id).values_list("screen_id", flat=True).first())
+        if screen_id is None:
+            return None
+        cache.set(key, screen_id, SHOW_SCREEN_TTL)
+    return screen_id
+
+
+def screens_for_shows(show_ids):
+    """{show_id: screen_id} for many shows: one cache round trip, one query (per shard) for the misses."""
+    keys = {SHOW_SCREEN_KEY.format(i): i for i in show_ids}
+    found = {keys[k]: v for k, v in cache.get_many(list(keys)).items()}
+    missing = [i for i in show_ids if i not in found]
+    if missing:
+        fresh = {}
+        for alias, part in sharding.group_by_shard(missing).items():
+            fresh.update(Show.objects.using(alias).filter(id__in=part).values_list("id", "screen_id"))
+        cache.set_many({SHOW_SCREEN_KEY.format(k): v for k, v in fresh.items()}, SHOW_SCREEN_TTL)
+        found.update(fresh)
+    return found
+
+
+def remember_screens(screens):
+    """Store {show_id: screen_id} read elsewhere (warm_caches), one cache round trip."""
+    cache.set_many({SHOW_SCREEN_KEY.format(k): v for k, v in screens.items()}, SHOW_SCREEN_TTL)
+
+
+def layout_for_show(show_id):
+    screen_id = screen_for_show(show_id)
+    return get_layout(screen_id) if screen_id is not None else None
+
+
+def invalidate(screen_id):
+    """Bump the screen's layout version; call after bulk Seat edits (signals don't fire for those)."""
+    Screen.objects.filter(id=screen_id).update(layout_version=F("layout_version") + 1)
+    v = Screen.objects.filter(id=screen_id).values_list("layout_version", flat=True).first()
+    if v is not None:
+        cache.set(VERSION_KEY.format(screen_id), v, version_ttl())
+
+
+def forget_show(show_id, screen_id=None):
+    if screen_id is None:
+        cache.delete(SHOW_SCREEN_KEY.format(show_id))
+    else:
+        cache.set(SHOW_SCREEN_KEY.format(show_id), screen_id, SHOW_SCREEN_TTL)
+
+
+# -------------------------------------------------------------------
+# occupancy
+# -------------------------------------------------------------------
+def taken_seat_ids(show_id):
+    Through = Booking.seats.through
+    return (Through.objects.using(sharding.shard_for_show(show_id))
+            .filter(booking__show_id=show_id)
+            .exclude(booking__status=Booking.CANCELLED)
+            .values_list("seat_id", flat=True))
+
+
+def taken_counts(show_ids):
+    """{show_id: seats held by live bookings} (shows with none are absent): one grouped query per shard."""
+    Through = Booking.seats.through
+    out = {}
+    for alias, part in sharding.group_by_shard(list(show_ids)).items():
+        out.update(Through.objects.using(alias).filter(booking__show_id__in=part)
+                   .exclude(booking__status=Booking.CANCELLED)
+                   .values("booking__show_id").order_by().annotate(n=Count("id")).values_list("booking__show_id", "n"))
+    return out
+
+
+def availability(lay, taken):
+    """The availability summary of a show on this layout with `taken` seats held (API and catalog)."""
+    cap = len(lay)
+    occ = round(taken / cap, 4) if cap else 1.0
+    return {"capacity": cap, "taken": taken, "available": max(cap - taken, 0), "occupancy": occ,
+            "filling_fast": occ >= getattr(settings, "CINEMA_FILLING_FAST_AT", 0.7)}
+
+
+def live_claims(pairs):
+    """{(show_id, seat_id): (booking_id, user_id)} for the live claims among these pairs; one query per shard."""
+    Through = Booking.seats.through
+    by_show = {}
+    for show_id, seat_id in pairs:
+        by_show.setdefault(show_id, set()).add(seat_id)
+    out = {}
+    for alias, show_ids in sharding.group_by_shard(list(by_show)).items():
+        seats = set().union(*(by_show[s] for s in show_ids))
+        for show_id, seat_id, booking_id, user_id in (
+                Through.objects.using(alias).filter(booking__show_id__in=show_ids, seat_id__in=seats)
+                .exclude(booking__status=Booking.CANCELLED)
+                .values_list("booking__show_id", "seat_id", "booking_id", "booking__user_id")):
+            out.setdefault((show_id, seat_id), (booking_id, user_id))
+    return out
+
+
+def seat_ids_by_booking(bookings):
+    """{booking_id: [seat_id, ...]} for loaded bookings: one query per database, no join to Seat."""
+    Through = Booking.seats.through
+    by_db = {}
+    for b in bookings:
+        by_db.setdefault(b._state.db, []).append(b.id)
+    out = {}
+    for alias, ids in by_db.items():
+        for booking_id, seat_id in Through.objects.using(alias).filter(booking_id__in=ids).values_list(
+                "booking_id", "seat_id"):
+            out.setdefault(booking_id, []).append(seat_id)
+    return out
@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+import urllib.parse
+from contextlib import ExitStack
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.migrations.loader import MigrationLoader
+from django.test import Client
+from django.test.utils import get_runner
+
+from cinema import query_plans, sharding, traffic
+
+
+class Command(BaseCommand):
+    help = ("Run a workload (the test suite, or a captured traffic log replayed in-process and rolled back), "
+            "EXPLAIN the SQL it issues, report full scans / filesorts / temporary tables per endpoint and "
+            "propose Meta.indexes ranked by estimated rows saved.")
+
+    def add_arguments(self, parser):
+        src = parser.add_mutually_exclusive_group(required=True)
+        src.add_argument("--tests", nargs="*", metavar="LABEL",
+                         help="run these test labels as the workload (default: cinema.tests users.tests)")
+        src.add_argument("--replay", nargs="+", metavar="LOG",
+                         help="traffic capture files (globs ok); replayed in one transaction that is rolled back")
+        parser.add_argument("--apps", nargs="+", default=["cinema", "users"], help="apps whose tables to advise on")
+        parser.add_argument("--user-prefix", default="replay", help="replay: bucket N runs as user <prefix>N")
+        parser.add_argument("--limit", type=int, default=0, help="replay: at most this many requests")
+        parser.add_argument("--json", help="write the full report here")
+        parser.add_argument("--emit-migration", action="store_true",
+                            help="write a migration adding the proposed indexes to each app")
+
+    def handle(self, *args, **opts):
+        with query_plans.Capture(opts["apps"]) as cap:
+            if opts["tests"] is not None:
+                self._run_tests(opts["tests"] or ["cinema.tests", "users.tests"])
+            else:
+                self._replay(opts["replay"], opts["user_prefix"], opts["limit"])
+        report = cap.report()
+
+        if opts["json"]:
+            with open(opts["json"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        self._print(report)
+        if opts["emit_migration"]:
+            self._emit(report["proposals"])
+
+    # -------------------------------------------------------------------
+    def _run_tests(self, labels):
+        runner = get_runner(settings)(verbosity=0, interactive=False)
+        failures = runner.run_tests(labels)
+        if failures:
+            self.stderr.write(f"{failures} test(s) failed; the captured workload is still reported")
+
+    def _replay(self, patterns, prefix, limit):
+        files = sorted({p for pat in patterns for p in glob.glob(pat)})
+        if not files:
+            raise CommandError(f"no capture files match {' '.join(patterns)}")
+        entries = sorted((e for path in files for e in traffic.read_log(path)), key=lambda e: e["t"])
+        entries = entries[:limit] if limit else entries
+
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        User = get_user_model()
+        client = Client(raise_request_exception=False)
+        with ExitStack() as stack:
+            aliases = ["default", *(a for a in sharding.all_aliases() if a != "default")]
+            for alias in aliases:
+                stack.enter_context(transaction.atomic(using=alias))
+            tokens = {}
+            for b in {e["u"] for e in entries if e.get("u") is not None}:
+                user, _ = User.objects.get_or_create(username=f"{prefix}{b}")
+                tokens[b] = f"Bearer {RefreshToken.for_user(user).access_token}"
+            for e in entries:
+                extra = {"HTTP_AUTHORIZATION": tokens[e["u"]]} if e.get("u") is not None else {}
+                resp = client.generic(e["m"], e["p"], json.dumps(e["b"]) if "b" in e else "",
+                                      content_type="application/json",
+                                      QUERY_STRING=urllib.parse.urlencode(e.get("q") or {}, doseq=True), **extra)
+                if getattr(resp, "streaming", False):
+                    b"".join(resp.streaming_content)
+            for alias in aliases:
+                transaction.set_rollback(True, using=alias)
+        self.stdout.write(f"replayed {len(entries)} requests (rolled back)")
+
+    # -------------------------------------------------------------------
+    def _print(self, report):
+        self.stdout.write(f"{report['calls']} statements captured, {report['statements']} distinct")
+        if report["endpoints"]:
+            self.stdout.write("plan problems by endpoint:")
+        for endpoint, flags in report["endpoints"].items():
+            self.stdout.write(f"  {endpoint}")
+            for f in flags[:10]:
+                self.stdout.write(f"    {','.join(f['kinds']):<22} {f['table']:<28} x{f['calls']:<6} "
+                                  f"rows={f['rows']:<7} {f['sql'][:100]}")
+        if not report["proposals"]:
+            self.stdout.write(self.style.SUCCESS("no index proposals"))
+            return
+        self.stdout.write("proposed indexes (by estimated rows saved over the workload):")
+        for n, p in enumerate(report["proposals"], 1):
+            fields = ", ".join(f'"{f}"' for f in p["fields"])
+            self.stdout.write(self.style.SUCCESS(
+                f"  {n}. {p['model']}.Meta.indexes: models.Index(fields=[{fields}], name=\"{p['name']}\")"))
+            self.stdout.write(f"     ~{p['estimated_rows_saved']} rows saved, {p['calls']} calls over "
+                              f"{p['statements']} statement(s), table rows {p['rows']}; "
+                              f"{', '.join(p['endpoints'][:6])}")
+
+    def _emit(self, proposals):
+        by_app = {}
+        for p in proposals:
+            by_app.setdefault(p["model"].split(".")[0], []).append(p)
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        for app_label, props in by_app.items():
+            module, _ = MigrationLoader.migrations_module(app_label)
+            leaves = loader.graph.leaf_nodes(app_label)
+            number = max((int(name.split("_")[0]) for _, name in leaves if name[:4].isdigit()), default=0) + 1
+            path = os.path.join(os.path.dirname(import_module(module).__file__),
+                                f"{number:04d}_advised_indexes.py")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(query_plans.migration_source(app_label, props, leaves))
+            self.stdout.write(self.style.SUCCESS(f"wrote {path}"))
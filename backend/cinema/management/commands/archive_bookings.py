@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema import archive, sharding
+
+
+def _fmt(rows, size):
+    return f"{rows} rows" + (f", {size / 1024 / 1024:.1f} MiB" if size is not None else "")
+
+
+class Command(BaseCommand):
+    help = ("Move bookings of shows that started more than --days ago (CINEMA_ARCHIVE_AFTER_DAYS) into "
+            "ArchivedBooking in batches. Safe to interrupt: re-running picks up where it stopped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="default: CINEMA_ARCHIVE_AFTER_DAYS")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--max-batches", type=int, help="per database; stop after this many")
+        parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+
+    def handle(self, *args, **opts):
+        before = archive.cutoff(opts["days"])
+        sizes = archive.table_sizes()
+        self.stdout.write(f"archiving bookings of shows before {before:%Y-%m-%d %H:%M}; table sizes:")
+        for name, (rows, size) in sizes.items():
+            self.stdout.write(f"  {name:<40} {_fmt(rows, size)}")
+
+        if opts["dry_run"]:
+            for alias in sharding.all_aliases():
+                self.stdout.write(f"{alias}: {archive.candidates(alias, before).count()} bookings would move")
+            return
+
+        t0 = time.perf_counter()
+        moved = archive.archive(
+            days=opts["days"], size=opts["batch_size"], max_batches=opts["max_batches"],
+            progress=lambda alias, n: self.stdout.write(f"  {alias}: {n} moved"),
+        )
+        elapsed = time.perf_counter() - t0
+
+        self.stdout.write("after:")
+        for name, (rows, size) in archive.table_sizes().items():
+            was = sizes.get(name, (0, None))[0]
+            self.stdout.write(f"  {name:<40} {_fmt(rows, size)} ({rows - was:+d} rows)")
+        self.stdout.write(self.style.SUCCESS(f"{sum(moved.values())} bookings archived in {elapsed:.2f}s"))
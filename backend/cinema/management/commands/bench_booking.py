@@ -0,0 +1,123 @@
+import threading
+import time
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from cinema import booking, layout, sharding
+from cinema.models import Booking, Movie, Screen, Seat, Show, ShowStats, Task
+
+_names = count(1)
+
+
+def _pct(xs, p):
+    return xs[min(len(xs) - 1, int(p * len(xs)))] if xs else 0.0
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the locking vs optimistic booking paths with concurrent threads. Creates its own "
+            "movie/screen/shows in the configured database and deletes them afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--per-thread", type=int, default=40, help="bookings per thread")
+        parser.add_argument("--modes", default=",".join(booking.MODES))
+        parser.add_argument("--contention", default="low,high",
+                            help="low = one show per thread, high = every thread books the same show")
+
+    def handle(self, *args, **opts):
+        modes = [m for m in opts["modes"].split(",") if m in booking.MODES]
+        levels = [c for c in opts["contention"].split(",") if c in ("low", "high")]
+        if not modes or not levels:
+            raise CommandError("nothing to run: check --modes / --contention")
+        threads, per = max(1, opts["threads"]), max(1, opts["per_thread"])
+        user, _ = get_user_model().objects.get_or_create(username="bench-booking")
+
+        self.stdout.write(f"{threads} threads x {per} bookings, db={connections['default'].vendor}")
+        self.stdout.write(f"{'mode':<11} {'contention':<10} {'ok':>5} {'busy':>5} {'err':>4} {'retries':>7} "
+                          f"{'book/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for level in levels:
+            for mode in modes:
+                created = self._setup(threads, per, level)
+                try:
+                    with override_settings(CINEMA_BOOKING_MODE=mode):
+                        r = self._run(user, created["plan"], threads)
+                finally:
+                    self._cleanup(created)
+                lat = sorted(r["lat"])
+                self.stdout.write(
+                    f"{mode:<11} {level:<10} {len(lat):>5} {r['busy']:>5} {r['errors']:>4} {r['retries']:>7} "
+                    f"{len(lat) / r['wall']:>8.0f} {_pct(lat, .5):>8.2f} {_pct(lat, .95):>8.2f} {_pct(lat, .99):>8.2f}"
+                )
+                if r["first_error"]:
+                    self.stdout.write(self.style.WARNING(f"  first error: {r['first_error']}"))
+
+    # -------------------------------------------------------------------
+    def _setup(self, threads, per, level):
+        n = next(_names)
+        side = 1
+        while side * side < threads * per:
+            side += 1
+        movie = Movie.objects.create(title=f"bench-booking-{n}", duration_min=100)
+        screen = Screen.objects.create(name=f"bench-booking-{n}-{time.time_ns()}", rows=side, cols=side)
+        Seat.objects.bulk_create([Seat(screen=screen, row=r, col=c)
+                                  for r in range(1, side + 1) for c in range(1, side + 1)])
+        layout.invalidate(screen.id)
+        seat_ids = layout.get_layout(screen.id).seat_ids
+        start = timezone.now() + timezone.timedelta(days=3650 + n)
+        n_shows = threads if level == "low" else 1
+        shows = [Show.objects.create(movie=movie, screen=screen, start_time=start + timezone.timedelta(hours=4 * i))
+                 for i in range(n_shows)]
+        plan = [[(shows[t % n_shows].id, seat_ids[t * per + k]) for k in range(per)] for t in range(threads)]
+        return {"movie": movie, "screen": screen, "shows": shows, "plan": plan}
+
+    def _run(self, user, plan, threads):
+        res = {"lat": [], "busy": 0, "errors": 0, "retries": 0, "first_error": None}
+        lock = threading.Lock()
+        go = threading.Barrier(threads + 1)
+
+        def worker(jobs):
+            lat, stats, busy, errors, first = [], {}, 0, 0, None
+            go.wait()
+            for show_id, seat_id in jobs:
+                t0 = time.perf_counter()
+                try:
+                    booking.book(user, show_id, seat_id, stats=stats)
+                    lat.append((time.perf_counter() - t0) * 1000)
+                except booking.Contention:
+                    busy += 1
+                except Exception as exc:  # e.g. lock wait timeouts; counted, not fatal
+                    errors += 1
+                    first = first or repr(exc)
+            connections.close_all()
+            with lock:
+                res["lat"].extend(lat)
+                res["busy"] += busy
+                res["errors"] += errors
+                res["retries"] += stats.get("retries", 0)
+                res["first_error"] = res["first_error"] or first
+
+        pool = [threading.Thread(target=worker, args=(jobs,)) for jobs in plan]
+        for t in pool:
+            t.start()
+        go.wait()
+        t0 = time.perf_counter()
+        for t in pool:
+            t.join()
+        res["wall"] = max(time.perf_counter() - t0, 1e-9)
+        return res
+
+    def _cleanup(self, created):
+        show_ids = [s.id for s in created["shows"]]
+        for alias, ids in sharding.group_by_shard(show_ids).items():
+            Booking.objects.using(alias).filter(show_id__in=ids).delete()
+            Show.objects.using(alias).filter(id__in=ids).delete()
+        ShowStats.objects.filter(show_id__in=show_ids).delete()
+        Task.objects.filter(name="rollups.record_booking", payload__show_id__in=show_ids).delete()
+        Seat.objects.filter(screen=created["screen"]).delete()
+        created["screen"].delete()
+        created["movie"].delete()
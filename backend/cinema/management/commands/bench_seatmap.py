@@ -0,0 +1,51 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from cinema import seatmap
+from cinema.renderers import FastJSONRenderer
+
+
+def _timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare seat-map payload size and encode time: DRF JSON vs fast renderer vs compact bitset."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,400,2000")
+        parser.add_argument("--taken", type=float, default=0.4, help="fraction of seats taken")
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(42)
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        self.stdout.write(f"{'seats':>6} {'variant':<22} {'bytes':>8} {'us/op':>9}")
+        for n in [int(x) for x in opts["sizes"].split(",")]:
+            taken = sorted(rnd.sample(range(n), int(n * opts["taken"])))
+            taken_set = set(taken)
+
+            def full():
+                return [{"number": str(i + 1), "available": i not in taken_set} for i in range(n)]
+
+            def compact():
+                return seatmap.compact("bench", n, 20, taken)
+
+            variants = [
+                ("drf-json full", lambda: stock.render(full())),
+                ("fast-json full", lambda: fast.render(full())),
+                ("fast-json compact", lambda: fast.render(compact())),
+            ]
+            for name, fn in variants:
+                size = len(fn())
+                us = _timeit(fn, opts["repeat"])
+                self.stdout.write(f"{n:>6} {name:<22} {size:>8} {us:>9.1f}")
@@ -0,0 +1,95 @@
+import json
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema.traffic import percentile
+
+
+def _load(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as exc:
+        raise CommandError(f"cannot read {path}: {exc}")
+    by_route = defaultdict(lambda: {"ms": [], "status": Counter()})
+    for route, method, status, ms, _captured in data["results"]:
+        d = by_route[f"{method} {route}"]
+        d["ms"].append(ms)
+        d["status"][status] += 1
+    for d in by_route.values():
+        d["ms"].sort()
+    return data, by_route
+
+
+def _mix(counter):
+    total = sum(counter.values()) or 1
+    return {s: n / total for s, n in counter.items()}
+
+
+class Command(BaseCommand):
+    help = "Compare two replay_traffic result files: latency percentiles and status-code mix per endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("baseline")
+        parser.add_argument("candidate")
+        parser.add_argument("--threshold", type=float, default=0.2,
+                            help="flag a p50/p95 increase above this fraction (0.2 = +20%%)")
+        parser.add_argument("--status-threshold", type=float, default=0.01,
+                            help="flag a status code whose share moved by more than this fraction")
+        parser.add_argument("--min-samples", type=int, default=20,
+                            help="ignore latency changes on endpoints with fewer requests")
+        parser.add_argument("--fail", action="store_true", help="exit non-zero when anything is flagged")
+        parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+
+    def handle(self, *args, **opts):
+        base_meta, base = _load(opts["baseline"])
+        cand_meta, cand = _load(opts["candidate"])
+
+        rows, flagged = [], []
+        for key in sorted(set(base) | set(cand)):
+            a, b = base.get(key), cand.get(key)
+            row = {"endpoint": key, "n": [len(a["ms"]) if a else 0, len(b["ms"]) if b else 0], "flags": []}
+            for p in (0.5, 0.95, 0.99):
+                row[f"p{int(p * 100)}"] = [percentile(a["ms"], p) if a else None,
+                                           percentile(b["ms"], p) if b else None]
+            if a and b and min(row["n"]) >= opts["min_samples"]:
+                for name in ("p50", "p95"):
+                    old, new = row[name]
+                    if old and new > old * (1 + opts["threshold"]):
+                        row["flags"].append(f"{name} +{(new / old - 1) * 100:.0f}%")
+            mix_a = _mix(a["status"]) if a else {}
+            mix_b = _mix(b["status"]) if b else {}
+            row["status"] = [dict(a["status"]) if a else {}, dict(b["status"]) if b else {}]
+            for code in sorted(set(mix_a) | set(mix_b)):
+                delta = mix_b.get(code, 0) - mix_a.get(code, 0)
+                if abs(delta) > opts["status_threshold"]:
+                    row["flags"].append(f"{code or 'conn-error'} {delta * 100:+.1f}pp")
+            rows.append(row)
+            if row["flags"]:
+                flagged.append(row)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({
+                "baseline": base_meta.get("label") or opts["baseline"],
+                "candidate": cand_meta.get("label") or opts["candidate"],
+                "endpoints": rows,
+            }, indent=2))
+        else:
+            self._table(rows, base_meta, cand_meta, opts)
+
+        if flagged and opts["fail"]:
+            raise CommandError(f"{len(flagged)} endpoint(s) regressed")
+
+    def _table(self, rows, base_meta, cand_meta, opts):
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"  # noqa: E731
+        self.stdout.write(f"baseline : {base_meta.get('label') or opts['baseline']} ({base_meta.get('requests')} req, "
+                          f"{base_meta.get('wall_s')}s)")
+        self.stdout.write(f"candidate: {cand_meta.get('label') or opts['candidate']} ({cand_meta.get('requests')} req, "
+                          f"{cand_meta.get('wall_s')}s)")
+        self.stdout.write(f"{'endpoint':<40} {'n':>11} {'p50 ms':>15} {'p95 ms':>15} {'p99 ms':>15}  flags")
+        for r in rows:
+            line = (f"{r['endpoint'][:40]:<40} {r['n'][0]:>5}/{r['n'][1]:<5} "
+                    + " ".join(f"{fmt(r[p][0]):>7}/{fmt(r[p][1]):<7}" for p in ("p50", "p95", "p99"))
+                    + "  " + ", ".join(r["flags"]))
+            self.stdout.write(self.style.ERROR(line) if r["flags"] else line)
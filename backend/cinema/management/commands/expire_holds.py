@@ -0,0 +1,27 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema import cancellation
+
+
+class Command(BaseCommand):
+    help = ("Release waitlist holds that were not confirmed in time (CINEMA_HOLD_MINUTES); their seats go to "
+            "the next waiting users. Runs once, or every --every seconds until SIGTERM.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, default=0, help="loop, sleeping this many seconds between sweeps")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        stop = []
+        signal.signal(signal.SIGTERM, lambda *a: stop.append(1))
+        while True:
+            result = cancellation.expire_holds(batch=opts["batch_size"])
+            if result["expired"] or not opts["every"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result['expired']} holds expired, {result['offered']} seats offered onward"))
+            if not opts["every"] or stop:
+                break
+            time.sleep(opts["every"])
@@ -0,0 +1,49 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema import importer
+
+
+class Command(BaseCommand):
+    help = ("Import bookings from the legacy demo_bookings.json and partner .csv / .jsonl feeds (show_id, "
+            "seat_number or seat_id, user_id or username, optional created_at and status), streamed in batches. "
+            "Seats somebody already holds are skipped. Resumes from a checkpoint next to each file after a crash.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", metavar="PATH")
+        parser.add_argument("--batch-size", type=int, default=importer.BATCH_SIZE)
+        parser.add_argument("--checkpoint", help="checkpoint file (one path only); default: PATH.import-checkpoint.json")
+        parser.add_argument("--restart", action="store_true", help="ignore existing checkpoints, start at row 1")
+        parser.add_argument("--default-user", metavar="USERNAME", help="owner of rows that name no user")
+        parser.add_argument("--dry-run", action="store_true", help="resolve and dedupe only; nothing is written")
+
+    def handle(self, *args, **opts):
+        if opts["checkpoint"] and len(opts["paths"]) > 1:
+            raise CommandError("--checkpoint takes one PATH")
+        default_user_id = None
+        if opts["default_user"]:
+            default_user_id = (get_user_model().objects.filter(username=opts["default_user"])
+                               .values_list("id", flat=True).first())
+            if default_user_id is None:
+                raise CommandError(f"no user {opts['default_user']!r}")
+
+        def progress(cp, elapsed):
+            rate = cp["rows"] / elapsed if elapsed else 0
+            self.stderr.write(f"  {cp['rows']} rows, {cp['counts']['imported']} imported ({rate:.0f} rows/s)",
+                              ending="\r")
+
+        for path in opts["paths"]:
+            try:
+                cp = importer.import_file(
+                    path, batch_size=max(1, opts["batch_size"]), checkpoint=opts["checkpoint"],
+                    restart=opts["restart"], default_user_id=default_user_id, dry_run=opts["dry_run"],
+                    progress=progress,
+                )
+            except importer.CheckpointMismatch as e:
+                raise CommandError(f"{e}; use --restart to import it from the start")
+            self.stderr.write("")
+            found = {k: n for k, n in cp["counts"].items() if n}
+            dry = " (dry run)" if opts["dry_run"] else ""
+            self.stdout.write(self.style.SUCCESS(f"{path}{dry}: {cp['rows']} rows {json.dumps(found)}"))
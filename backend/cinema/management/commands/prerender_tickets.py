@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cinema import sharding, tickets
+from cinema.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Pre-render tickets (SVG + PNG) for shows about to open doors, using the ticket process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--show", type=int, action="append", dest="shows", help="show id (repeatable)")
+        parser.add_argument("--starting-within", type=int, default=None, metavar="MINUTES",
+                            help="all shows starting in the next N minutes")
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--formats", default=",".join(tickets.FORMATS))
+
+    def handle(self, *args, **opts):
+        if opts["shows"]:
+            aliases = list(sharding.group_by_shard(opts["shows"]))
+            where = {"show_id__in": opts["shows"]}
+        elif opts["starting_within"] is not None:
+            now = timezone.now()
+            aliases = None
+            where = {"show__start_time__range": (now, now + timezone.timedelta(minutes=opts["starting_within"]))}
+        else:
+            raise CommandError("pass --show ID or --starting-within MINUTES")
+
+        formats = [f for f in opts["formats"].split(",") if f in tickets.FORMATS]
+        per_shard = sharding.fan_out(
+            lambda db: (Booking.objects.using(db).exclude(status=Booking.CANCELLED).filter(**where)
+                        .order_by("id").values_list("id", flat=True)),
+            aliases,
+        )
+        total = sum(len(ids) for _, ids in per_shard)
+        self.stdout.write(f"{total} bookings, formats={','.join(formats)}")
+
+        t0 = time.perf_counter()
+        size = max(1, opts["chunk_size"])
+        done = 0
+        for alias, ids in per_shard:
+            for i in range(0, len(ids), size):
+                chunk = tickets.bookings_for_tickets(Booking.objects.using(alias).filter(id__in=ids[i:i + size]))
+                payloads = [tickets.payload_for(b) for b in chunk]
+                for fmt in formats:
+                    tickets.ensure_rendered(payloads, fmt, timeout=300)
+                done += len(chunk)
+                self.stdout.write(f"  {done}/{total}")
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered in {time.perf_counter() - t0:.1f}s"))
@@ -0,0 +1,56 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema import startup
+
+
+class Command(BaseCommand):
+    help = ("Boot the WSGI / ASGI application (or plain django.setup()) in fresh interpreters and report where "
+            "the time goes: django.setup() phases, per-app import / models / ready, per-package and per-module "
+            "import cost (-X importtime), and the URLconf load the first request adds. --budget-ms / "
+            "--max-modules fail the run when the median boot is over budget.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("targets", nargs="*", default=["wsgi", "asgi"], metavar="TARGET",
+                            help="wsgi, asgi, setup or a module path (default: wsgi asgi)")
+        parser.add_argument("--runs", type=int, default=3, help="boots per target; the median one is reported")
+        parser.add_argument("--top", type=int, default=20, help="modules / packages listed")
+        parser.add_argument("--budget-ms", type=float, help="fail when a median boot takes longer")
+        parser.add_argument("--max-modules", type=int, help="fail when a boot imports more modules")
+
+    def handle(self, *args, **opts):
+        over = []
+        for target in opts["targets"]:
+            try:
+                runs = sorted((startup.profile(target) for _ in range(max(1, opts["runs"]))),
+                              key=lambda r: r["boot_ms"])
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            r = runs[len(runs) // 2]
+            spread = f" (min {runs[0]['boot_ms']:.1f}, max {runs[-1]['boot_ms']:.1f})" if len(runs) > 1 else ""
+            self.stdout.write(self.style.SUCCESS(
+                f"{r['target']}: booted in {r['boot_ms']:.1f} ms{spread}, {len(r['modules'])} modules"))
+            self.stdout.write("  phases: " + ", ".join(f"{k} {v:.1f}" for k, v in r["phases"].items()))
+            self.stdout.write(f"  {'app':<16} {'import':>8} {'models':>8} {'ready':>8}   (ms)")
+            for label, t in r["apps"].items():
+                self.stdout.write(f"  {label:<16} {t.get('apps', 0):>8.1f} {t.get('models', 0):>8.1f} "
+                                  f"{t.get('ready', 0):>8.1f}")
+            packages = list(startup.by_package(r["imports"]).items())[:opts["top"]]
+            self.stdout.write("  packages (self ms): " + ", ".join(f"{k} {v:.1f}" for k, v in packages))
+            self.stdout.write("  slowest imports (cumulative ms, self ms):")
+            for name, own, cumulative, depth in sorted(r["imports"], key=lambda m: -m[2])[:opts["top"]]:
+                self.stdout.write(f"    {cumulative:>8.1f} {own:>8.1f}  {'  ' * depth}{name}")
+            slowest = sorted((m for m in r["urlconf_imports"] if m[3] == 0), key=lambda m: -m[2])[:5]
+            self.stdout.write(f"  first request: URLconf +{r['urlconf_ms']:.1f} ms, "
+                              f"+{len(r['urlconf_modules'])} modules ("
+                              + ", ".join(f"{name} {cumulative:.1f}" for name, _, cumulative, _ in slowest) + ")")
+
+            if opts["budget_ms"] is not None and r["boot_ms"] > opts["budget_ms"]:
+                over.append(f"{r['target']} {r['boot_ms']:.1f} ms > {opts['budget_ms']:g} ms")
+            if opts["max_modules"] is not None and len(r["modules"]) > opts["max_modules"]:
+                over.append(f"{r['target']} {len(r['modules'])} modules > {opts['max_modules']}")
+            if len(runs) > 2:
+                self.stdout.write(f"  boot stdev {statistics.stdev(x['boot_ms'] for x in runs):.1f} ms")
+        if over:
+            raise CommandError("over budget: " + "; ".join(over))
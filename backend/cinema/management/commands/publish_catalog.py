@@ -0,0 +1,34 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema import catalog
+
+
+class Command(BaseCommand):
+    help = ("Render the catalog (movie list, each movie's upcoming shows with availability) into versioned, "
+            "precompressed JSON under CINEMA_CATALOG_DIR with a manifest of content hashes. Only changed files are "
+            "written. Runs once, or every --every seconds until SIGTERM (keeps availability fresh).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movie", type=int, action="append", dest="movies",
+                            help="only this movie's show list (repeatable); default: everything")
+        parser.add_argument("--every", type=float, default=0, help="loop, sleeping this many seconds between passes")
+        parser.add_argument("--keep", type=int, default=catalog.KEEP_OLD_S, metavar="SECONDS",
+                            help="keep files the manifest no longer lists this long")
+
+    def handle(self, *args, **opts):
+        stop = []
+        signal.signal(signal.SIGTERM, lambda *a: stop.append(1))
+        while True:
+            t0 = time.perf_counter()
+            r = catalog.publish(opts["movies"], include_list=not opts["movies"], keep_s=opts["keep"])
+            if r["written"] or r["dropped"] or not opts["every"]:
+                self.stdout.write(self.style.SUCCESS(
+                    f"catalog v{r['version']}: {r['rendered']} rendered, {r['written']} written, "
+                    f"{r['unchanged']} unchanged, {r['dropped']} dropped, {r['removed_files']} old files removed "
+                    f"in {time.perf_counter() - t0:.2f}s -> {catalog.catalog_dir()}"))
+            if not opts["every"] or stop:
+                break
+            time.sleep(opts["every"])
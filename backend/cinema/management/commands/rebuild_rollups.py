@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from cinema import rollups, sharding
+from cinema.models import Show, ShowStats
+
+
+def _chunks(ids, size):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def _compute(chunk):
+    try:
+        return rollups.compute_show_rows(chunk)
+    finally:
+        # each worker thread owns its own DB connection
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Rebuild show / movie-day / screen-day rollups from bookings, in parallel chunks of shows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        show_ids = [i for _, ids in sharding.fan_out(lambda db: Show.objects.using(db).order_by("id")
+                                                     .values_list("id", flat=True)) for i in ids]
+        chunks = list(_chunks(show_ids, max(1, opts["chunk_size"])))
+        self.stdout.write(f"{len(show_ids)} shows in {len(chunks)} chunks, {opts['workers']} workers")
+
+        rows = []
+        with ThreadPoolExecutor(max_workers=max(1, opts["workers"])) as pool:
+            for i, part in enumerate(pool.map(_compute, chunks), 1):
+                rows.extend(part)
+                self.stdout.write(f"  chunk {i}/{len(chunks)}: {len(part)} shows")
+
+        # writes stay on this thread, in one transaction
+        with transaction.atomic():
+            ShowStats.objects.all().delete()
+            ShowStats.objects.bulk_create(rows, batch_size=1000)
+            rollups.rebuild_day_rows()
+
+        self.stdout.write(self.style.SUCCESS(f"Rollups rebuilt for {len(rows)} shows"))
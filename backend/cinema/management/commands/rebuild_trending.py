@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import chain
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from cinema import sharding, trending
+from cinema.models import Booking, TrendingScore
+
+
+class Command(BaseCommand):
+    help = ("Recompute the trending leaderboards from booking history in one streaming pass "
+            "(or, with --prune, only drop started shows and long-idle rows).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help="only delete dead rows, keep the scores")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        if opts["prune"]:
+            self.stdout.write(self.style.SUCCESS(f"Pruned {trending.prune()} trending rows"))
+            return
+
+        now = time.time()
+        # older sales have decayed below any score that could still matter (see trending.prune)
+        since = datetime.fromtimestamp(now - 2 * trending.REBASE_AFTER * trending.half_life(), tz=dt_timezone.utc)
+        seen = [0]
+
+        def stream(alias):
+            qs = (Booking.objects.using(alias).filter(status=Booking.CONFIRMED, created_at__gte=since)
+                  .order_by().values("id").annotate(n=Count("seats"))
+                  .values_list("show_id", "show__movie_id", "show__start_time", "created_at", "n"))
+            for row in qs.iterator(chunk_size=max(1, opts["chunk_size"])):
+                seen[0] += 1
+                yield row
+
+        rows = trending.compute_rows(chain.from_iterable(stream(a) for a in sharding.all_aliases()), now)
+
+        with transaction.atomic():
+            TrendingScore.objects.all().delete()
+            TrendingScore.objects.bulk_create(rows, batch_size=1000)
+        trending.forget()
+
+        shows = sum(1 for r in rows if r.kind == TrendingScore.SHOW)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trending rebuilt from {seen[0]} bookings: {len(rows) - shows} movies, {shows} shows"))
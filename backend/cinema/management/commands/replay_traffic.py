@@ -0,0 +1,153 @@
+import glob
+import http.client
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema import traffic
+
+
+def _speed(value):
+    if value in ("original", "max"):
+        return {"original": 1.0, "max": None}[value]
+    try:
+        factor = float(value)
+    except ValueError:
+        raise CommandError("--speed must be 'original', 'max' or a factor such as 2 or 0.5")
+    if factor <= 0:
+        raise CommandError("--speed factor must be > 0")
+    return factor
+
+
+class Command(BaseCommand):
+    help = ("Re-issue a captured traffic log against a running server and write per-request "
+            "latency/status results for compare_replays.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("logs", nargs="+", help="capture files (globs ok, rotated files are merged by time)")
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--speed", default="original",
+                            help="'original', 'max', or a factor (2 = twice as fast, 0.5 = half speed)")
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--out", required=True, help="results file (JSON)")
+        parser.add_argument("--label", default="", help="build label stored with the results")
+        parser.add_argument("--read-only", action="store_true", help="skip POST/PUT/PATCH/DELETE requests")
+        parser.add_argument("--limit", type=int, default=0)
+        parser.add_argument("--user-prefix", default="replay",
+                            help="bucket N is replayed as user <prefix>N")
+        parser.add_argument("--password", default="replay-pass")
+        parser.add_argument("--create-users", action="store_true",
+                            help="create missing bucket users in this project's database first")
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **opts):
+        speed = _speed(opts["speed"])
+        entries = self._load(opts["logs"], opts["read_only"], opts["limit"])
+        if not entries:
+            raise CommandError("no requests to replay")
+
+        base = opts["base_url"].rstrip("/")
+        tokens = self._tokens(base, {e["u"] for e in entries if e.get("u") is not None}, opts)
+        self.stdout.write(f"replaying {len(entries)} requests at speed={opts['speed']} "
+                          f"concurrency={opts['concurrency']} against {base}")
+
+        results = [None] * len(entries)
+        lag = []
+
+        def fire(i, e):
+            results[i] = self._issue(base, e, tokens.get(e.get("u")), opts["timeout"])
+
+        t_first = entries[0]["t"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, opts["concurrency"])) as pool:
+            for i, e in enumerate(entries):
+                if speed is not None:
+                    due = start + (e["t"] - t_first) / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        lag.append(-delay * 1000)
+                pool.submit(fire, i, e)
+        wall = time.perf_counter() - start
+
+        with open(opts["out"], "w", encoding="utf-8") as f:
+            json.dump({
+                "label": opts["label"], "base_url": base, "speed": opts["speed"],
+                "wall_s": round(wall, 3), "requests": len(entries),
+                "results": results,
+            }, f, separators=(",", ":"))
+
+        errors = sum(1 for r in results if r[2] >= 500 or r[2] == 0)
+        late = sorted(lag)
+        self.stdout.write(self.style.SUCCESS(
+            f"done in {wall:.1f}s ({len(entries) / max(wall, 1e-9):.0f} req/s), "
+            f"{errors} errors, schedule lag p95={traffic.percentile(late, 0.95) or 0:.1f}ms -> {opts['out']}"
+        ))
+
+    # -------------------------------------------------------------------
+    def _load(self, patterns, read_only, limit):
+        files = sorted({p for pat in patterns for p in glob.glob(pat)})
+        if not files:
+            raise CommandError(f"no capture files match {' '.join(patterns)}")
+        entries = [e for path in files for e in traffic.read_log(path)]
+        if read_only:
+            entries = [e for e in entries if e["m"] in ("GET", "HEAD", "OPTIONS")]
+        entries.sort(key=lambda e: e["t"])
+        return entries[:limit] if limit else entries
+
+    def _tokens(self, base, buckets, opts):
+        if not buckets:
+            return {}
+        User = get_user_model()
+        names = {b: f"{opts['user_prefix']}{b}" for b in buckets}
+        if opts["create_users"]:
+            existing = set(User.objects.filter(username__in=names.values()).values_list("username", flat=True))
+            for name in set(names.values()) - existing:
+                User.objects.create_user(username=name, password=opts["password"])
+
+        tokens = {}
+        for bucket, name in names.items():
+            body = json.dumps({"username": name, "password": opts["password"]}).encode()
+            req = urllib.request.Request(f"{base}/api/auth/token/", data=body,
+                                         headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=opts["timeout"]) as resp:
+                    tokens[bucket] = json.loads(resp.read())["access"]
+            except (urllib.error.URLError, KeyError, ValueError) as exc:
+                raise CommandError(f"could not log in as {name!r} ({exc}); try --create-users")
+        return tokens
+
+    def _issue(self, base, e, token, timeout):
+        url = base + e["p"]
+        if e.get("q"):
+            url += "?" + urllib.parse.urlencode(e["q"], doseq=True)
+        headers = {"Accept": "application/json"}
+        data = None
+        if "b" in e:
+            data = json.dumps(e["b"]).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        req = urllib.request.Request(url, data=data, headers=headers, method=e["m"])
+
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+            try:
+                exc.read()
+            except (http.client.HTTPException, OSError):
+                pass
+        except (urllib.error.URLError, http.client.HTTPException, OSError):  # incl. IncompleteRead, bad status line
+            status = 0
+        return [e.get("r") or e["p"], e["m"], status, round((time.perf_counter() - t0) * 1000, 2), e["s"]]
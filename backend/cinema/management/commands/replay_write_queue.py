@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema import degraded
+
+
+class Command(BaseCommand):
+    help = ("Book the reservations accepted into the local queue while the database was unreachable "
+            "(the web processes also do this on their own once their circuit breaker closes).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--list", action="store_true", help="only show what is queued")
+
+    def handle(self, *args, **opts):
+        queued = degraded.pending()
+        if opts["list"]:
+            for e in queued:
+                self.stdout.write(f"{e['ref']}  user={e['user_id']} show={e['show_id']} seat={e['seat_number']}")
+            self.stdout.write(f"{len(queued)} queued")
+            return
+        if not queued:
+            self.stdout.write("queue is empty")
+            return
+
+        counts = degraded.replay()
+        self.stdout.write(f"confirmed {counts[degraded.CONFIRMED]}, rejected {counts[degraded.REJECTED]}, "
+                          f"left {counts['left']}")
+        if counts["left"]:
+            raise CommandError("database still unavailable or another replay is running; run again later")
@@ -0,0 +1,58 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cinema import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks on a thread pool (retries with backoff). --stats prints latency per task."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--poll", type=float, default=1.0, help="seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="drain what is due now, then exit")
+        parser.add_argument("--reclaim-after", type=int, default=600,
+                            help="requeue RUNNING tasks started more than N seconds ago")
+        parser.add_argument("--stats", action="store_true", help="print latency metrics and exit")
+        parser.add_argument("--since-hours", type=float, default=24.0)
+
+    def handle(self, *args, **opts):
+        if opts["stats"]:
+            return self._stats(opts["since_hours"])
+
+        names = tasks.autodiscover()
+        self.stdout.write(f"registered: {', '.join(sorted(names)) or '-'}")
+        stop = []
+        signal.signal(signal.SIGTERM, lambda *a: stop.append(1))
+
+        threads = max(1, opts["threads"])
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while not stop:
+                tasks.reclaim_stuck(opts["reclaim_after"])
+                batch = tasks.claim(threads * 2)
+                if not batch:
+                    if opts["once"]:
+                        break
+                    time.sleep(opts["poll"])
+                    continue
+                for f in wait([pool.submit(tasks.run, t) for t in batch]).done:
+                    if f.result():
+                        done += 1
+                    else:
+                        failed += 1
+        self.stdout.write(self.style.SUCCESS(f"tasks done={done} failed={failed}"))
+
+    def _stats(self, since_hours):
+        since = timezone.now() - timezone.timedelta(hours=since_hours)
+        stats = tasks.latency_stats(since)
+        self.stdout.write(f"{'task':<32} {'count':>6} {'fail':>5} {'wait50':>7} {'wait95':>7} {'run50':>6} {'run95':>6}")
+        for name, s in sorted(stats.items()):
+            self.stdout.write(
+                f"{name:<32} {s['count']:>6} {s['failed']:>5} "
+                f"{s['wait_p50'] or 0:>7} {s['wait_p95'] or 0:>7} {s['run_p50'] or 0:>6} {s['run_p95'] or 0:>6}"
+            )
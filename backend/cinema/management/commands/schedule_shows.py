@@ -0,0 +1,56 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from cinema import scheduling
+
+
+def _read(path):
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["shows"] if isinstance(data, dict) else data
+
+
+class Command(BaseCommand):
+    help = ("Create a batch of shows (e.g. next week for every screen) from a JSON or CSV file "
+            "(screen,movie,start_time[,price][,price_multiplier]): overlaps and cleaning-gap violations are rejected, "
+            "the rest are inserted in one transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSON list / {\"shows\": [...]} or CSV with a header row")
+        parser.add_argument("--dry-run", action="store_true", help="validate only")
+        parser.add_argument("--allow-past", action="store_true")
+        parser.add_argument("--report", help="write the rejected rows here as JSON")
+
+    def handle(self, *args, **opts):
+        try:
+            rows = _read(opts["path"])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"cannot read {opts['path']}: {e}")
+
+        t0 = time.perf_counter()
+        result = scheduling.schedule(rows, allow_past=opts["allow_past"], dry_run=opts["dry_run"])
+        elapsed = time.perf_counter() - t0
+
+        if opts["report"]:
+            with open(opts["report"], "w", encoding="utf-8") as f:
+                json.dump(result["rejected"], f, indent=2, cls=DjangoJSONEncoder)
+        reasons = {}
+        for r in result["rejected"]:
+            reasons[r["reason"]] = reasons.get(r["reason"], 0) + 1
+        for r in result["rejected"][:20]:
+            c = r.get("conflicts_with")
+            other = c and (f"show {c['show_id']}" if "show_id" in c else f"row {c['row']}")
+            self.stdout.write(f"row {r['row']}: {r['reason']}" +
+                              (f" (with {other} at {timezone.localtime(c['start_time']):%Y-%m-%d %H:%M})" if c else ""))
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['received']} rows in {elapsed:.2f}s: {result['accepted']} accepted, "
+            f"{result['created']} created, {len(result['rejected'])} rejected "
+            + (json.dumps(reasons, sort_keys=True) if reasons else "")))
@@ -0,0 +1,114 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from cinema import traffic, warmup
+
+
+def _when(value):
+    dt = parse_datetime(value)
+    if dt is None:
+        raise CommandError(f"not a datetime: {value!r} (use ISO 8601, e.g. 2026-05-01T18:00)")
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def _latency(results):
+    ms = sorted(r[2] for r in results)
+    return f"p50={traffic.percentile(ms, 0.5) or 0:.1f}ms p95={traffic.percentile(ms, 0.95) or 0:.1f}ms"
+
+
+class Command(BaseCommand):
+    help = ("Warm every cache the read path uses (show -> screen and price keys, screen layouts and price vectors, "
+            "catalog, show lists, seat maps, availability, degraded-mode snapshots) for the given shows, from a "
+            "thread pool, then check what is cached. Run from cron ahead of an on-sale. --base-url warms running "
+            "workers over HTTP; per-process caches fill only in the worker that answers, so behind a load balancer "
+            "pass each worker's own address (repeat --base-url) rather than the balancer's. --local warms this "
+            "process instead, which reaches the workers only through a shared cache backend and the snapshots.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--show", type=int, action="append", dest="shows", help="show id (repeatable)")
+        parser.add_argument("--starting-within", type=int, metavar="MINUTES",
+                            help="shows starting in the next N minutes")
+        parser.add_argument("--from", dest="start", type=_when, help="shows starting at or after (ISO 8601)")
+        parser.add_argument("--to", dest="end", type=_when, help="shows starting before (ISO 8601)")
+        parser.add_argument("--workers", type=int, default=8, help="threads issuing requests; 0 = this thread")
+        parser.add_argument("--base-url", action="append", dest="base_urls", metavar="URL",
+                            help="a running worker to warm over HTTP (repeatable: one per worker)")
+        parser.add_argument("--local", action="store_true",
+                            help="warm this process instead of running workers (for a shared cache backend)")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--min-hit-rate", type=float, default=1.0,
+                            help="fail (exit 1) when any cache is below this after warming")
+        parser.add_argument("--no-verify", action="store_true", help="skip the hit-rate check and the timed pass")
+
+    def handle(self, *args, **opts):
+        start, end = opts["start"], opts["end"]
+        if opts["starting_within"] is not None:
+            start = timezone.now()
+            end = start + timedelta(minutes=opts["starting_within"])
+        if not (opts["shows"] or start or end):
+            raise CommandError("pass --show ID, --starting-within MINUTES or --from / --to")
+
+        local = opts["local"]
+        if local == bool(opts["base_urls"]):
+            raise CommandError("pass --base-url URL (once per worker) or --local")
+        shared = warmup.shared_cache()
+        if local and not shared:
+            self.stderr.write(self.style.WARNING(
+                "local-memory cache: --local warms this process and the snapshots, not running workers"))
+
+        since = time.time()
+        shows = warmup.select_shows(opts["shows"], start, end)
+        if not shows:
+            self.stdout.write("no shows to warm")
+            return
+        targets = [("this process", warmup.local_get)] if local else [
+            (url, warmup.remote_get(url, opts["timeout"])) for url in opts["base_urls"]]
+
+        t0 = time.perf_counter()
+        if local or shared:  # a remote run with a local-memory cache has no shared keys to write
+            warmup.prime(shows, local=local)
+        paths = warmup.plan(shows)
+        self.stdout.write(f"{len(shows)} shows on {len({s[2] for s in shows})} screens: primed in "
+                          f"{time.perf_counter() - t0:.2f}s, {len(paths)} requests x {len(targets)} targets, "
+                          f"{opts['workers']} workers")
+
+        def progress(done, total):
+            if done == total or done % 50 == 0:
+                self.stderr.write(f"  {done}/{total}", ending="\r")
+
+        failed = []
+        for name, get in targets:
+            t = time.perf_counter()
+            warm = warmup.run(paths, get, workers=max(0, opts["workers"]), progress=progress)
+            self.stderr.write("")
+            bad = [r for r in warm if r[1] != 200]
+            for path, status, _ in bad[:10]:
+                self.stderr.write(self.style.WARNING(f"  {status or 'no answer'}: {path}"))
+            self.stdout.write(f"{name}: warmed in {time.perf_counter() - t:.2f}s ({_latency(warm)}), "
+                              f"{len(bad)} failed")
+            failed += bad
+        if opts["no_verify"]:
+            return
+
+        rates = warmup.hit_rates(shows, since, local=local)
+        low = []
+        for name, r in rates.items():
+            self.stdout.write(f"  {name:<15} {r['hits']}/{r['expected']} cached ({r['rate']:.1%})")
+            if r["rate"] < opts["min_hit_rate"]:
+                low.append(name)
+        for name, get in targets:
+            self.stdout.write(f"{name} warm pass: {_latency(warmup.run(paths, get, workers=max(0, opts['workers'])))}")
+        if low or failed:
+            raise CommandError(f"below --min-hit-rate: {', '.join(low)}" if low else f"{len(failed)} requests failed")
+        if shared:
+            self.stdout.write(self.style.SUCCESS("caches warm"))
+        elif local:
+            self.stdout.write(self.style.WARNING("this process warm; running workers are not (local-memory cache)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(targets)} workers answered every request (local-memory cache: their caches are not "
+                "inspected from here)"))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowStats',
+            fields=[
+                ('show', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='cinema.show')),
+                ('day', models.DateField(db_index=True)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.movie')),
+                ('screen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.screen')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MovieDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shows', models.IntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='cinema.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'movie'], name='cinema_movi_day_8190d4_idx')],
+                'unique_together': {('movie', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ScreenDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('shows', models.IntegerField(default=0)),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('seats_sold', models.IntegerField(default=0)),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('screen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='cinema.screen')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'screen'], name='cinema_scre_day_408378_idx')],
+                'unique_together': {('screen', 'day')},
+            },
+        ),
+    ]
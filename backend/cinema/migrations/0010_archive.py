@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0009_advised_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('show_id', models.BigIntegerField()),
+                ('movie_id', models.BigIntegerField()),
+                ('screen_id', models.BigIntegerField()),
+                ('movie_title', models.CharField(max_length=200)),
+                ('show_start_time', models.DateTimeField()),
+                ('seat_ids', models.TextField(blank=True)),
+                ('seat_number', models.TextField(blank=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('CONFIRMED', 'CONFIRMED'), ('CANCELLED', 'CANCELLED')], max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='cinema_arch_user_id_4ac197_idx'), models.Index(fields=['show_id'], name='cinema_arch_show_id_f39da7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0010_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='show',
+            name='price_multiplier',
+            field=models.DecimalField(decimal_places=2, default=1, max_digits=4),
+        ),
+        migrations.CreateModel(
+            name='PriceZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('first_row', models.PositiveIntegerField()),
+                ('last_row', models.PositiveIntegerField()),
+                ('multiplier', models.DecimalField(decimal_places=2, default=1, max_digits=4)),
+                ('screen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_zones', to='cinema.screen')),
+            ],
+            options={
+                'ordering': ['screen', 'first_row'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0011_pricing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('show_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('WAITING', 'WAITING'), ('OFFERED', 'OFFERED'), ('CONFIRMED', 'CONFIRMED'), ('EXPIRED', 'EXPIRED'), ('CANCELLED', 'CANCELLED')], default='WAITING', max_length=10)),
+                ('booking_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='hold_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'hold_until'], name='cinema_book_status_3d4f8c_idx'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['show_id', 'status', 'id'], name='cinema_wait_show_id_75c661_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(fields=['booking_id'], name='cinema_wait_booking_2c1544_idx'),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.conf import settings
 
+from . import sharding
+
 class Movie(models.Model):
     title=models.CharField(max_length=200)
     description=models.TextField(blank=True)
@@ -13,17 +16,34 @@ class Screen(models.Model):
     name=models.CharField(max_length=100, unique=True)
     rows=models.PositiveIntegerField()
     cols=models.PositiveIntegerField()
+    layout_version=models.PositiveIntegerField(default=1, editable=False)
     def __str__(self): return self.name
 
+# ---- per-show data: lives on a shard when CINEMA_SHARDS is set (see cinema.sharding) ----
 class Show(models.Model):
-    movie=models.ForeignKey('cinema.Movie', on_delete=models.CASCADE, related_name="shows")
-    screen=models.ForeignKey('cinema.Screen', on_delete=models.PROTECT, related_name="shows")
+    movie=models.ForeignKey('cinema.Movie', on_delete=models.CASCADE, related_name="shows", db_constraint=False)
+    screen=models.ForeignKey('cinema.Screen', on_delete=models.PROTECT, related_name="shows", db_constraint=False)
     start_time=models.DateTimeField(db_index=True)
-    price=models.DecimalField(max_digits=8, decimal_places=2, default=250)
+    price=models.DecimalField(max_digits=8, decimal_places=2, default=250)  # base price; zones scale it (cinema.pricing)
+    price_multiplier=models.DecimalField(max_digits=4, decimal_places=2, default=1)  # per show: matinee, premiere, ...
+    version=models.PositiveIntegerField(default=0, editable=False)  # bumped by every booking (cinema.booking)
     class Meta:
         unique_together=("screen","start_time")
         ordering=["start_time"]
+        indexes=[models.Index(fields=["movie","start_time"])]  # a movie's upcoming shows (advise_indexes)
     def __str__(self): return f"{self.movie.title} @ {self.start_time:%Y-%m-%d %H:%M}"
+    def clean(self):
+        if self.screen_id and self.movie_id and self.start_time:
+            from .scheduling import conflict_for
+            hit=conflict_for(self)
+            if hit and hit["reason"] in ("overlap","cleaning_gap"):
+                raise ValidationError({"start_time": f"{hit['reason'].replace('_',' ')} with another show on this screen "
+                                                     f"({hit['conflicts_with']['start_time']:%Y-%m-%d %H:%M})"})
+    def validate_unique(self, exclude=None):
+        pass  # clean() rejects any overlap on the screen (a superset of screen+start_time), on the right shard
+    def save(self, *args, **kwargs):
+        kwargs["using"]=sharding.prepare_save(self, kwargs.get("using"))
+        super().save(*args, **kwargs)
 
 class Seat(models.Model):
     screen=models.ForeignKey('cinema.Screen', on_delete=models.CASCADE, related_name="seats")
@@ -34,18 +54,172 @@ class Seat(models.Model):
         ordering=["row","col"]
     def __str__(self): return f"{self.screen.name}-{self.row}-{self.col}"
 
+class PriceZone(models.Model):
+    """Rows first_row..last_row of a screen cost show price x multiplier; rows in no zone cost the show price."""
+    screen=models.ForeignKey('cinema.Screen', on_delete=models.CASCADE, related_name="price_zones")
+    name=models.CharField(max_length=50)
+    first_row=models.PositiveIntegerField()
+    last_row=models.PositiveIntegerField()
+    multiplier=models.DecimalField(max_digits=4, decimal_places=2, default=1)
+    class Meta:
+        ordering=["screen","first_row"]
+    def __str__(self): return f"{self.screen.name} {self.name} (rows {self.first_row}-{self.last_row})"
+    def clean(self):
+        if self.first_row and self.last_row and self.first_row > self.last_row:
+            raise ValidationError({"last_row": "last_row must not be before first_row"})
+        if self.screen_id and PriceZone.objects.filter(screen_id=self.screen_id, first_row__lte=self.last_row,
+                                                       last_row__gte=self.first_row).exclude(pk=self.pk).exists():
+            raise ValidationError("overlaps another zone of this screen")
+
 class Booking(models.Model):
     PENDING="PENDING"
     CONFIRMED="CONFIRMED"
     CANCELLED="CANCELLED"
     STATUS_CHOICES=[(PENDING,"PENDING"),(CONFIRMED,"CONFIRMED"),(CANCELLED,"CANCELLED")]
 
-    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="cinema_bookings")
+    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="cinema_bookings", db_constraint=False)
     show=models.ForeignKey('cinema.Show', on_delete=models.CASCADE, related_name="bookings")
-    seats=models.ManyToManyField('cinema.Seat', related_name="bookings")
+    seats=models.ManyToManyField('cinema.Seat', related_name="bookings", db_constraint=False)
     total_amount=models.DecimalField(max_digits=10, decimal_places=2)
     status=models.CharField(max_length=10, choices=STATUS_CHOICES, default=CONFIRMED)
-    created_at=models.DateTimeField(auto_now_add=True)
+    hold_until=models.DateTimeField(null=True, blank=True)  # PENDING: a waitlist offer, void after this (cinema.cancellation)
+    created_at=models.DateTimeField(auto_now_add=True, db_index=True)
     class Meta:
         ordering=["-created_at"]
+        indexes=[models.Index(fields=["user","created_at"]),  # my bookings, newest first (advise_indexes)
+                 models.Index(fields=["status","hold_until"])]  # expire_holds
     def __str__(self): return f"Booking {self.id} by {self.user}"
+    def save(self, *args, **kwargs):
+        kwargs["using"]=sharding.prepare_save(self, kwargs.get("using"))
+        super().save(*args, **kwargs)
+
+# ---- waitlist (cinema.cancellation): one row per wanted seat, offered in id order as seats free up ----
+class WaitlistEntry(models.Model):
+    WAITING="WAITING"
+    OFFERED="OFFERED"
+    CONFIRMED="CONFIRMED"
+    EXPIRED="EXPIRED"
+    CANCELLED="CANCELLED"
+    STATUS_CHOICES=[(WAITING,"WAITING"),(OFFERED,"OFFERED"),(CONFIRMED,"CONFIRMED"),(EXPIRED,"EXPIRED"),(CANCELLED,"CANCELLED")]
+
+    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="waitlist_entries")
+    show_id=models.BigIntegerField()   # the show may live on a shard
+    status=models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    booking_id=models.BigIntegerField(null=True, blank=True)  # the PENDING hold offered to this entry
+    created_at=models.DateTimeField(auto_now_add=True)
+    class Meta:
+        ordering=["id"]
+        indexes=[models.Index(fields=["show_id","status","id"]),  # next k waiting for a show, FIFO
+                 models.Index(fields=["booking_id"])]
+    def __str__(self): return f"waitlist show={self.show_id} user={self.user_id} {self.status}"
+
+class ShardSequence(models.Model):
+    """One row per allocated Show/Booking id on this shard; see sharding.allocate_id."""
+    def __str__(self): return f"seq {self.id}"
+
+
+# ---- rollups: maintained incrementally by cinema.rollups, never by dashboards ----
+class ShowStats(models.Model):
+    # DO_NOTHING: the show may live on a shard; signals.show_deleted removes the row
+    show=models.OneToOneField('cinema.Show', on_delete=models.DO_NOTHING, primary_key=True, related_name="stats", db_constraint=False)
+    movie=models.ForeignKey('cinema.Movie', on_delete=models.CASCADE, related_name="+")
+    screen=models.ForeignKey('cinema.Screen', on_delete=models.CASCADE, related_name="+")
+    day=models.DateField(db_index=True)
+    capacity=models.PositiveIntegerField(default=0)
+    seats_sold=models.IntegerField(default=0)
+    bookings=models.IntegerField(default=0)
+    revenue=models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at=models.DateTimeField(auto_now=True)
+    def __str__(self): return f"stats show={self.show_id}"
+
+class MovieDayStats(models.Model):
+    movie=models.ForeignKey('cinema.Movie', on_delete=models.CASCADE, related_name="day_stats")
+    day=models.DateField()
+    shows=models.IntegerField(default=0)
+    capacity=models.PositiveIntegerField(default=0)
+    seats_sold=models.IntegerField(default=0)
+    bookings=models.IntegerField(default=0)
+    revenue=models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    class Meta:
+        unique_together=("movie","day")
+        indexes=[models.Index(fields=["day","movie"])]
+    def __str__(self): return f"stats movie={self.movie_id} {self.day}"
+
+class ScreenDayStats(models.Model):
+    screen=models.ForeignKey('cinema.Screen', on_delete=models.CASCADE, related_name="day_stats")
+    day=models.DateField()
+    shows=models.IntegerField(default=0)
+    capacity=models.PositiveIntegerField(default=0)
+    seats_sold=models.IntegerField(default=0)
+    bookings=models.IntegerField(default=0)
+    revenue=models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    class Meta:
+        unique_together=("screen","day")
+        indexes=[models.Index(fields=["day","screen"])]
+    def __str__(self): return f"stats screen={self.screen_id} {self.day}"
+
+
+# ---- archive (cinema.archive): bookings of long-played shows, moved off the hot tables ----
+class ArchivedBooking(models.Model):
+    """A Booking (same id) plus what history needs of its show, frozen when archived; lives on "default"."""
+    id=models.BigIntegerField(primary_key=True)
+    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_bookings")
+    show_id=models.BigIntegerField()
+    movie_id=models.BigIntegerField()
+    screen_id=models.BigIntegerField()
+    movie_title=models.CharField(max_length=200)
+    show_start_time=models.DateTimeField()
+    seat_ids=models.TextField(blank=True)       # comma-separated Seat ids
+    seat_number=models.TextField(blank=True)    # seat labels as shown at archive time ("1,2")
+    total_amount=models.DecimalField(max_digits=10, decimal_places=2)
+    status=models.CharField(max_length=10, choices=Booking.STATUS_CHOICES)
+    created_at=models.DateTimeField()
+    archived_at=models.DateTimeField(auto_now_add=True)
+    class Meta:
+        ordering=["-created_at"]
+        indexes=[models.Index(fields=["user","created_at"]), models.Index(fields=["show_id"])]
+    def __str__(self): return f"Archived booking {self.id}"
+
+
+# ---- trending leaderboards (cinema.trending): time-decayed seats sold per movie / show ----
+class TrendingScore(models.Model):
+    MOVIE="movie"
+    SHOW="show"
+    KIND_CHOICES=[(MOVIE,"movie"),(SHOW,"show")]
+
+    kind=models.CharField(max_length=5, choices=KIND_CHOICES)
+    object_id=models.BigIntegerField()  # movie id or show id (shows may live on a shard)
+    movie=models.ForeignKey('cinema.Movie', on_delete=models.CASCADE, related_name="+")
+    starts_at=models.DateTimeField(null=True, blank=True)  # shows only; the row stops counting after this
+    # decayed value at time t is score * 2 ** ((epoch - t) / half-life); see trending.py
+    score=models.FloatField(default=0)
+    epoch=models.BigIntegerField()
+    updated_at=models.DateTimeField(auto_now=True)
+    class Meta:
+        unique_together=("kind","object_id")
+    def __str__(self): return f"trending {self.kind}={self.object_id}"
+
+
+# ---- background tasks (cinema.tasks); one row per queued call ----
+class Task(models.Model):
+    QUEUED="QUEUED"
+    RUNNING="RUNNING"
+    DONE="DONE"
+    FAILED="FAILED"
+    STATUS_CHOICES=[(QUEUED,"QUEUED"),(RUNNING,"RUNNING"),(DONE,"DONE"),(FAILED,"FAILED")]
+
+    name=models.CharField(max_length=100)
+    payload=models.JSONField(default=dict, blank=True)
+    status=models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts=models.PositiveIntegerField(default=0)
+    max_attempts=models.PositiveIntegerField(default=5)
+    run_after=models.DateTimeField()
+    created_at=models.DateTimeField(auto_now_add=True)
+    started_at=models.DateTimeField(null=True, blank=True)
+    finished_at=models.DateTimeField(null=True, blank=True)
+    wait_ms=models.PositiveIntegerField(null=True, blank=True)
+    run_ms=models.PositiveIntegerField(null=True, blank=True)
+    last_error=models.TextField(blank=True)
+    class Meta:
+        indexes=[models.Index(fields=["status","run_after"]), models.Index(fields=["name","finished_at"])]
+    def __str__(self): return f"{self.name}#{self.id} {self.status}"
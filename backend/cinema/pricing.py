@@ -0,0 +1,149 @@
+# backend/cinema/pricing.py
+"""
+Tiered seat prices.
+
+    seat price = Show.price x Show.price_multiplier x multiplier of the PriceZone
+                 covering the seat's row (1 for rows in no zone), rounded half-up
+
+All arithmetic is in integer cents / hundredths. For one (screen layout, base
+price, show multiplier) the price of every seat is a single array in layout
+order, built once per process from a per-row table (a screen has tens of rows,
+not hundreds of seats, to price):
+
+    vector(layout, price, multiplier)[i]    cents of seat i
+    total(vec, indices)                     cents of a booking
+
+Zones are read with the layout and memoised under its key; PriceZone edits bump
+the screen's layout version (signals), so every vector of that screen is
+rebuilt on next use. The booking paths price from the Show row they already
+read (under the lock, in the locking path), so totals are always current.
+Seat maps do not read the Show row: its (price, multiplier) is cached per show
+(SHOW_PRICE_KEY, refreshed on save; queryset updates that bypass save() show
+up after SHOW_PRICE_TTL). With a per-process cache (LocMem) another worker's
+save is invisible, so there the terms expire with the layout versions, after
+CINEMA_LOCAL_VERSION_TTL_S (layout.version_ttl()).
+"""
+from __future__ import annotations
+
+import threading
+from array import array
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+
+from . import layout, sharding
+from .models import PriceZone, Show
+
+SHOW_PRICE_KEY = "cinema:show-price:{}"
+SHOW_PRICE_TTL = 60 * 60
+MAX_VECTORS = 4096
+
+_zones = {}     # layout key -> per-row multiplier (hundredths), index = row number
+_vectors = {}   # (layout key, price cents, multiplier hundredths) -> array of cents
+_lock = threading.Lock()
+
+
+def cents(value):
+    return int((Decimal(str(value)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def as_decimal(c):
+    return Decimal(c).scaleb(-2)
+
+
+def label(c):
+    return f"{c // 100}.{c % 100:02d}"
+
+
+def _row_multipliers(lay):
+    hit = _zones.get(lay.key)
+    if hit is None:
+        top = max(lay.seat_rows, default=0)
+        hit = [100] * (top + 1)
+        for first, last, m in PriceZone.objects.filter(screen_id=lay.screen_id).order_by("first_row").values_list(
+                "first_row", "last_row", "multiplier"):
+            for r in range(first, min(last, top) + 1):
+                hit[r] = cents(m)
+        with _lock:
+            _zones[lay.key] = hit = tuple(hit)
+    return hit
+
+
+def vector(lay, price, multiplier=1):
+    """Cents per seat of the layout (an array in seat order), shared by every show with these terms."""
+    key = (lay.key, cents(price), cents(multiplier))
+    vec = _vectors.get(key)
+    if vec is None:
+        _, base, show_m = key
+        # a product of two hundredths: / 10_000, rounded half-up
+        per_row = [(base * show_m * zone_m + 5000) // 10000 for zone_m in _row_multipliers(lay)]
+        vec = array("q", map(per_row.__getitem__, lay.seat_rows))
+        with _lock:
+            if len(_vectors) >= MAX_VECTORS:
+                _vectors.clear()
+            _vectors[key] = vec
+    return vec
+
+
+def has_vector(lay, price, multiplier=1):
+    return (lay.key, cents(price), cents(multiplier)) in _vectors
+
+
+def total(vec, indices):
+    return sum(map(vec.__getitem__, indices))
+
+
+def runs(vec):
+    """[[cents, count], ...] over seat order: the compact seat map's prices (rows are contiguous runs)."""
+    out = []
+    for c in vec:
+        if out and out[-1][0] == c:
+            out[-1][1] += 1
+        else:
+            out.append([c, 1])
+    return out
+
+
+# -------------------------------------------------------------------
+# per-show terms (seat maps)
+# -------------------------------------------------------------------
+def _terms_ttl():
+    return SHOW_PRICE_TTL if layout.shared_cache() else layout.version_ttl()
+
+
+def remember(show):
+    cache.set(SHOW_PRICE_KEY.format(show.id), (cents(show.price), cents(show.price_multiplier)), _terms_ttl())
+
+
+def remember_many(rows):
+    """remember() for (show_id, price, multiplier) rows, one cache round trip."""
+    cache.set_many({SHOW_PRICE_KEY.format(i): (cents(p), cents(m)) for i, p, m in rows}, _terms_ttl())
+
+
+def forget_show(show_id):
+    cache.delete(SHOW_PRICE_KEY.format(show_id))
+
+
+def show_terms(show_id):
+    """(price, multiplier) of a show as Decimals, or None if it does not exist."""
+    key = SHOW_PRICE_KEY.format(show_id)
+    terms = cache.get(key)
+    if terms is None:
+        row = (Show.objects.using(sharding.shard_for_show(show_id)).filter(id=show_id)
+               .values_list("price", "price_multiplier").first())
+        if row is None:
+            return None
+        terms = (cents(row[0]), cents(row[1]))
+        cache.set(key, terms, _terms_ttl())
+    return as_decimal(terms[0]), as_decimal(terms[1])
+
+
+def for_show(show_id, lay):
+    terms = show_terms(show_id)
+    return vector(lay, *terms) if terms is not None else None
+
+
+def forget():
+    with _lock:
+        _zones.clear()
+        _vectors.clear()
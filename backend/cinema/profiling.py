@@ -0,0 +1,47 @@
+# backend/cinema/profiling.py
+"""In-process statistical stack sampler producing collapsed stacks ("a;b;c 42")."""
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+_busy = threading.Lock()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def sample(seconds, interval=0.005):
+    """Sample all other threads for `seconds`; returns (Counter of stack tuples, samples taken)."""
+    if not _busy.acquire(blocking=False):
+        raise RuntimeError("a profile is already running")
+    try:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+        return stacks, samples
+    finally:
+        _busy.release()
+
+
+def collapsed(stacks):
+    return "".join(f"{';'.join(s)} {n}\n" for s, n in stacks.most_common())
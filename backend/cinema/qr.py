@@ -0,0 +1,316 @@
+# backend/cinema/qr.py
+"""
+Minimal pure-Python QR Code encoder (byte mode, error correction level M,
+versions 1-10 => up to 213 bytes), plus SVG and PNG writers.
+
+No Django imports on purpose: cinema.tickets runs these functions in worker
+processes.
+"""
+from __future__ import annotations
+
+import struct
+import zlib
+
+# version -> (ec codewords per block, [(blocks, data codewords per block), ...]) for level M
+_BLOCKS_M = {
+    1: (10, [(1, 16)]),
+    2: (16, [(1, 28)]),
+    3: (26, [(1, 44)]),
+    4: (18, [(2, 32)]),
+    5: (24, [(2, 43)]),
+    6: (16, [(4, 27)]),
+    7: (18, [(4, 31)]),
+    8: (22, [(2, 38), (2, 39)]),
+    9: (22, [(3, 36), (2, 37)]),
+    10: (26, [(4, 43), (1, 44)]),
+}
+_ALIGN = {
+    1: [], 2: [6, 18], 3: [6, 22], 4: [6, 26], 5: [6, 30],
+    6: [6, 34], 7: [6, 22, 38], 8: [6, 24, 42], 9: [6, 26, 46], 10: [6, 28, 50],
+}
+_ECL_M_FORMAT_BITS = 0b00
+
+_MASKS = [
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+]
+
+
+class QRCapacityError(ValueError):
+    pass
+
+
+# -------------------------------------------------------------------
+# Reed-Solomon over GF(256), polynomial 0x11D
+# -------------------------------------------------------------------
+def _gf_mul(x, y):
+    z = 0
+    for i in reversed(range(8)):
+        z = (z << 1) ^ ((z >> 7) * 0x11D)
+        z ^= ((y >> i) & 1) * x
+    return z
+
+
+def _rs_divisor(degree):
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_mul(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_mul(root, 0x02)
+    return result
+
+
+def _rs_remainder(data, divisor):
+    result = [0] * len(divisor)
+    for b in data:
+        factor = b ^ result.pop(0)
+        result.append(0)
+        for i, coef in enumerate(divisor):
+            result[i] ^= _gf_mul(coef, factor)
+    return result
+
+
+# -------------------------------------------------------------------
+# encoding
+# -------------------------------------------------------------------
+def _data_capacity(version):
+    _, groups = _BLOCKS_M[version]
+    return sum(n * k for n, k in groups)
+
+
+def _codewords(data, version):
+    cc_bits = 8 if version < 10 else 16
+    bits = []
+
+    def put(value, n):
+        bits.extend((value >> i) & 1 for i in reversed(range(n)))
+
+    put(0b0100, 4)
+    put(len(data), cc_bits)
+    for b in data:
+        put(b, 8)
+    cap_bits = _data_capacity(version) * 8
+    put(0, min(4, cap_bits - len(bits)))
+    put(0, (-len(bits)) % 8)
+    out = [int("".join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(out) < cap_bits // 8:
+        out.append(pad)
+        pad ^= 0xEC ^ 0x11
+    return out
+
+
+def _interleave(data, version):
+    ec_len, groups = _BLOCKS_M[version]
+    divisor = _rs_divisor(ec_len)
+    blocks, k = [], 0
+    for n, size in groups:
+        for _ in range(n):
+            chunk = data[k:k + size]
+            k += size
+            blocks.append((chunk, _rs_remainder(chunk, divisor)))
+    out = []
+    for i in range(max(len(b[0]) for b in blocks)):
+        out.extend(b[0][i] for b in blocks if i < len(b[0]))
+    for i in range(ec_len):
+        out.extend(b[1][i] for b in blocks)
+    return out
+
+
+class _Matrix:
+    def __init__(self, version):
+        self.version = version
+        self.size = version * 4 + 17
+        self.mod = [[False] * self.size for _ in range(self.size)]
+        self.fn = [[False] * self.size for _ in range(self.size)]
+        self._function_patterns()
+
+    def set_fn(self, x, y, dark):
+        self.mod[y][x] = dark
+        self.fn[y][x] = True
+
+    def _function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self.set_fn(6, i, i % 2 == 0)
+            self.set_fn(i, 6, i % 2 == 0)
+        for cx, cy in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    x, y = cx + dx, cy + dy
+                    if 0 <= x < size and 0 <= y < size:
+                        self.set_fn(x, y, max(abs(dx), abs(dy)) not in (2, 4))
+        pos = _ALIGN[self.version]
+        last = len(pos) - 1
+        for i, ax in enumerate(pos):
+            for j, ay in enumerate(pos):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self.set_fn(ax + dx, ay + dy, max(abs(dx), abs(dy)) != 1)
+        self.draw_format(0)
+        self.draw_version()
+
+    def draw_format(self, mask):
+        data = _ECL_M_FORMAT_BITS << 3 | mask
+        rem = data
+        for _ in range(10):
+            rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+        bits = (data << 10 | rem) ^ 0x5412
+        bit = lambda i: (bits >> i) & 1 == 1  # noqa: E731
+        size = self.size
+        for i in range(6):
+            self.set_fn(8, i, bit(i))
+        self.set_fn(8, 7, bit(6))
+        self.set_fn(8, 8, bit(7))
+        self.set_fn(7, 8, bit(8))
+        for i in range(9, 15):
+            self.set_fn(14 - i, 8, bit(i))
+        for i in range(8):
+            self.set_fn(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self.set_fn(8, size - 15 + i, bit(i))
+        self.set_fn(8, size - 8, True)
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        rem = self.version
+        for _ in range(12):
+            rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+        bits = self.version << 12 | rem
+        for i in range(18):
+            dark = (bits >> i) & 1 == 1
+            a, b = self.size - 11 + i % 3, i // 3
+            self.set_fn(a, b, dark)
+            self.set_fn(b, a, dark)
+
+    def draw_codewords(self, data):
+        size, i, total = self.size, 0, len(data) * 8
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = ((right + 1) & 2) == 0
+            for vert in range(size):
+                y = size - 1 - vert if upward else vert
+                for j in range(2):
+                    x = right - j
+                    if not self.fn[y][x] and i < total:
+                        self.mod[y][x] = (data[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        f = _MASKS[mask]
+        for y in range(self.size):
+            row, fn = self.mod[y], self.fn[y]
+            for x in range(self.size):
+                if not fn[x] and f(x, y):
+                    row[x] = not row[x]
+
+    def penalty(self):
+        size, mod = self.size, self.mod
+        score = 0
+        lines = mod + [list(col) for col in zip(*mod)]
+        finder = ((True, False, True, True, True, False, True, False, False, False, False),
+                  (False, False, False, False, True, False, True, True, True, False, True))
+        for line in lines:
+            run, prev = 0, None
+            for v in line:
+                if v == prev:
+                    run += 1
+                else:
+                    if run >= 5:
+                        score += 3 + run - 5
+                    run, prev = 1, v
+            if run >= 5:
+                score += 3 + run - 5
+            t = tuple(line)
+            for k in range(size - 10):
+                if t[k:k + 11] in finder:
+                    score += 40
+        for y in range(size - 1):
+            for x in range(size - 1):
+                c = mod[y][x]
+                if c == mod[y][x + 1] == mod[y + 1][x] == mod[y + 1][x + 1]:
+                    score += 3
+        dark = sum(map(sum, mod))
+        total = size * size
+        score += ((abs(dark * 20 - total * 10) + total - 1) // total - 1) * 10
+        return score
+
+
+def encode(data):
+    """Return the QR module matrix (list of rows of bools, True = dark) for bytes/str."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    for version in _BLOCKS_M:
+        need = 4 + (8 if version < 10 else 16) + len(data) * 8
+        if need <= _data_capacity(version) * 8:
+            break
+    else:
+        raise QRCapacityError(f"{len(data)} bytes does not fit a version 1-10 (level M) QR code")
+
+    codewords = _interleave(_codewords(data, version), version)
+    best, best_score = None, None
+    for mask in range(8):
+        m = _Matrix(version)
+        m.draw_codewords(codewords)
+        m.apply_mask(mask)
+        m.draw_format(mask)
+        score = m.penalty()
+        if best_score is None or score < best_score:
+            best, best_score = m, score
+    return best.mod
+
+
+# -------------------------------------------------------------------
+# output
+# -------------------------------------------------------------------
+def svg_path(matrix, x0=0, y0=0, scale=1):
+    """SVG path data: one horizontal run of dark modules per subpath."""
+    parts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                parts.append(f"M{x0 + start * scale} {y0 + y * scale}h{(x - start) * scale}v{scale}h-{(x - start) * scale}z")
+            else:
+                x += 1
+    return "".join(parts)
+
+
+def to_png(matrix, scale=8, border=4):
+    """Grayscale 8-bit PNG bytes of the matrix with a quiet-zone border."""
+    n = len(matrix)
+    side = (n + 2 * border) * scale
+    light, dark = b"\xff", b"\x00"
+    blank = b"\x00" + light * side
+    raw = [blank] * (border * scale)
+    for row in matrix:
+        line = b"\x00" + light * (border * scale) + b"".join((dark if v else light) * scale for v in row) \
+            + light * (border * scale)
+        raw.extend([line] * scale)
+    raw.extend([blank] * (border * scale))
+
+    def chunk(tag, body):
+        return struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"".join(raw), 9))
+            + chunk(b"IEND", b""))
@@ -0,0 +1,419 @@
+# backend/cinema/query_plans.py
+"""
+Index advisor: capture the SQL a workload runs, EXPLAIN it, propose indexes.
+
+Capture installs an execute wrapper on every connection (also ones opened
+later by the test runner or worker threads) and tags each statement with the
+URL name of the request running it. Every distinct statement (IN lists
+collapsed) is EXPLAINed on its own database on its 1st, 2nd, 4th, 8th... call,
+so what is kept is the plan for the largest data the workload reached, at
+O(log calls) extra cost:
+
+    SQLite  EXPLAIN QUERY PLAN   SCAN t, USE TEMP B-TREE FOR ORDER BY / GROUP BY / DISTINCT,
+                                 AUTOMATIC INDEX (the planner built a throwaway index)
+    MySQL   EXPLAIN              type ALL / index, Using filesort, Using temporary
+
+A flagged table gets a proposal from the statement itself: its equality
+columns (join columns only when nothing else filters it), then the ORDER BY
+columns for a sort (or a whole-index walk that avoided one), the GROUP BY
+columns for a temporary table, else the first range column; a trailing pk is dropped (every index ends with it
+anyway) and statements that look up a unique column are left alone.
+Proposals that an existing index already covers as a prefix (pk, FK /
+db_index / unique columns, unique_together, Meta.indexes) are dropped. The
+estimated benefit is rows read or sorted per call, from COUNT(*) and
+COUNT(DISTINCT equality prefix), times calls.
+
+EXPLAIN and the counts go through the backend's raw cursor, so query-count
+assertions in a captured test run don't see them.
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+
+from django.apps import apps as django_apps
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, connections, models
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+
+FULL_SCAN, INDEX_SCAN, AUTO_INDEX = "full_scan", "index_scan", "auto_index"
+FILESORT, TEMPORARY = "filesort", "temporary"
+SCANS = (FULL_SCAN, INDEX_SCAN, AUTO_INDEX)
+NO_REQUEST = "<no request>"
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+RANGE_SELECTIVITY = 3      # rows / matched for a range predicate when nothing else is known
+
+_IN_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+_KEYWORDS = r"(?:INNER|LEFT|RIGHT|OUTER|CROSS|JOIN|ON|WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|FOR|SET|USING)\b"
+_TABLE = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"(\w+)"(?:\s+(?:AS\s+)?"?(?!' + _KEYWORDS + r')(\w+)"?)?', re.I)
+_REF = r'"?(\w+)"?\."(\w+)"'
+_PRED = re.compile(_REF + r"\s*(<=|>=|<>|!=|=|<|>|IN\b|IS\b|BETWEEN\b|LIKE\b)\s*(?:" + _REF + ")?", re.I)
+_ORDER = re.compile(r"\bORDER BY\b(.*?)(?:\bLIMIT\b|\bFOR UPDATE\b|\)|$)", re.I | re.S)
+_GROUP = re.compile(r"\bGROUP BY\b(.*?)(?:\bHAVING\b|\bORDER BY\b|\bLIMIT\b|\)|$)", re.I | re.S)
+_SQLITE_STEP = re.compile(r"^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS (\S+))?(.*)$")
+
+
+def fingerprint(sql):
+    return _IN_LIST.sub("%s, ...", sql)
+
+
+# -------------------------------------------------------------------
+# reading the SQL
+# -------------------------------------------------------------------
+def analyse(sql):
+    """(alias -> table, {table: {"eq", "join", "range", "order", "group": [columns]}}) from the SQL text."""
+    sql = sql.replace("`", '"')
+    alias = {}
+    for table, name in _TABLE.findall(sql):
+        alias[table] = table
+        if name:
+            alias[name] = table
+    shape = {}
+
+    def add(key, ref, column):
+        table = alias.get(ref)
+        if table is not None:
+            cols = shape.setdefault(table, {k: [] for k in ("eq", "join", "range", "order", "group")})[key]
+            if column not in cols:
+                cols.append(column)
+
+    for ref, column, op, ref2, column2 in _PRED.findall(sql):
+        op = op.upper()
+        if ref2:
+            if op == "=":
+                add("join", ref, column)
+                add("join", ref2, column2)
+        elif op in ("=", "IN", "IS"):
+            add("eq", ref, column)
+        elif op in ("<", ">", "<=", ">=", "BETWEEN"):
+            add("range", ref, column)
+    for key, rx in (("order", _ORDER), ("group", _GROUP)):
+        for clause in rx.findall(sql):
+            for ref, column in re.findall(_REF, clause):
+                add(key, ref, column)
+    return alias, shape
+
+
+def propose(cols, kinds):
+    """Index columns for one table of one statement: (columns, how many of them are equality seeks)."""
+    eq = cols["eq"] or cols["join"]
+    if (FILESORT in kinds or INDEX_SCAN in kinds) and cols["order"]:  # sorted, or walked an index to avoid it
+        tail = cols["order"]
+    elif TEMPORARY in kinds and cols["group"]:
+        tail = cols["group"]
+    else:
+        tail = cols["range"][:1]
+    out = list(eq)
+    out += [c for c in tail if c not in out]
+    return tuple(out), len(eq)
+
+
+# -------------------------------------------------------------------
+# EXPLAIN
+# -------------------------------------------------------------------
+def _raw(connection, sql, params=()):
+    with connection.wrap_database_errors:
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(sql, params)
+            return [d[0] for d in cursor.description or ()], cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def explain(connection, sql, params):
+    """[(kind, table or alias or None, plan line)] for one statement; None when the backend isn't supported."""
+    if connection.vendor == "sqlite":
+        _, rows = _raw(connection, "EXPLAIN QUERY PLAN " + sql, params)
+        return _sqlite_flags([r[-1] for r in rows])
+    if connection.vendor == "mysql":
+        return _mysql_flags(*_raw(connection, "EXPLAIN " + sql, params))
+    return None
+
+
+def _sqlite_flags(lines):
+    out = []
+    for line in lines:
+        m = _SQLITE_STEP.match(line)
+        if m:
+            op, name, alias, rest = m.groups()
+            if "AUTOMATIC" in rest:
+                out.append((AUTO_INDEX, alias or name, line))
+            elif op == "SCAN" and name != "CONSTANT":
+                out.append((INDEX_SCAN if "INDEX" in rest else FULL_SCAN, alias or name, line))
+        elif line.startswith("USE TEMP B-TREE FOR ORDER BY"):
+            out.append((FILESORT, None, line))
+        elif line.startswith("USE TEMP B-TREE FOR"):
+            out.append((TEMPORARY, None, line))
+    return out
+
+
+def _mysql_flags(columns, rows):
+    out = []
+    for row in rows:
+        r = dict(zip(columns, row))
+        table, extra = r.get("table"), r.get("Extra") or ""
+        line = f"{table}: type={r.get('type')} key={r.get('key')} rows={r.get('rows')} {extra}".strip()
+        if r.get("type") == "ALL":
+            out.append((FULL_SCAN, table, line))
+        elif r.get("type") == "index":
+            out.append((INDEX_SCAN, table, line))
+        if "Using filesort" in extra:
+            out.append((FILESORT, table, line))
+        if "Using temporary" in extra:
+            out.append((TEMPORARY, table, line))
+    return out
+
+
+# -------------------------------------------------------------------
+# models and the indexes they already have
+# -------------------------------------------------------------------
+def models_by_table(app_labels):
+    return {m._meta.db_table: m for m in django_apps.get_models(include_auto_created=True)
+            if m._meta.app_label in app_labels and not m._meta.proxy}
+
+
+def existing_indexes(model):
+    meta = model._meta
+    column = lambda name: meta.get_field(name.lstrip("-")).column
+    out = [(meta.pk.column,)]
+    out += [(f.column,) for f in meta.local_fields if f.db_index or f.unique]
+    out += [tuple(column(n) for n in fields) for fields in meta.unique_together]
+    out += [tuple(column(n) for n in c.fields) for c in meta.total_unique_constraints]
+    out += [tuple(column(n) for n in idx.fields) for idx in meta.indexes if idx.fields]
+    return out
+
+
+def covered(columns, existing):
+    return any(ix[:len(columns)] == columns for ix in existing)
+
+
+# -------------------------------------------------------------------
+# capture
+# -------------------------------------------------------------------
+class Statement:
+    def __init__(self, alias, sql):
+        self.alias = alias
+        self.sql = sql
+        self.calls = 0
+        self.endpoints = Counter()
+        self.tables = {}     # table -> observation from the largest data seen (see Capture._observe)
+
+
+class Capture:
+    """
+    with Capture(("cinema", "users")) as cap:
+        ... run a workload ...
+    cap.report()
+    """
+
+    def __init__(self, app_labels=("cinema", "users")):
+        self.models = models_by_table(app_labels)
+        self.statements = {}
+        self.active = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        self.active = True
+        for conn in connections.all():
+            self._hook(conn)
+        connection_created.connect(self._connected, weak=False)
+        request_started.connect(self._started, weak=False)
+        request_finished.connect(self._finished, weak=False)
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+        connection_created.disconnect(self._connected)
+        request_started.disconnect(self._started)
+        request_finished.disconnect(self._finished)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+    def _hook(self, conn):
+        if self not in conn.execute_wrappers:
+            conn.execute_wrappers.append(self)
+
+    def _connected(self, sender, connection, **kwargs):
+        if self.active:
+            self._hook(connection)
+
+    def _started(self, sender, environ=None, **kwargs):
+        path = (environ or {}).get("PATH_INFO", "")
+        try:
+            self._local.endpoint = resolve(path).view_name
+        except Resolver404:
+            self._local.endpoint = path
+
+    def _finished(self, sender, **kwargs):
+        self._local.endpoint = None
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if not self.active or many or not sql or sql.lstrip().split(None, 1)[0].upper() not in EXPLAINABLE:
+            return result
+        conn = context["connection"]
+        key = (conn.alias, fingerprint(sql))
+        with self._lock:
+            st = self.statements.get(key)
+            if st is None:
+                st = self.statements[key] = Statement(*key)
+            st.calls += 1
+            st.endpoints[getattr(self._local, "endpoint", None) or NO_REQUEST] += 1
+            due = st.calls & (st.calls - 1) == 0
+        if due and not conn.needs_rollback:
+            try:
+                self._observe(st, conn, sql, params)
+            except DatabaseError:
+                pass  # e.g. a statement EXPLAIN doesn't accept; the workload itself carries on
+        return result
+
+    def _observe(self, st, conn, sql, params):
+        flags = explain(conn, sql, params or ())
+        if not flags:
+            return
+        alias, shape = analyse(sql)
+        kinds = {}
+        for kind, name, line in flags:
+            if name is not None:
+                tables = [alias.get(name, name)]
+            else:  # SQLite's temp b-trees aren't tied to a table
+                key = "order" if kind == FILESORT else "group"
+                tables = [t for t, cols in shape.items() if cols[key]]
+            for table in tables:
+                if table in self.models:
+                    kinds.setdefault(table, ({}, []))[0][kind] = True
+                    kinds[table][1].append(line)
+
+        for table, (found, lines) in kinds.items():
+            cols = shape.get(table) or {k: [] for k in ("eq", "join", "range", "order", "group")}
+            meta = self.models[table]._meta
+            if any(f.column in cols["eq"] for f in meta.local_fields if f.primary_key or f.unique):
+                continue  # a unique lookup reads at most a handful of rows whatever the plan says
+            columns, seeks = propose(cols, found)
+            columns = columns[:seeks] + tuple(c for c in columns[seeks:] if c != meta.pk.column)  # implicit in every index
+            rows = _count(conn, table)
+            prev = st.tables.get(table)
+            if prev is not None and prev["rows"] > rows:
+                continue
+            matched = rows
+            if seeks:
+                matched = rows / max(1, _distinct(conn, table, columns[:seeks]))
+            elif len(columns) > seeks:
+                matched = rows / RANGE_SELECTIVITY
+            read = rows if any(k in found for k in SCANS) else matched
+            sort = matched if (FILESORT in found or TEMPORARY in found) else 0
+            st.tables[table] = {
+                "kinds": sorted(found), "plan": lines, "columns": columns,
+                "rows": rows, "matched": round(matched, 1),
+                "saved": round(max(0.0, read - matched) + (sort if columns else 0), 1),
+            }
+
+    # ---------------------------------------------------------------
+    def report(self):
+        """{"statements", "calls", "endpoints": {name: [flag]}, "proposals": [...]} for everything captured."""
+        endpoints, wanted = {}, {}
+        for st in self.statements.values():
+            for table, ob in st.tables.items():
+                for endpoint, calls in st.endpoints.items():
+                    endpoints.setdefault(endpoint, []).append({
+                        "table": table, "kinds": ob["kinds"], "calls": calls, "rows": ob["rows"],
+                        "sql": st.sql[:300], "plan": ob["plan"],
+                    })
+                if not ob["columns"]:
+                    continue
+                p = wanted.setdefault((table, ob["columns"]), {"calls": 0, "saved": 0.0, "rows": 0,
+                                                               "endpoints": set(), "statements": 0})
+                p["calls"] += st.calls
+                p["saved"] += st.calls * ob["saved"]
+                p["rows"] = max(p["rows"], ob["rows"])
+                p["endpoints"].update(st.endpoints)
+                p["statements"] += 1
+
+        # an index on (a, b) also serves (a): fold the shorter proposal into the longer one
+        for (table, cols) in sorted(wanted, key=lambda k: len(k[1])):
+            longer = [k for k in wanted if k[0] == table and len(k[1]) > len(cols) and k[1][:len(cols)] == cols]
+            if longer:
+                p, into = wanted.pop((table, cols)), wanted[longer[0]]
+                for k in ("calls", "saved", "statements"):
+                    into[k] += p[k]
+                into["endpoints"] |= p["endpoints"]
+
+        proposals = []
+        for (table, cols), p in wanted.items():
+            model = self.models[table]
+            if covered(cols, existing_indexes(model)):
+                continue
+            by_column = {f.column: f.name for f in model._meta.local_fields}
+            if any(c not in by_column for c in cols):
+                continue
+            index = models.Index(fields=[by_column[c] for c in cols])
+            index.set_name_with_model(model)
+            proposals.append({
+                "model": model._meta.label, "table": table, "fields": list(index.fields), "columns": list(cols),
+                "name": index.name, "calls": p["calls"], "statements": p["statements"], "rows": p["rows"],
+                "estimated_rows_saved": round(p["saved"]), "endpoints": sorted(p["endpoints"]),
+            })
+        proposals.sort(key=lambda p: (-p["estimated_rows_saved"], p["model"], p["fields"]))
+        for flags in endpoints.values():
+            flags.sort(key=lambda f: (-f["calls"], f["table"]))
+        return {
+            "statements": len(self.statements),
+            "calls": sum(st.calls for st in self.statements.values()),
+            "endpoints": dict(sorted(endpoints.items())),
+            "proposals": proposals,
+        }
+
+
+def _count(conn, table):
+    q = conn.ops.quote_name
+    return _raw(conn, f"SELECT COUNT(*) FROM {q(table)}")[1][0][0]
+
+
+def _distinct(conn, table, columns):
+    q = conn.ops.quote_name
+    cols = ", ".join(q(c) for c in columns)
+    return _raw(conn, f"SELECT COUNT(*) FROM (SELECT DISTINCT {cols} FROM {q(table)}) d")[1][0][0]
+
+
+# -------------------------------------------------------------------
+# migration
+# -------------------------------------------------------------------
+def migration_source(app_label, proposals, dependencies):
+    """A migration adding the proposed indexes of one app; auto-created M2M tables go through RunPython."""
+    from django.db.migrations.writer import MigrationWriter
+
+    ops, helpers = [], []
+    for p in proposals:
+        model = django_apps.get_model(p["model"])
+        index, _ = MigrationWriter.serialize(models.Index(fields=p["fields"], name=p["name"]))
+        meta = model._meta
+        if not meta.auto_created:
+            ops.append(f"        migrations.AddIndex(model_name={meta.model_name!r}, index={index}),")
+            continue
+        owner = meta.auto_created._meta
+        field = next(f.name for f in owner.local_many_to_many if f.remote_field.through is model)
+        fn = f"{owner.model_name}_{field}_{p['name']}"
+        helpers.append(
+            f"def add_{fn}(apps, schema_editor):\n"
+            f"    through = apps.get_model({app_label!r}, {owner.model_name!r})._meta.get_field({field!r}).remote_field.through\n"
+            f"    schema_editor.add_index(through, {index})\n\n\n"
+            f"def remove_{fn}(apps, schema_editor):\n"
+            f"    through = apps.get_model({app_label!r}, {owner.model_name!r})._meta.get_field({field!r}).remote_field.through\n"
+            f"    schema_editor.remove_index(through, {index})\n\n\n"
+        )
+        ops.append(f"        migrations.RunPython(add_{fn}, remove_{fn}, hints={{'model_name': {meta.model_name!r}}}),")
+
+    deps = "".join(f"        ({a!r}, {n!r}),\n" for a, n in dependencies)
+    return (
+        "# Generated by manage.py advise_indexes\n\n"
+        "from django.db import migrations, models\n\n\n"
+        + "".join(helpers)
+        + "class Migration(migrations.Migration):\n\n"
+        + f"    dependencies = [\n{deps}    ]\n\n"
+        + "    operations = [\n" + "\n".join(ops) + "\n    ]\n"
+    )
@@ -0,0 +1,59 @@
+# backend/cinema/renderers.py
+from __future__ import annotations
+
+import json
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import tracing
+
+try:
+    import orjson
+except ImportError:  # optional; stock json (C accelerated) is the fallback
+    orjson = None
+
+
+def _backend():
+    name = getattr(settings, "CINEMA_JSON_BACKEND", "auto")
+    if name == "json" or orjson is None:
+        return None
+    return orjson
+
+
+_default = JSONEncoder().default
+
+
+def dumps(data):
+    """Compact JSON bytes with the same encoder choice as FastJSONRenderer (for streamed bodies)."""
+    fast = _backend()
+    if fast is None:
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return fast.dumps(data, default=_default, option=fast.OPT_UTC_Z | fast.OPT_NON_STR_KEYS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that encodes with orjson when it is installed.
+
+    Output matches DRF's encoder for the types our views return (UTC
+    datetimes end in "Z", Decimals become numbers); anything orjson does not
+    know natively goes through DRF's encoder hook. Indented output for the
+    browsable API still uses the stock path.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        fast = _backend()
+        with tracing.span("render.json", cat="render", fast=fast is not None):
+            if fast is None or self.get_indent(accepted_media_type or "", renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            return dumps(data)
+
+
+class CompactSeatMapRenderer(FastJSONRenderer):
+    """Selected by `Accept: application/vnd.cinemaseat.seatmap+json`; the view emits the bitset form."""
+    media_type = "application/vnd.cinemaseat.seatmap+json"
+    format = "seatmap"
@@ -0,0 +1,176 @@
+# backend/cinema/rollups.py
+"""
+Occupancy / revenue rollups per show, movie-day and screen-day.
+
+The booking paths queue record_booking / record_release as background tasks
+(cinema.tasks) once their transaction commits; each counter then moves with
+an UPDATE ... SET x = x + n on a single summary row.  Dashboards read only
+the summary tables; the bookings table is touched by the backfill command and
+nothing else. The same two tasks feed the trending leaderboards (cinema.trending).
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from . import sharding, trending
+from .models import Booking, MovieDayStats, Screen, ScreenDayStats, Show, ShowStats
+from .tasks import task
+
+SOLD_STATUSES = (Booking.CONFIRMED,)
+
+
+def show_day(start_time):
+    return timezone.localdate(start_time) if timezone.is_aware(start_time) else start_time.date()
+
+
+def show_capacity(rows, cols):
+    return int(rows or 0) * int(cols or 0)
+
+
+# -------------------------------------------------------------------
+# incremental path
+# -------------------------------------------------------------------
+def ensure_show(show_id):
+    """Return (movie_id, screen_id, day) for the show, creating its summary rows on first touch."""
+    row = ShowStats.objects.filter(show_id=show_id).values_list("movie_id", "screen_id", "day").first()
+    if row:
+        return row
+
+    show = (Show.objects.using(sharding.shard_for_show(show_id)).filter(id=show_id)
+            .values("movie_id", "screen_id", "start_time").first())
+    if show is None:
+        return None
+    day = show_day(show["start_time"])
+    capacity = show_capacity(*(Screen.objects.filter(id=show["screen_id"]).values_list("rows", "cols").first()
+                               or (0, 0)))
+
+    try:
+        with transaction.atomic():
+            ShowStats.objects.create(
+                show_id=show_id, movie_id=show["movie_id"], screen_id=show["screen_id"],
+                day=day, capacity=capacity,
+            )
+    except IntegrityError:
+        # another request created it first; it also bumped the day rows
+        return show["movie_id"], show["screen_id"], day
+
+    for model, key in ((MovieDayStats, {"movie_id": show["movie_id"]}),
+                       (ScreenDayStats, {"screen_id": show["screen_id"]})):
+        _get_or_create(model, day=day, **key)
+        model.objects.filter(day=day, **key).update(shows=F("shows") + 1, capacity=F("capacity") + capacity)
+    return show["movie_id"], show["screen_id"], day
+
+
+def _get_or_create(model, **lookup):
+    try:
+        with transaction.atomic():
+            model.objects.get_or_create(**lookup)
+    except IntegrityError:
+        pass
+
+
+def _apply(show_id, seats, bookings, revenue):
+    key = ensure_show(show_id)
+    if key is None:
+        return None
+    movie_id, screen_id, day = key
+    delta = {
+        "seats_sold": F("seats_sold") + seats,
+        "bookings": F("bookings") + bookings,
+        "revenue": F("revenue") + revenue,
+    }
+    ShowStats.objects.filter(show_id=show_id).update(**delta)
+    MovieDayStats.objects.filter(movie_id=movie_id, day=day).update(**delta)
+    ScreenDayStats.objects.filter(screen_id=screen_id, day=day).update(**delta)
+    return key
+
+
+@task("rollups.record_booking")
+def record_booking(show_id, seats, amount, at=None, bookings=1):
+    """`bookings` > 1: several bookings of the show at once (cinema.importer), `seats` / `amount` their sums."""
+    key = _apply(show_id, int(seats), int(bookings), Decimal(amount or 0))
+    if key is not None:
+        trending.record_sale(show_id, key[0], int(seats), at)
+
+
+@task("rollups.record_release")
+def record_release(show_id, seats, amount, at=None):
+    """Cancellation / hold-expiry: undo what record_booking added (`at` = the booking's unix time)."""
+    key = _apply(show_id, -int(seats), -1, -Decimal(amount or 0))
+    if key is not None:
+        trending.record_sale(show_id, key[0], -int(seats), at)
+
+
+def record_show_created(show_id):
+    ensure_show(show_id)
+
+
+def record_shows_created(shows):
+    """Batch form of record_show_created for bulk-inserted shows: one insert, one update per day row."""
+    sizes = {i: show_capacity(r, c) for i, r, c in Screen.objects.filter(id__in={s.screen_id for s in shows})
+             .values_list("id", "rows", "cols")}
+    rows = [ShowStats(show_id=s.id, movie_id=s.movie_id, screen_id=s.screen_id, day=show_day(s.start_time),
+                      capacity=sizes.get(s.screen_id, 0)) for s in shows]
+    ShowStats.objects.bulk_create(rows, batch_size=1000)
+    for model, field in ((MovieDayStats, "movie_id"), (ScreenDayStats, "screen_id")):
+        grouped = {}
+        for r in rows:
+            n, cap = grouped.get((getattr(r, field), r.day), (0, 0))
+            grouped[getattr(r, field), r.day] = (n + 1, cap + r.capacity)
+        model.objects.bulk_create([model(day=day, **{field: key}) for key, day in grouped],
+                                  batch_size=1000, ignore_conflicts=True)
+        for (key, day), (n, cap) in grouped.items():
+            model.objects.filter(day=day, **{field: key}).update(shows=F("shows") + n, capacity=F("capacity") + cap)
+
+
+# -------------------------------------------------------------------
+# backfill (used by the rebuild_rollups command)
+# -------------------------------------------------------------------
+def compute_show_rows(show_ids):
+    """Aggregate bookings for a chunk of shows into unsaved ShowStats rows."""
+    out = {}
+    for alias, ids in sharding.group_by_shard(show_ids).items():
+        out.update(_compute_on(alias, ids))
+    return list(out.values())
+
+
+def _compute_on(alias, show_ids):
+    shows = list(Show.objects.using(alias).filter(id__in=show_ids)
+                 .values_list("id", "movie_id", "screen_id", "start_time"))
+    sizes = {i: (r, c) for i, r, c in Screen.objects.filter(id__in={s[2] for s in shows})
+             .values_list("id", "rows", "cols")}
+    out = {
+        sid: ShowStats(show_id=sid, movie_id=mid, screen_id=scid, day=show_day(st),
+                       capacity=show_capacity(*sizes.get(scid, (0, 0))))
+        for sid, mid, scid, st in shows
+    }
+
+    sold = Booking.objects.using(alias).filter(show_id__in=show_ids, status__in=SOLD_STATUSES)
+    for sid, n, total in (sold.values("show_id").order_by()
+                          .annotate(n=Count("id"), total=Sum("total_amount"))
+                          .values_list("show_id", "n", "total")):
+        out[sid].bookings = n
+        out[sid].revenue = total or 0
+
+    Through = Booking.seats.through
+    for sid, n in (Through.objects.using(alias)
+                   .filter(booking__show_id__in=show_ids, booking__status__in=SOLD_STATUSES)
+                   .values("booking__show_id").order_by()
+                   .annotate(n=Count("id"))
+                   .values_list("booking__show_id", "n")):
+        out[sid].seats_sold = n
+    return out
+
+
+def rebuild_day_rows():
+    """Recompute movie-day / screen-day rows from ShowStats (not from bookings)."""
+    sums = dict(shows=Count("show_id"), capacity=Sum("capacity"), seats_sold=Sum("seats_sold"),
+                bookings=Sum("bookings"), revenue=Sum("revenue"))
+    for model, field in ((MovieDayStats, "movie_id"), (ScreenDayStats, "screen_id")):
+        model.objects.all().delete()
+        rows = ShowStats.objects.values(field, "day").order_by().annotate(**sums)
+        model.objects.bulk_create([model(**r) for r in rows], batch_size=1000)
@@ -0,0 +1,260 @@
+# backend/cinema/scheduling.py
+"""
+Batch show scheduling.
+
+A show occupies its screen for [start, start + Movie.duration_min) and the
+screen then needs CINEMA_CLEANING_GAP_MIN minutes before the next start. A
+batch (typically a week for every screen) is checked against one interval
+index per screen, built from a single range query per shard for the existing
+shows plus the rows accepted so far, instead of a query per candidate:
+
+    ScreenIndex.conflict(start, end) -> the blocking interval or None   O(log n)
+    ScreenIndex.add(start, end, ref)                                    O(n) memmove
+
+Rows are judged in input order, so when two rows of the batch collide the
+first one listed wins. Existing shows are loaded back to the longest runtime
+of any movie before the batch's first start. Accepted shows are inserted
+with bulk_create in one transaction per database (rollup rows included),
+after locking their screens and re-checking against what other schedulers
+committed meanwhile; every rejected row is reported with the reason and
+what it collided with.
+"""
+from __future__ import annotations
+
+import bisect
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import catalog, rollups, sharding
+from .models import Movie, Screen, Show
+
+OVERLAP = "overlap"
+CLEANING_GAP = "cleaning_gap"
+
+
+def cleaning_gap():
+    return timedelta(minutes=getattr(settings, "CINEMA_CLEANING_GAP_MIN", 15))
+
+
+class ScreenIndex:
+    """One screen's occupied intervals, sorted by start (parallel arrays)."""
+
+    def __init__(self, gap):
+        self.gap = gap
+        self.starts, self.ends, self.refs = [], [], []
+        self.longest = timedelta(0)
+
+    def add(self, start, end, ref):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.refs.insert(i, ref)
+        self.longest = max(self.longest, end - start)
+
+    def conflict(self, start, end):
+        """(reason, ref, start, end) of an interval the new one collides with, or None."""
+        i = bisect.bisect_left(self.starts, start)
+        # later shows: if any starts too soon after us, the first one does
+        if i < len(self.starts) and self.starts[i] < end + self.gap:
+            return self._describe(i, start, end)
+        # earlier shows: anything starting within `longest + gap` before us could still be running
+        j = i - 1
+        horizon = start - self.longest - self.gap
+        while j >= 0 and self.starts[j] >= horizon:
+            if self.ends[j] + self.gap > start:
+                return self._describe(j, start, end)
+            j -= 1
+        return None
+
+    def _describe(self, i, start, end):
+        s, e = self.starts[i], self.ends[i]
+        reason = OVERLAP if s < end and start < e else CLEANING_GAP
+        return reason, self.refs[i], s, e
+
+
+def _aware(value):
+    dt = value if isinstance(value, datetime) else parse_datetime(str(value or ""))
+    if dt is None:
+        return None
+    return timezone.make_aware(dt) if timezone.is_naive(dt) else dt
+
+
+def _reject(report, n, row, reason, **extra):
+    report.append({"row": n, "input": row, "reason": reason, **extra})
+
+
+def _as_id(value):
+    return int(value) if str(value).isdigit() else None
+
+
+def longest_runtime(durations=None):
+    """The longest Movie.duration_min (a show of any movie may still be running), or longer in `durations`."""
+    longest = Movie.objects.aggregate(m=Max("duration_min"))["m"] or 0
+    return timedelta(minutes=max(longest, *(durations or {}).values(), 0))
+
+
+def _existing_index(screen_ids, first_start, last_end, gap, durations, exclude=()):
+    """{screen_id: ScreenIndex} of the existing shows that could touch [first_start, last_end), one query per shard."""
+    lo = first_start - longest_runtime(durations) - gap
+    hi = last_end + gap
+    index = {sid: ScreenIndex(gap) for sid in screen_ids}
+    screen_ids = list(index)
+    existing = [r for _, rs in sharding.fan_out(
+        lambda db: Show.objects.using(db).filter(screen_id__in=screen_ids, start_time__gte=lo, start_time__lt=hi)
+        .exclude(id__in=list(exclude)).values_list("id", "screen_id", "start_time", "movie_id"),
+        aliases=sorted({sharding.shard_for_screen(i) for i in screen_ids}),
+    ) for r in rs]
+    # movies may live on another database than the shows: no join, one extra lookup for the rest
+    missing = {r[3] for r in existing} - set(durations)
+    if missing:
+        durations.update(Movie.objects.filter(id__in=missing).values_list("id", "duration_min"))
+    for show_id, screen_id, start, movie_id in existing:
+        index[screen_id].add(start, start + timedelta(minutes=durations.get(movie_id, 0)), {"show_id": show_id})
+    return index
+
+
+def plan(rows, allow_past=False, exclude=()):
+    """
+    Validate a batch. rows: [{"screen": id or name, "movie": id, "start_time": iso/datetime, "price"?,
+    "price_multiplier"?}].
+    Returns (unsaved Show objects, rejection report). `exclude`: existing show ids to ignore (edits).
+    """
+    gap = cleaning_gap()
+    now = timezone.now()
+    keys = {r.get("screen") for r in rows}
+    by_id = {i: i for i in Screen.objects.filter(id__in={_as_id(k) for k in keys} - {None}).values_list("id", flat=True)}
+    by_name = dict(Screen.objects.filter(name__in={k for k in keys if _as_id(k) is None and k}).values_list("name", "id"))
+    durations = dict(Movie.objects.filter(id__in={_as_id(r.get("movie")) for r in rows} - {None})
+                     .values_list("id", "duration_min"))
+
+    parsed, report = [], []
+    for n, row in enumerate(rows):
+        key = row.get("screen")
+        screen_id = by_id.get(_as_id(key)) if _as_id(key) is not None else by_name.get(key)
+        if screen_id is None:
+            _reject(report, n, row, "unknown_screen")
+            continue
+        movie_id = _as_id(row.get("movie"))
+        if movie_id not in durations:
+            _reject(report, n, row, "unknown_movie")
+            continue
+        start = _aware(row.get("start_time"))
+        if start is None:
+            _reject(report, n, row, "invalid_start_time")
+            continue
+        if start < now and not allow_past:
+            _reject(report, n, row, "in_past")
+            continue
+        try:
+            price = Decimal(str(row["price"])) if row.get("price") not in (None, "") else None
+            mult = Decimal(str(row["price_multiplier"])) if row.get("price_multiplier") not in (None, "") else None
+        except InvalidOperation:
+            _reject(report, n, row, "invalid_price")
+            continue
+        parsed.append((n, row, screen_id, movie_id, start, start + timedelta(minutes=durations[movie_id]),
+                       price, mult))
+
+    if not parsed:
+        return [], report
+
+    index = _existing_index({p[2] for p in parsed}, min(p[4] for p in parsed), max(p[5] for p in parsed),
+                            gap, durations, exclude)
+
+    shows = []
+    for n, row, screen_id, movie_id, start, end, price, mult in parsed:
+        hit = index[screen_id].conflict(start, end)
+        if hit is not None:
+            reason, ref, s, e = hit
+            _reject(report, n, row, reason, conflicts_with={**ref, "start_time": s, "end_time": e})
+            continue
+        index[screen_id].add(start, end, {"row": n})
+        show = Show(movie_id=movie_id, screen_id=screen_id, start_time=start)
+        show._planned = (n, row, end)  # for apply()'s re-check
+        if price is not None:
+            show.price = price
+        if mult is not None:
+            show.price_multiplier = mult
+        shows.append(show)
+    return shows, report
+
+
+def recheck(shows, report):
+    """
+    Drop planned shows that now collide with shows committed since plan() ran (call with the screens locked);
+    each is added to `report` as plan() would have. Returns the shows still clear.
+    """
+    durations = {}
+    for s in shows:
+        n, row, end = s._planned
+        durations[s.movie_id] = int((end - s.start_time).total_seconds() // 60)
+    index = _existing_index({s.screen_id for s in shows}, min(s.start_time for s in shows),
+                            max(s._planned[2] for s in shows), cleaning_gap(), durations)
+    clear = []
+    for s in shows:
+        n, row, end = s._planned
+        hit = index[s.screen_id].conflict(s.start_time, end)
+        if hit is not None:
+            reason, ref, start, stop = hit
+            _reject(report, n, row, reason, conflicts_with={**ref, "start_time": start, "end_time": stop})
+            continue
+        index[s.screen_id].add(s.start_time, end, {"row": n})
+        clear.append(s)
+    return clear
+
+
+def apply(shows, report=None):
+    """
+    Insert planned shows: bulk_create per shard, all in one transaction per database. The screens are locked
+    first and the plan re-checked under the lock, so concurrent schedulers cannot both insert overlapping
+    shows; rows that lost such a race go to `report`.
+    """
+    report = [] if report is None else report
+    aliases = {sharding.shard_for_screen(s.screen_id) for s in shows} | {"default"}
+    with ExitStack() as stack:
+        for alias in sorted(aliases):
+            stack.enter_context(transaction.atomic(using=alias))
+        # serialise concurrent schedulers for the same screens (shard commits land before this lock is released)
+        list(Screen.objects.select_for_update().filter(id__in={s.screen_id for s in shows}).values_list("id"))
+        by_alias = {}
+        for s in recheck(shows, report):
+            by_alias.setdefault(sharding.shard_for_screen(s.screen_id), []).append(s)
+        created = []
+        for alias, part in by_alias.items():
+            part = Show.objects.using(alias).bulk_create(sharding.assign_ids(part, alias), batch_size=1000)
+            if part and part[0].pk is None:  # backend can't return keys: (screen, start_time) is unique
+                ids = dict(((sc, st), i) for i, sc, st in Show.objects.using(alias).filter(
+                    screen_id__in={s.screen_id for s in part}, start_time__in={s.start_time for s in part},
+                ).values_list("id", "screen_id", "start_time"))
+                for s in part:
+                    s.pk = ids[s.screen_id, s.start_time]
+            created += part
+        rollups.record_shows_created(created)
+        catalog.schedule_refresh({s.movie_id for s in created}, using="default")  # committed last
+    return created
+
+
+def schedule(rows, allow_past=False, dry_run=False):
+    """plan() + apply(); returns {"created": n, "rejected": [...], "show_ids": [...]}."""
+    shows, report = plan(rows, allow_past=allow_past)
+    created = apply(shows, report) if shows and not dry_run else []
+    return {
+        "received": len(rows),
+        "accepted": len(shows) if dry_run else len(created),
+        "created": len(created),
+        "rejected": report,
+        "show_ids": [s.id for s in created],
+    }
+
+
+def conflict_for(show):
+    """The single-show check (Show.clean / admin form): None or the rejection entry."""
+    _, report = plan([{"screen": show.screen_id, "movie": show.movie_id, "start_time": show.start_time}],
+                     allow_past=True, exclude=[show.pk] if show.pk else ())
+    return report[0] if report else None
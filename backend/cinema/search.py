@@ -0,0 +1,266 @@
+# backend/cinema/search.py
+"""
+In-process movie search.
+
+An inverted index over Movie.title and Movie.description: token -> {movie_id:
+weight}, plus a sorted vocabulary for prefix matches and a trigram ->
+tokens map for typo-tolerant matches. Searches never touch the database.
+
+The index is built lazily, by the first search in each process, and then
+maintained by Movie save/delete signals. It is not built at startup:
+AppConfig.ready() runs before migrations and for every management command, and
+a catalog scan there would add to each worker's cold start. To keep that first
+build off a customer's request, warm_caches searches once per worker it
+targets (cinema.warmup). Like the layout cache, a version number in the Django cache tells
+other processes that the catalog changed (with a shared cache backend), and
+they rebuild on their next search.
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from django.core.cache import cache
+
+from .models import Movie
+
+VERSION_KEY = "cinema:search-version"
+FIELD_WEIGHTS = {"title": 3.0, "description": 1.0}
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.5
+FUZZY_MIN_SIMILARITY = 0.35
+MAX_EXPANSIONS = 50
+RESULT_CACHE_SIZE = 256
+
+STOPWORDS = frozenset("a an and at by for from in is it of on or the to with".split())
+
+_word = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return [t for t in _word.findall(text) if t not in STOPWORDS]
+
+
+def trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _doc(m):
+    return {
+        "id": m.id,
+        "title": getattr(m, "title", f"Movie {m.id}"),
+        "language": getattr(m, "language", ""),
+        "certificate": getattr(m, "certificate", ""),
+        "poster_url": getattr(m, "poster_url", "") or f"https://picsum.photos/seed/{m.id}-poster/300/420",
+    }
+
+
+class MovieIndex:
+    def __init__(self, version=None):
+        self.version = version
+        self.docs = {}        # movie id -> display dict
+        self.terms = {}       # movie id -> {token: weight} (for removal)
+        self.postings = {}    # token -> {movie id: weight}
+        self.vocab = []       # sorted tokens
+        self.grams = {}       # trigram -> set(tokens)
+        self.results = OrderedDict()  # (terms, limit) -> (total, ranked ids); LRU, emptied on writes
+        self._lock = threading.RLock()
+
+    # ---------------------------------------------------------------
+    # writes
+    # ---------------------------------------------------------------
+    def add(self, movie):
+        weights = Counter()
+        for field, w in FIELD_WEIGHTS.items():
+            for tok, tf in Counter(tokenize(getattr(movie, field, ""))).items():
+                weights[tok] += w * (1 + math.log(tf))
+        with self._lock:
+            self._remove(movie.id)
+            self.results.clear()
+            self.docs[movie.id] = _doc(movie)
+            self.terms[movie.id] = dict(weights)
+            for tok, w in weights.items():
+                posting = self.postings.get(tok)
+                if posting is None:
+                    posting = self.postings[tok] = {}
+                    bisect.insort(self.vocab, tok)
+                    for g in trigrams(tok):
+                        self.grams.setdefault(g, set()).add(tok)
+                posting[movie.id] = w
+
+    def remove(self, movie_id):
+        with self._lock:
+            self._remove(movie_id)
+            self.results.clear()
+
+    def _remove(self, movie_id):
+        self.docs.pop(movie_id, None)
+        for tok in self.terms.pop(movie_id, {}):
+            posting = self.postings.get(tok)
+            if posting is None:
+                continue
+            posting.pop(movie_id, None)
+            if not posting:
+                del self.postings[tok]
+                self.vocab.pop(bisect.bisect_left(self.vocab, tok))
+                for g in trigrams(tok):
+                    toks = self.grams.get(g)
+                    if toks is not None:
+                        toks.discard(tok)
+                        if not toks:
+                            del self.grams[g]
+
+    # ---------------------------------------------------------------
+    # reads
+    # ---------------------------------------------------------------
+    def _prefixed(self, term):
+        i = bisect.bisect_left(self.vocab, term)
+        out = []
+        while i < len(self.vocab) and self.vocab[i].startswith(term) and len(out) < MAX_EXPANSIONS:
+            if self.vocab[i] != term:
+                out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def _similar(self, term):
+        grams = trigrams(term)
+        shared = Counter()
+        for g in grams:
+            shared.update(self.grams.get(g, ()))
+        out = []
+        for tok, n in shared.most_common(MAX_EXPANSIONS * 4):
+            sim = n / (len(grams) + len(trigrams(tok)) - n)
+            if sim >= FUZZY_MIN_SIMILARITY and tok != term:
+                out.append((tok, sim))
+        return out[:MAX_EXPANSIONS]
+
+    def _expand(self, term):
+        """[(token, factor)]: exact, then prefix completions, then trigram look-alikes."""
+        out = {}
+        if term in self.postings:
+            out[term] = 1.0
+        if len(term) >= 2:
+            for tok in self._prefixed(term):
+                out.setdefault(tok, PREFIX_FACTOR)
+        if len(term) >= 3 and not out:
+            for tok, sim in self._similar(term):
+                out.setdefault(tok, FUZZY_FACTOR * sim)
+        return out.items()
+
+    def search(self, query, limit=None):
+        """
+        (total, ranked [(score, doc)]): movies matching more query terms first, then by score, then
+        title. Only the best `limit` are ranked (a heap, not a full sort), and recent answers are
+        remembered until the next write, so repeated queries skip scoring entirely.
+        """
+        terms = tuple(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+        with self._lock:
+            hit = self.results.get((terms, limit))
+            if hit is None:
+                hit = self.results[(terms, limit)] = self._rank(terms, limit)
+                if len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+            else:
+                self.results.move_to_end((terms, limit))
+            total, ranked = hit
+            return total, [(score, self.docs[mid]) for mid, score in ranked]
+
+    def _rank(self, terms, limit):
+        n_docs = max(len(self.docs), 1)
+        scores, matched = Counter(), Counter()
+        for term in terms:
+            best = {}
+            for tok, factor in self._expand(term):
+                posting = self.postings[tok]
+                idf = math.log(1 + n_docs / len(posting)) * factor
+                for mid, w in posting.items():
+                    s = w * idf
+                    if s > best.get(mid, 0):
+                        best[mid] = s
+            for mid, s in best.items():
+                scores[mid] += s
+                matched[mid] += 1
+        key = lambda mid: (-matched[mid], -scores[mid], self.docs[mid]["title"])  # noqa: E731
+        ranked = sorted(scores, key=key) if limit is None else heapq.nsmallest(limit, scores, key=key)
+        return len(scores), [(mid, round(scores[mid], 4)) for mid in ranked]
+
+
+# -------------------------------------------------------------------
+# process-wide index
+# -------------------------------------------------------------------
+_index = None
+_build_lock = threading.Lock()
+
+
+def current_version():
+    v = cache.get(VERSION_KEY)
+    if v is None:
+        # seeded from the clock so a flushed cache never repeats a version an old index still holds
+        cache.add(VERSION_KEY, time.time_ns() // 1000, None)
+        v = cache.get(VERSION_KEY)
+    return v
+
+
+def build(version=None):
+    idx = MovieIndex(version if version is not None else current_version())
+    for m in Movie.objects.all().iterator(chunk_size=2000):
+        idx.add(m)
+    return idx
+
+
+def get_index():
+    global _index
+    version = current_version()
+    idx = _index
+    if idx is not None and idx.version == version:
+        return idx
+    with _build_lock:
+        if _index is None or _index.version != version:
+            _index = build(version)
+        return _index
+
+
+def _bump():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return current_version()
+
+
+def _apply(change):
+    """Update this process's index in place and bump the shared version so other processes rebuild."""
+    idx = _index
+    version = _bump()
+    if idx is not None:
+        change(idx)
+        # adopt the new version only if nobody else changed the catalog in between
+        if version == idx.version + 1:
+            idx.version = version
+
+
+def movie_saved(movie):
+    _apply(lambda idx: idx.add(movie))
+
+
+def movie_deleted(movie_id):
+    _apply(lambda idx: idx.remove(movie_id))
+
+
+def invalidate():
+    """After bulk catalog edits (signals don't fire for bulk_create/update)."""
+    _bump()
+
+
+def search(query, page=1, page_size=20):
+    total, hits = get_index().search(query, limit=page * page_size)
+    return total, hits[(page - 1) * page_size:]
@@ -16,7 +16,7 @@ class ShowSerializer(serializers.ModelSerializer):
     screen = serializers.StringRelatedField()
     class Meta:
         model = Show
-        fields = ["id", "movie", "screen", "start_time", "price"]
+        fields = ["id", "movie", "screen", "start_time", "price", "price_multiplier"]
 
 class SeatSerializer(serializers.ModelSerializer):
     screen = serializers.PrimaryKeyRelatedField(read_only=True)
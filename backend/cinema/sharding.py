@@ -0,0 +1,225 @@
+# backend/cinema/sharding.py
+"""
+Horizontal sharding of per-show data.
+
+With CINEMA_SHARDS = ["shard0", "shard1", ...] set, Show, Booking, the
+booking<->seat rows and the id sequence live on the shard databases, and
+everything else (movies, screens, seats, users, rollups, tasks) stays on
+"default". An empty list means no sharding: every helper here resolves to
+"default", so callers use the same code either way.
+
+Ids carry their shard: a new show is placed by its screen (all of a cinema
+screen's shows share a shard) and gets id = n * N + shard_index, where n comes
+from that shard's own sequence table; its bookings get ids the same way. So
+shard_for_show(show_id) and shard_for_booking(booking_id) are arithmetic, never
+a lookup.
+
+Cross-database relations carry no FK constraint (db_constraint=False) and are
+loaded with prefetch_related instead of joins (see with_related). Reads of
+sharded models must name their database (.using(...)); there is no default
+shard to fall back to.
+"""
+from __future__ import annotations
+
+import heapq
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import CASCADE, PROTECT, ProtectedError
+
+SHARDED_MODELS = frozenset({"cinema.show", "cinema.booking", "cinema.booking_seats", "cinema.shardsequence"})
+SEQUENCE_PRUNE_EVERY = 1000
+
+
+def shards():
+    return list(getattr(settings, "CINEMA_SHARDS", ()) or ())
+
+
+def enabled():
+    return bool(shards())
+
+
+def all_aliases():
+    """Databases that hold per-show data: the shards, or just "default"."""
+    return shards() or [DEFAULT_DB_ALIAS]
+
+
+def _pick(key):
+    s = shards()
+    return s[int(key) % len(s)] if s else DEFAULT_DB_ALIAS
+
+
+def shard_for_show(show_id):
+    return _pick(show_id)
+
+
+def shard_for_booking(booking_id):
+    return _pick(booking_id)
+
+
+def shard_for_screen(screen_id):
+    return _pick(screen_id)
+
+
+def group_by_shard(show_ids):
+    out = {}
+    for i in show_ids:
+        out.setdefault(shard_for_show(i), []).append(i)
+    return out
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+# -------------------------------------------------------------------
+# id allocation
+# -------------------------------------------------------------------
+def allocate_id(alias):
+    """Next id for a row on `alias` such that id % len(shards) is that shard's index."""
+    s = shards()
+    Sequence = apps.get_model("cinema", "ShardSequence")
+    n = Sequence.objects.using(alias).create().pk
+    if n % SEQUENCE_PRUNE_EVERY == 0:
+        Sequence.objects.using(alias).filter(pk__lt=n - SEQUENCE_PRUNE_EVERY).delete()
+    return n * len(s) + s.index(alias)
+
+
+def allocate_ids(alias, n):
+    """n ids on `alias` (see allocate_id), one multi-row insert where the backend returns the keys."""
+    Sequence = apps.get_model("cinema", "ShardSequence")
+    if n <= 1 or not connections[alias].features.can_return_rows_from_bulk_insert:
+        return [allocate_id(alias) for _ in range(n)]
+    s = shards()
+    made = Sequence.objects.using(alias).bulk_create([Sequence() for _ in range(n)])
+    last = max(m.pk for m in made)
+    Sequence.objects.using(alias).filter(pk__lt=last - SEQUENCE_PRUNE_EVERY).delete()
+    return [m.pk * len(s) + s.index(alias) for m in made]
+
+
+def prepare_save(obj, using):
+    """Called from Show.save / Booking.save: pick the shard and allocate the id of a new row."""
+    if not enabled():
+        return using
+    if obj.pk is None:
+        alias = shard_for_screen(obj.screen_id) if obj._meta.model_name == "show" else shard_for_show(obj.show_id)
+        obj.pk = allocate_id(alias)
+        return alias
+    return _pick(obj.pk)
+
+
+def assign_ids(objs, alias):
+    """For bulk_create on a shard (bulk_create bypasses save())."""
+    if enabled():
+        new = [o for o in objs if o.pk is None]
+        for o, pk in zip(new, allocate_ids(alias, len(new))):
+            o.pk = pk
+    return objs
+
+
+# -------------------------------------------------------------------
+# reads
+# -------------------------------------------------------------------
+def with_related(qs, local=(), remote=()):
+    """select_related for same-database relations; relations that may cross databases are prefetched."""
+    related = list(local) if enabled() else [*local, *remote]
+    if related:  # select_related() with no fields would follow every FK
+        qs = qs.select_related(*related)
+    return qs.prefetch_related(*remote) if enabled() and remote else qs
+
+
+def fan_out(make_qs, aliases=None):
+    """[(alias, evaluated rows)] of make_qs(alias) on every shard (or the given ones)."""
+    return [(alias, list(make_qs(alias))) for alias in (aliases or all_aliases())]
+
+
+def merged(make_qs, key, reverse=False, limit=None):
+    """Fan out an ordered query and merge the per-shard streams (each already sorted by `key`)."""
+    streams = [rows for _, rows in fan_out(make_qs)]
+    out = heapq.merge(*streams, key=key, reverse=reverse) if len(streams) > 1 else iter(streams[0])
+    return list(islice(out, limit)) if limit is not None else list(out)
+
+
+# -------------------------------------------------------------------
+# deletes across databases
+# -------------------------------------------------------------------
+def _across(on_delete):
+    """
+    Wrap the on_delete of a sharded model's FK to an unsharded one (Show.movie, Booking.user, ...).
+    Django's delete collector looks for dependents on the deleting object's database, where sharded
+    tables don't exist; this runs the CASCADE / PROTECT on every shard instead.
+    """
+    def handler(collector, field, sub_objs, using):
+        if not enabled() or using in shards():
+            return on_delete(collector, field, sub_objs, using)
+        if on_delete is PROTECT:
+            blocking = [o for alias in shards() for o in sub_objs.using(alias)[:1]]
+            if blocking:
+                raise ProtectedError(f"{field.model.__name__} rows on a shard reference this object", blocking)
+            return
+        for alias in shards():
+            # each shard runs its own collector, so deletes cascade further on that shard
+            sub_objs.using(alias).delete()
+
+    handler.lazy_sub_objs = True
+    handler.wrapped = on_delete
+    return handler
+
+
+def _deconstruct_as(deconstruct, on_delete):
+    """Migrations (and model state clones) keep seeing the plain CASCADE / PROTECT."""
+    def inner():
+        name, path, args, kwargs = deconstruct()
+        kwargs["on_delete"] = on_delete
+        return name, path, args, kwargs
+    return inner
+
+
+def install_cascades():
+    """Called from CinemaConfig.ready(); idempotent."""
+    for label in SHARDED_MODELS:
+        for field in apps.get_model(label)._meta.concrete_fields:
+            rel = field.remote_field
+            if rel is None or is_sharded(rel.model) or hasattr(rel.on_delete, "wrapped"):
+                continue
+            if rel.on_delete in (CASCADE, PROTECT):
+                field.deconstruct = _deconstruct_as(field.deconstruct, rel.on_delete)
+                rel.on_delete = _across(rel.on_delete)
+
+
+# -------------------------------------------------------------------
+# router
+# -------------------------------------------------------------------
+class ShardRouter:
+    """
+    DATABASE_ROUTERS = ["cinema.sharding.ShardRouter"]; a no-op while CINEMA_SHARDS is empty.
+    """
+
+    def _for(self, model, hints):
+        if not enabled():
+            return None
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        inst = hints.get("instance")
+        if inst is not None and is_sharded(type(inst)):
+            return inst._state.db or (_pick(inst.pk) if inst.pk is not None else None)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True if enabled() else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not enabled():
+            return None
+        on_shard = db in shards()
+        if model_name is None:
+            return not on_shard
+        return (f"{app_label}.{model_name}" in SHARDED_MODELS) == on_shard
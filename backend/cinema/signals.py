@@ -0,0 +1,59 @@
+# backend/cinema/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Movie, PriceZone, Screen, Seat, Show, ShowStats
+from . import catalog, layout, pricing, rollups, search
+
+
+@receiver(post_save, sender=Show, dispatch_uid="cinema-show-rollups")
+def show_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    layout.forget_show(instance.id, instance.screen_id)
+    pricing.remember(instance)
+    if created:
+        rollups.record_show_created(instance.id)
+    catalog.schedule_refresh([instance.movie_id], using=instance._state.db)
+
+
+@receiver(post_delete, sender=Show, dispatch_uid="cinema-show-deleted")
+def show_deleted(sender, instance, **kwargs):
+    layout.forget_show(instance.id)
+    pricing.forget_show(instance.id)
+    ShowStats.objects.filter(show_id=instance.id).delete()
+    catalog.schedule_refresh([instance.movie_id], using=instance._state.db)
+
+
+@receiver(post_save, sender=Seat, dispatch_uid="cinema-seat-saved")
+@receiver(post_delete, sender=Seat, dispatch_uid="cinema-seat-deleted")
+def seat_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        layout.invalidate(instance.screen_id)
+
+
+@receiver(post_save, sender=PriceZone, dispatch_uid="cinema-zone-saved")
+@receiver(post_delete, sender=PriceZone, dispatch_uid="cinema-zone-deleted")
+def zone_changed(sender, instance, raw=False, **kwargs):
+    # prices are memoised per layout key: a new version reprices the screen
+    if not raw:
+        layout.invalidate(instance.screen_id)
+
+
+@receiver(post_save, sender=Screen, dispatch_uid="cinema-screen-saved")
+def screen_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        layout.invalidate(instance.id)
+
+
+@receiver(post_save, sender=Movie, dispatch_uid="cinema-movie-saved")
+def movie_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.movie_saved(instance)
+        catalog.schedule_refresh([instance.id], movies=True)
+
+
+@receiver(post_delete, sender=Movie, dispatch_uid="cinema-movie-deleted")
+def movie_deleted(sender, instance, **kwargs):
+    search.movie_deleted(instance.id)
+    catalog.schedule_refresh([instance.id], movies=True)
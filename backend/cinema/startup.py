@@ -0,0 +1,156 @@
+# backend/cinema/startup.py
+"""
+Worker cold-start profile (manage.py profile_startup).
+
+Each run boots a fresh interpreter, `python -X importtime -m cinema.startup
+TARGET`, so nothing this process already imported hides a cost. The child
+wraps the django.setup() steps before importing the target and reports:
+
+    settings    importing the settings module (first settings access)
+    logging     configure_logging
+    apps        importing every app module and its AppConfig
+    models      importing every app's models
+    ready       AppConfig.ready() (admin autodiscovery, signal wiring, ...)
+    middleware  the handler loading MIDDLEWARE (wsgi / asgi only)
+    imports     the rest: django itself, the handler modules, the target
+
+per app for the last three, plus the URLconf load the first request pays on
+top. The parent parses the -X importtime lines into per-module self and
+cumulative times, split at the end of the boot. Modules Django loads with
+importlib.import_module (app modules, models, admin) get no line of their
+own there; their cost is in the per-app columns.
+
+Top-level imports are stdlib only: the module is also the child's __main__.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+
+TARGETS = {"wsgi": "backend.wsgi", "asgi": "backend.asgi", "setup": None}
+URLCONF_MARK = "startup: urlconf"
+
+
+# -------------------------------------------------------------------
+# child: boot TARGET, print one JSON line
+# -------------------------------------------------------------------
+def _child(target):
+    t0 = time.perf_counter()
+    phases = {}
+    per_app = {}
+
+    def timed(phase, fn, app=None):
+        def wrapper(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - t) * 1000
+                phases[phase] = phases.get(phase, 0) + ms
+                if app is not None:
+                    per_app.setdefault(app, {})[phase] = round(ms, 2)
+        return wrapper
+
+    import django.utils.log
+    from django.apps import AppConfig
+    from django.conf import LazySettings
+    from django.core.handlers.base import BaseHandler
+
+    LazySettings._setup = timed("settings", LazySettings._setup)
+    django.utils.log.configure_logging = timed("logging", django.utils.log.configure_logging)
+    BaseHandler.load_middleware = timed("middleware", BaseHandler.load_middleware)
+    create = AppConfig.create.__func__
+    import_models = AppConfig.import_models
+
+    def create_config(cls, entry):
+        t = time.perf_counter()
+        config = create(cls, entry)
+        ms = (time.perf_counter() - t) * 1000
+        phases["apps"] = phases.get("apps", 0) + ms
+        per_app.setdefault(config.label, {})["apps"] = round(ms, 2)
+        config.import_models = timed("models", import_models.__get__(config), config.label)
+        config.ready = timed("ready", config.ready, config.label)
+        return config
+    AppConfig.create = classmethod(create_config)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+    if target:
+        __import__(target)
+    else:
+        django.setup()
+    boot_ms = (time.perf_counter() - t0) * 1000
+    booted = sorted(sys.modules)
+    print(URLCONF_MARK, file=sys.stderr, flush=True)
+
+    from django.urls import get_resolver
+    t = time.perf_counter()
+    get_resolver().url_patterns
+    urlconf_ms = (time.perf_counter() - t) * 1000
+
+    phases["imports"] = boot_ms - sum(phases.values())
+    print(json.dumps({
+        "boot_ms": round(boot_ms, 2),
+        "phases": {k: round(v, 2) for k, v in phases.items()},
+        "apps": per_app,
+        "modules": booted,
+        "urlconf_ms": round(urlconf_ms, 2),
+        "urlconf_modules": sorted(set(sys.modules) - set(booted)),
+    }))
+
+
+# -------------------------------------------------------------------
+# parent
+# -------------------------------------------------------------------
+def parse_importtime(lines):
+    """[(module, self_ms, cumulative_ms, depth)] from -X importtime output, in import order."""
+    out = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        stripped = name.rstrip().lstrip(" ")
+        depth = (len(name.rstrip()) - len(stripped) - 1) // 2
+        out.append((stripped, int(own) / 1000, int(cumulative) / 1000, depth))
+    return out
+
+
+def by_package(modules):
+    """{top-level package: self ms}, largest first."""
+    totals = {}
+    for name, own, _, _ in modules:
+        top = name.split(".")[0]
+        totals[top] = totals.get(top, 0) + own
+    return dict(sorted(((k, round(v, 2)) for k, v in totals.items()), key=lambda kv: -kv[1]))
+
+
+def profile(target="wsgi", env=None):
+    """
+    Boot TARGET ("wsgi", "asgi", "setup" or a module path) in a fresh interpreter; the child's report plus
+    "target", "imports" and "urlconf_imports" (parse_importtime rows). `env` is added to this process's
+    environment.
+    """
+    import subprocess
+    from django.conf import settings
+
+    module = TARGETS.get(target, target)
+    base = str(settings.BASE_DIR)
+    child_env = dict(os.environ, **(env or {}))
+    child_env["PYTHONPATH"] = os.pathsep.join(p for p in (base, child_env.get("PYTHONPATH")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "cinema.startup", module or ""],
+        cwd=base, env=child_env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        tail = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")][-20:]
+        raise RuntimeError(f"booting {module or 'django.setup()'} failed:\n" + "\n".join(tail))
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    boot, _, first = proc.stderr.partition(URLCONF_MARK)
+    report.update(target=module or "django.setup()", imports=parse_importtime(boot.splitlines()),
+                  urlconf_imports=parse_importtime(first.splitlines()))
+    return report
+
+
+if __name__ == "__main__":
+    _child(sys.argv[1] if len(sys.argv) > 1 else "")
@@ -0,0 +1,162 @@
+# backend/cinema/tasks.py
+"""
+Broker-less background tasks backed by the cinema_task table.
+
+    @tasks.task("rollups.record_booking")
+    def handler(show_id, seats, amount): ...
+
+    tasks.enqueue("rollups.record_booking", show_id=1, seats=2, amount="500.00")
+
+enqueue() inserts the row from transaction.on_commit, so work is only queued
+for bookings that actually committed and never runs inside the request's
+transaction. `manage.py run_tasks` claims rows with a conditional UPDATE (safe
+with several worker processes), runs them on a thread pool and retries
+failures with jittered exponential backoff.
+
+A handler's writes and its row's DONE commit in one transaction, and only
+while the row is still this worker's claim (RUNNING, same started_at). So
+reclaim_stuck() never re-runs work that committed, and a slow worker whose
+task was reclaimed and claimed again rolls its effect back: the rollup
+counters (UPDATE x = x + n) move once per task.
+"""
+from __future__ import annotations
+
+import importlib
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+log = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name, max_attempts=5):
+    def deco(fn):
+        fn.task_name, fn.max_attempts = name, max_attempts
+        _registry[name] = fn
+        return fn
+    return deco
+
+
+def autodiscover():
+    for mod in getattr(settings, "CINEMA_TASK_MODULES", ("cinema.rollups",)):
+        importlib.import_module(mod)
+    return dict(_registry)
+
+
+def enqueue(name, delay=0, using=None, **payload):
+    """Queue `name(**payload)` once the surrounding transaction on `using` commits (immediately if none)."""
+    max_attempts = getattr(_registry.get(name), "max_attempts", 5)
+
+    def _insert():
+        Task.objects.create(
+            name=name, payload=payload, max_attempts=max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+    if getattr(settings, "CINEMA_TASKS_EAGER", False):
+        transaction.on_commit(lambda: _registry[name](**payload), using=using)
+    else:
+        transaction.on_commit(_insert, using=using)
+
+
+# -------------------------------------------------------------------
+# worker side
+# -------------------------------------------------------------------
+def backoff_seconds(attempts, base=2.0, cap=600.0):
+    return min(cap, base * (2 ** (attempts - 1))) * random.uniform(0.5, 1.5)
+
+
+def claim(limit):
+    """Move up to `limit` due tasks QUEUED -> RUNNING; returns the ones this worker won."""
+    now = timezone.now()
+    ids = list(Task.objects.filter(status=Task.QUEUED, run_after__lte=now)
+               .order_by("run_after", "id").values_list("id", flat=True)[:limit])
+    won = [i for i in ids
+           if Task.objects.filter(id=i, status=Task.QUEUED).update(status=Task.RUNNING, started_at=now)]
+    return list(Task.objects.filter(id__in=won))
+
+
+class Reclaimed(Exception):
+    """The task was requeued (reclaim_stuck) while this worker ran it; its effect is rolled back."""
+
+
+def reclaim_stuck(older_than_s):
+    """Requeue RUNNING tasks whose worker died (started too long ago); completed ones are DONE already."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_s)
+    return Task.objects.filter(status=Task.RUNNING, started_at__lt=cutoff).update(status=Task.QUEUED)
+
+
+def run(t):
+    close_old_connections()
+    started = timezone.now()
+    wait_ms = max(0, int((started - max(t.run_after, t.created_at)).total_seconds() * 1000))
+    handler = _registry.get(t.name)
+    try:
+        if handler is None:
+            raise LookupError(f"no task registered as {t.name!r}")
+        with transaction.atomic():
+            handler(**(t.payload or {}))
+            finished = timezone.now()
+            if not Task.objects.filter(id=t.id, status=Task.RUNNING, started_at=t.started_at).update(
+                    status=Task.DONE, attempts=t.attempts + 1, finished_at=finished,
+                    wait_ms=wait_ms, run_ms=int((finished - started).total_seconds() * 1000)):
+                raise Reclaimed
+    except Reclaimed:
+        log.warning("task %s#%s was reclaimed while running; rolled back", t.name, t.id)
+        return False
+    except Exception:
+        attempts = t.attempts + 1
+        err = traceback.format_exc(limit=5)
+        if attempts < t.max_attempts and handler is not None:
+            Task.objects.filter(id=t.id).update(
+                status=Task.QUEUED, attempts=attempts, last_error=err,
+                run_after=timezone.now() + timedelta(seconds=backoff_seconds(attempts)),
+            )
+        else:
+            Task.objects.filter(id=t.id).update(
+                status=Task.FAILED, attempts=attempts, last_error=err, finished_at=timezone.now(),
+            )
+        log.warning("task %s#%s failed (attempt %s)", t.name, t.id, attempts)
+        return False
+    finally:
+        close_old_connections()
+    return True
+
+
+def latency_stats(since=None):
+    """{name: {count, failed, wait_p50, wait_p95, run_p50, run_p95}} over finished tasks."""
+    qs = Task.objects.filter(status__in=(Task.DONE, Task.FAILED))
+    if since is not None:
+        qs = qs.filter(finished_at__gte=since)
+    by_name = {}
+    for name, status, wait_ms, run_ms in qs.values_list("name", "status", "wait_ms", "run_ms").iterator():
+        d = by_name.setdefault(name, {"wait": [], "run": [], "failed": 0})
+        if status == Task.FAILED:
+            d["failed"] += 1
+            continue
+        d["wait"].append(wait_ms or 0)
+        d["run"].append(run_ms or 0)
+
+    def pct(xs, p):
+        if not xs:
+            return None
+        xs = sorted(xs)
+        return xs[min(len(xs) - 1, int(p * len(xs)))]
+
+    return {
+        name: {
+            "count": len(d["run"]), "failed": d["failed"],
+            "wait_p50": pct(d["wait"], 0.5), "wait_p95": pct(d["wait"], 0.95),
+            "run_p50": pct(d["run"], 0.5), "run_p95": pct(d["run"], 0.95),
+        }
+        for name, d in by_name.items()
+    }
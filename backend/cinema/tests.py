@@ -1,3 +1,1249 @@
-from django.test import TestCase
+"""
+Performance regression suite: query-count budgets for every cinema endpoint,
+plus wall-time growth checks on seeded datasets of several sizes.
 
-# Create your tests here.
+    python manage.py test cinema users
+
+Budgets are "queries with a warm layout cache" unless noted; savepoints are not
+counted. Growth checks compare medians across dataset sizes, so they fail on
+complexity changes (an N+1, a scan of every booking) rather than on a slow
+machine. Set CINEMA_PERF_BASELINE_UPDATE=1 to record per-endpoint medians to
+perf_baselines.json; later runs fail when an endpoint is more than
+CINEMA_PERF_BASELINE_TOLERANCE (default 3x) slower than its recorded median.
+"""
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.db.models import F
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.core.management import CommandError, call_command
+
+from . import archive, booking, cancellation, catalog, degraded, importer, layout, pricing, profiling, query_plans, rollups, scheduling, search, sharding, startup, tasks, tracing, traffic, trending, warmup, urls as cinema_urls
+from .models import ArchivedBooking, Booking, Movie, MovieDayStats, PriceZone, Screen, ScreenDayStats, Seat, Show, ShowStats, Task, TrendingScore, WaitlistEntry
+
+User = get_user_model()
+
+# queries that run once per shard holding per-show data (1 when unsharded)
+FANOUT = len(sharding.all_aliases())
+
+# url name -> max queries per request (warm caches, authenticated via JWT where required)
+BUDGETS = {
+    "cinema-health": 0,
+    "cinema-ping": 0,
+    "cinema-profile": 1,            # JWT user
+    "movies": 1,
+    "movie-search": 0,              # in-process index
+    "trending": 0,                  # in-process boards (reloaded every CINEMA_TRENDING_REFRESH_S)
+    "movie-shows": FANOUT,          # + selling-fast from the in-process show board
+    "seats-for-show": 1,            # taken seats of this show
+    "show-availability": FANOUT,    # one grouped query for the whole batch
+    # JWT user; screens, movies, longest runtime, existing shows; lock, re-check (longest runtime, existing
+    # shows), insert; capacities, show rollups;
+    # per day of the test batch: day rows + bumps for movie-day and screen-day; shard id blocks
+    "show-schedule": 1 + 3 + FANOUT + 1 + (1 + FANOUT) + 1 + 2 + 2 * (2 + 2) + 2 * (FANOUT > 1),
+    # JWT user; lock/read show, conflict check, version bump, booking, seat row; shard id block
+    "booking-create": 1 + 5 + (FANOUT > 1),
+    "my-bookings": 1 + 2 * FANOUT + (FANOUT > 1) + 1,  # JWT user; bookings+show(+movie), seats; movies; archive
+    "booking-ticket": 1 + 2 + 3 * (FANOUT > 1),    # JWT user; booking+show(+movie+screen+user), seats
+    # JWT user; lock+read, seat rows, cancel, version bump; offer: shows, first k waiting, seat rows, entries,
+    # + one insert per hold (the test frees one seat) and its shard id block
+    "booking-cancel": 1 + 4 + 4 + 1 + (FANOUT > 1),
+    "show-cancel": 1 + 4 + 1 + 1,   # staff calling a show off: release as above + its holds' entries; close waitlist
+    "booking-confirm": 1 + 4,       # JWT user; lock+read, confirm, waitlist entry, seat count
+    "show-waitlist": 1 + 4,         # JWT user; show, taken count, insert entries, queue length
+    "ticket-file": 0,
+    "stats-movies": 1 + 1,
+    "stats-screens": 1 + 1,
+    "stats-show": 1 + 1,
+}
+
+# cold start of the WSGI / ASGI application in a fresh interpreter (cinema.startup): wall ms (generous, machines
+# vary) and modules imported (the tight one); none of BOOT_DEFERRED may load before the first request
+BOOT_BUDGETS = {"wsgi": (1500, 700), "asgi": (1500, 700)}
+BOOT_DEFERRED = ("rest_framework_simplejwt", "django.test", "rest_framework.views")
+
+# dataset sizes for growth checks: total bookings spread over every show
+SIZES = (200, 1000, 4000)
+# with data growing 20x, "constant" endpoints may get at most this much slower
+FLAT_RATIO = 3.0
+REPEAT = 7
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, "perf_baselines.json")
+_timings = {}
+
+
+def tearDownModule():
+    if os.environ.get("CINEMA_PERF_BASELINE_UPDATE") == "1" and _timings:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(_timings, f, indent=2, sort_keys=True)
+
+
+def _baseline():
+    try:
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# -------------------------------------------------------------------
+# fixtures
+# -------------------------------------------------------------------
+def make_screen(name, rows, cols):
+    screen = Screen.objects.create(name=name, rows=rows, cols=cols)
+    Seat.objects.bulk_create([Seat(screen=screen, row=r, col=c)
+                              for r in range(1, rows + 1) for c in range(1, cols + 1)])
+    return screen
+
+
+def make_shows(movie, screen, n, start=None):
+    start = start or timezone.now() + timedelta(hours=1)
+    return [Show.objects.create(movie=movie, screen=screen, start_time=start + timedelta(hours=3 * i))
+            for i in range(n)]
+
+
+def fill(shows, users, n, skip=None):
+    """Book `n` more seats round-robin over `shows` for `users` (one seat per booking), set-based."""
+    Through = Booking.seats.through
+    free = {}
+    for alias, group in sharding.group_by_shard([s.id for s in shows]).items():
+        taken = set(Through.objects.using(alias).filter(booking__show_id__in=group)
+                    .values_list("booking__show_id", "seat_id"))
+        for s in shows:
+            if s.id in group:
+                seat_ids = layout.get_layout(s.screen_id).seat_ids
+                free[s.id] = [sid for sid in seat_ids if (s.id, sid) not in taken and (s.id, sid) != skip]
+
+    picks = []
+    while len(picks) < n:
+        progressed = False
+        for s in shows:
+            if free[s.id] and len(picks) < n:
+                picks.append((s, free[s.id].pop()))
+                progressed = True
+        if not progressed:
+            raise ValueError("not enough free seats for the requested dataset size")
+
+    out = []
+    for alias in sharding.all_aliases():
+        mine = [(i, s, sid) for i, (s, sid) in enumerate(picks) if sharding.shard_for_show(s.id) == alias]
+        bookings = Booking.objects.using(alias).bulk_create(sharding.assign_ids(
+            [Booking(user=users[i % len(users)], show=s, total_amount=s.price) for i, s, _ in mine], alias))
+        Through.objects.using(alias).bulk_create(
+            [Through(booking_id=b.id, seat_id=sid) for b, (_, _, sid) in zip(bookings, mine)])
+        out.extend(bookings)
+    return out
+
+
+def _reset_caches():
+    cache.clear()
+    layout._local.clear()
+    pricing.forget()
+    search._index = None
+    trending.forget()
+    degraded.forget_snapshots()
+    degraded.breaker.reset()
+
+
+class PerfTestCase(TestCase):
+    databases = "__all__"
+    maxDiff = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls._dirs = override_settings(CINEMA_TICKET_DIR=os.path.join(cls._tmp.name, "tickets"),
+                                      CINEMA_DEGRADED_DIR=os.path.join(cls._tmp.name, "degraded"),
+                                      CINEMA_CATALOG_DIR=os.path.join(cls._tmp.name, "catalog"),
+                                      CINEMA_DEGRADED_AUTO_REPLAY=False)
+        cls._dirs.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._dirs.disable()
+        cls._tmp.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        _reset_caches()
+        cls.staff = User.objects.create_user("perf-staff", password="x", is_staff=True)
+        cls.user = User.objects.create_user("perf-user", password="x")
+        cls.crowd = [User.objects.create_user(f"perf-crowd-{i}", password="x") for i in range(20)]
+        cls.movie = Movie.objects.create(title="Perf Movie", duration_min=120)
+        cls.other_movie = Movie.objects.create(title="Other Movie", duration_min=90)
+        cls.screen = make_screen("Perf Screen", 20, 20)
+        cls.shows = make_shows(cls.movie, cls.screen, 12)
+        cls.show = cls.shows[0]
+        for s in cls.shows:
+            rollups.record_show_created(s.id)
+
+    def setUp(self):
+        _reset_caches()
+        shutil.rmtree(settings.CINEMA_DEGRADED_DIR, ignore_errors=True)
+        self.anon = APIClient()
+        self.client = self._client(self.user)
+        self.admin = self._client(self.staff)
+
+    def _client(self, user):
+        c = APIClient()
+        c.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return c
+
+    # ---------------------------------------------------------------
+    def count_queries(self, fn):
+        """(response, queries on every database): shard queries count against the budgets too."""
+        with ExitStack() as stack:
+            ctxs = [(alias, stack.enter_context(CaptureQueriesContext(connections[alias])))
+                    for alias in connections]
+            resp = fn()
+            if getattr(resp, "streaming", False):
+                b"".join(resp.streaming_content)
+        multi = len(ctxs) > 1
+        sql = [f"[{alias}] {q['sql']}" if multi else q["sql"] for alias, ctx in ctxs for q in ctx.captured_queries
+               if not q["sql"].upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))]
+        return resp, sql
+
+    def assertBudget(self, name, fn, expected_status=200):
+        fn()  # warm layout / show->screen caches
+        resp, sql = self.count_queries(fn)
+        self.assertEqual(resp.status_code, expected_status, getattr(resp, "data", None))
+        self.assertLessEqual(len(sql), BUDGETS[name], f"{name}: {len(sql)} queries\n" + "\n".join(sql))
+        return resp
+
+    def median_ms(self, fn, key=None):
+        fn()
+        samples = []
+        for _ in range(REPEAT):
+            t0 = time.perf_counter()
+            resp = fn()
+            if getattr(resp, "streaming", False):
+                b"".join(resp.streaming_content)
+            samples.append((time.perf_counter() - t0) * 1000)
+        ms = statistics.median(samples)
+        if key:
+            _timings[key] = round(ms, 3)
+            recorded = _baseline().get(key)
+            tolerance = float(os.environ.get("CINEMA_PERF_BASELINE_TOLERANCE", 3.0))
+            if recorded and os.environ.get("CINEMA_PERF_BASELINE_UPDATE") != "1":
+                self.assertLessEqual(ms, recorded * tolerance + 1.0,
+                                     f"{key}: {ms:.2f}ms vs baseline {recorded:.2f}ms")
+        return ms
+
+    def assertFlat(self, name, fn, grow):
+        """Queries identical and latency roughly constant while `grow(size)` adds data."""
+        counts, times = [], []
+        for size in SIZES:
+            grow(size)
+            fn()
+            _, sql = self.count_queries(fn)
+            counts.append(len(sql))
+            times.append(self.median_ms(fn, key=f"{name}@{size}"))
+        self.assertEqual(len(set(counts)), 1, f"{name}: query count grows with data {dict(zip(SIZES, counts))}")
+        # +1ms slack keeps sub-millisecond noise from failing the ratio
+        self.assertLessEqual(times[-1], times[0] * FLAT_RATIO + 1.0,
+                             f"{name}: latency grows with data {dict(zip(SIZES, [round(t, 2) for t in times]))}")
+
+    def grow_bookings(self, users, skip=None):
+        done = [0]
+
+        def grow(total):
+            fill(self.shows, users, total - done[0], skip=skip)
+            done[0] = total
+        return grow
+
+
+# -------------------------------------------------------------------
+# every routed endpoint has a budget
+# -------------------------------------------------------------------
+class BudgetCoverageTests(TestCase):
+    def test_every_cinema_url_has_a_budget(self):
+        names = {p.name for p in cinema_urls.urlpatterns}
+        self.assertEqual(names - set(BUDGETS), set(), "add a query budget for the new endpoint(s)")
+
+
+class MigrationStateTests(TestCase):
+    def test_models_match_migrations(self):
+        # also catches on_delete handlers (cinema.sharding.install_cascades) leaking into migrations
+        call_command("makemigrations", "cinema", "users", check=True, dry_run=True, verbosity=0)
+
+
+# -------------------------------------------------------------------
+# worker boot
+# -------------------------------------------------------------------
+class BootBudgetTests(SimpleTestCase):
+    def test_wsgi_and_asgi_boot_within_budget(self):
+        mysql = any(db["ENGINE"] == "django.db.backends.mysql" for db in settings.DATABASES.values())
+        for target, (ms, modules) in BOOT_BUDGETS.items():
+            r = startup.profile(target)
+            self.assertLessEqual(r["boot_ms"], ms, r["phases"])
+            self.assertLessEqual(len(r["modules"]), modules)
+            self.assertEqual({"settings", "apps", "models", "ready", "middleware"} - set(r["phases"]), set())
+            self.assertIn("cinema", r["apps"])
+            loaded = set(r["modules"])
+            self.assertEqual([m for m in BOOT_DEFERRED if m in loaded], [], target)
+            self.assertEqual("pymysql" in loaded, mysql)
+            # anonymous first request: the URLconf does not pull simplejwt in either
+            self.assertNotIn("rest_framework_simplejwt", r["urlconf_modules"])
+
+        api_only = startup.profile("wsgi", env={"CINEMA_ADMIN": "0"})
+        self.assertNotIn("admin", api_only["apps"])
+        self.assertFalse(any(m.endswith(".admin") or ".admin." in m for m in api_only["modules"]))
+        self.assertLess(len(api_only["modules"]), len(r["modules"]))
+
+        out = io.StringIO()
+        with self.assertRaisesRegex(CommandError, "over budget: django.setup"):
+            call_command("profile_startup", "setup", runs=1, max_modules=1, stdout=out)
+        self.assertIn("first request: URLconf", out.getvalue())
+
+
+# -------------------------------------------------------------------
+# query budgets
+# -------------------------------------------------------------------
+class QueryBudgetTests(PerfTestCase):
+    def test_health_and_ping(self):
+        self.assertBudget("cinema-health", lambda: self.anon.get(reverse("cinema-health")))
+        self.assertBudget("cinema-ping", lambda: self.anon.get(reverse("cinema-ping")))
+
+    def test_profile(self):
+        self.assertBudget("cinema-profile",
+                          lambda: self.admin.get(reverse("cinema-profile"), {"seconds": 0.02}))
+
+    def test_movies(self):
+        self.assertBudget("movies", lambda: self.anon.get(reverse("movies")))
+
+    def test_movie_search(self):
+        Movie.objects.create(title="The Dark Knight", description="Batman faces the Joker.", duration_min=152)
+        Movie.objects.bulk_create([Movie(title=f"Filler {i}", description="drama", duration_min=90)
+                                   for i in range(2000)])
+        search.invalidate()
+        url = reverse("movie-search")
+        for q in ("dark knight", "kni", "batmn"):  # exact, prefix, typo
+            resp = self.assertBudget("movie-search", lambda: self.anon.get(url, {"q": q}))
+            self.assertEqual(resp.data["results"][0]["title"], "The Dark Knight", q)
+        resp = self.anon.get(url, {"q": "filler", "page": 3, "page_size": 50})
+        self.assertEqual((resp.data["count"], len(resp.data["results"])), (2000, 50))
+
+        idx = search.get_index()
+        self.assertLess(self.median_ms(lambda: idx.search("knight")), 1.0)
+        Movie.objects.filter(title="The Dark Knight").get().delete()
+        self.assertEqual(self.anon.get(url, {"q": "knight"}).data["count"], 0)
+
+    def test_trending(self):
+        now = time.time()
+        day = 24 * 3600
+        for i, s in enumerate(self.shows[:6]):
+            rollups.record_booking(s.id, seats=i + 1, amount="0", at=now)
+        rollups.record_booking(self.shows[6].id, seats=50, amount="0", at=now - 10 * day)  # long decayed
+        rollups.record_booking(self.shows[7].id, seats=12, amount="0", at=now)
+        rollups.record_release(self.shows[7].id, seats=12, amount="0", at=now)          # cancelled again
+
+        resp = self.assertBudget("trending", lambda: self.anon.get(reverse("trending"), {"limit": 3}))
+        self.assertEqual([s["id"] for s in resp.data["shows"]], [s.id for s in reversed(self.shows[3:6])])
+        self.assertEqual(resp.data["shows"][0]["score"], 6)
+        self.assertEqual([m["title"] for m in resp.data["movies"]], ["Perf Movie"])
+        self.assertAlmostEqual(resp.data["movies"][0]["score"], 21, places=2)
+
+        # a full rebuild from bookings agrees with the incremental rows
+        trending.forget()
+        fill(self.shows[:2], self.crowd, 24)
+        call_command("rebuild_trending", stdout=open(os.devnull, "w"))
+        self.assertEqual(TrendingScore.objects.filter(kind=trending.SHOW).count(), 2)
+        self.assertAlmostEqual(trending.board(trending.MOVIE).score(self.movie.id), 24, places=2)
+        shows = self.anon.get(reverse("movie-shows", args=[self.movie.id])).data
+        self.assertEqual([s["selling_fast"] for s in shows[:3]], [True, True, False])
+
+    def test_movie_shows(self):
+        resp = self.assertBudget("movie-shows", lambda: self.anon.get(reverse("movie-shows", args=[self.movie.id])))
+        self.assertEqual(len(resp.data), len(self.shows))
+
+    def test_seats_full_and_compact(self):
+        fill([self.show], self.crowd, 50)
+        url = reverse("seats-for-show", args=[self.show.id])
+        resp = self.assertBudget("seats-for-show", lambda: self.anon.get(url))
+        self.assertEqual(sum(not s["available"] for s in resp.data), 50)
+        resp = self.assertBudget("seats-for-show", lambda: self.anon.get(url, {"compact": 1}))
+        self.assertEqual(resp.data["n"], 400)
+
+    def test_availability(self):
+        fill(self.shows, self.crowd, 120)
+        ids = ",".join(str(s.id) for s in self.shows)
+        url = reverse("show-availability")
+        self.assertBudget("show-availability", lambda: self.anon.get(url, {"ids": ids}))
+        self.assertBudget("show-availability", lambda: self.anon.get(url, {"ids": ids, "maps": 1}))
+        _, sql = self.count_queries(lambda: self.anon.get(url, {
+            "movie": self.movie.id, "date": timezone.localdate(self.show.start_time).isoformat()}))
+        self.assertLessEqual(len(sql), BUDGETS["show-availability"] + FANOUT)  # + resolving movie/date to ids
+        resp = self.anon.get(url, {"movie": self.movie.id, "date": "2026-02-30"})
+        self.assertEqual(resp.status_code, 400, resp.content)
+
+    def test_booking_create(self):
+        url = reverse("booking-create")
+        numbers = iter(range(1, 400))
+        self.assertBudget("booking-create",
+                          lambda: self.client.post(url, {"show_id": self.show.id, "seat_number": str(next(numbers))},
+                                                   format="json"),
+                          expected_status=201)
+        # conflict path stays within budget too
+        self.assertBudget("booking-create",
+                          lambda: self.client.post(url, {"show_id": self.show.id, "seat_number": "1"}, format="json"),
+                          expected_status=409)
+
+    @override_settings(CINEMA_BOOKING_MODE="optimistic")
+    def test_booking_create_optimistic(self):
+        url = reverse("booking-create")
+        numbers = iter(range(1, 400))
+        self.assertBudget("booking-create",
+                          lambda: self.client.post(url, {"show_id": self.show.id, "seat_number": str(next(numbers))},
+                                                   format="json"),
+                          expected_status=201)
+        self.assertBudget("booking-create",
+                          lambda: self.client.post(url, {"show_id": self.show.id, "seat_number": "1"}, format="json"),
+                          expected_status=409)
+        self.show.refresh_from_db()
+        self.assertEqual(self.show.version, 2)
+
+    def test_my_bookings(self):
+        fill(self.shows, [self.user], 40)
+        resp = self.assertBudget("my-bookings", lambda: self.client.get(reverse("my-bookings")))
+        self.assertEqual(len(resp.data), 40)
+
+    def test_ticket_and_file(self):
+        (b,) = fill([self.show], [self.user], 1)
+        resp = self.assertBudget("booking-ticket", lambda: self.client.get(reverse("booking-ticket", args=[b.id])))
+        h = resp.data["svg"].rsplit("/", 1)[-1].split(".")[0]
+        self.assertBudget("ticket-file", lambda: self.anon.get(reverse("ticket-file", args=[h, "svg"])))
+
+    def test_stats(self):
+        fill(self.shows, self.crowd, 30)
+        day = timezone.localdate(self.show.start_time)
+        rng = {"from": (day - timedelta(days=1)).isoformat(), "to": (day + timedelta(days=3)).isoformat()}
+        self.assertBudget("stats-movies", lambda: self.admin.get(reverse("stats-movies"), rng))
+        self.assertBudget("stats-screens", lambda: self.admin.get(reverse("stats-screens"), rng))
+        self.assertBudget("stats-show", lambda: self.admin.get(reverse("stats-show", args=[self.show.id])))
+        for name in ("stats-movies", "stats-screens"):
+            resp = self.admin.get(reverse(name), {"from": "2024-02-31"})
+            self.assertEqual(resp.status_code, 400, resp.content)
+
+
+# -------------------------------------------------------------------
+# request tracing and the staff profiler
+# -------------------------------------------------------------------
+class TracingTests(PerfTestCase):
+    def test_sampled_request_writes_its_spans(self):
+        path = os.path.join(self._tmp.name, "traces", "trace.json")
+        tracing.forget()
+        self.addCleanup(tracing.forget)
+        with override_settings(CINEMA_TRACE_ENABLED=True, CINEMA_TRACE_SAMPLE_RATE=1.0, CINEMA_TRACE_FILE=path):
+            self.assertEqual(self.anon.get(reverse("seats-for-show", args=[self.show.id])).status_code, 200)
+        tracing.forget()
+        with open(path, encoding="utf-8") as f:
+            events = json.loads(f.read().rstrip().rstrip(",") + "]")
+        by_cat = {}
+        for e in events:
+            by_cat.setdefault(e["cat"], []).append(e)
+        [root] = by_cat["http"]
+        self.assertEqual((root["name"], root["args"]["status"]),
+                         (f"GET {reverse('seats-for-show', args=[self.show.id])}", 200))
+        self.assertEqual(len(by_cat["view"]), 1)
+        self.assertTrue(by_cat["db"] and by_cat["cache"])
+        for e in events:  # every span sits inside the request's
+            self.assertGreaterEqual(e["ts"], root["ts"])
+            self.assertLessEqual(e["ts"] + e["dur"], root["ts"] + root["dur"] + 1)
+
+    def test_profile_rejects_bad_parameters_and_a_second_run(self):
+        url = reverse("cinema-profile")
+        for params in ({"seconds": "abc"}, {"seconds": "nan"}, {"seconds": "inf"}, {"interval_ms": "inf"}):
+            self.assertEqual(self.admin.get(url, params).status_code, 400, params)
+        with profiling._busy:  # a profile running in another thread
+            resp = self.admin.get(url, {"seconds": 0.01})
+        self.assertEqual((resp.status_code, resp.data["detail"]), (409, "a profile is already running"))
+        resp = self.admin.get(url, {"seconds": 0.01, "interval_ms": 10 ** 9})
+        self.assertEqual(resp.status_code, 200)
+        self.assertGreaterEqual(int(resp["X-Profile-Samples"]), 1)
+
+
+# -------------------------------------------------------------------
+# traffic capture, replay and comparison
+# -------------------------------------------------------------------
+class TrafficTests(PerfTestCase):
+    def capture(self, **overrides):
+        path = os.path.join(self._tmp.name, "traffic", "capture.jsonl")
+        traffic.forget()
+        self.addCleanup(traffic.forget)
+        return path, override_settings(CINEMA_CAPTURE_ENABLED=True, CINEMA_CAPTURE_FILE=path, **overrides)
+
+    def test_capture_samples_and_redacts(self):
+        path, enabled = self.capture(CINEMA_CAPTURE_SAMPLE_RATE=0.5)
+        seats_url = reverse("seats-for-show", args=[self.show.id])
+        with enabled, mock.patch.object(traffic.random, "random", side_effect=[0.1, 0.9, 0.1]):
+            self.client.post(reverse("booking-create"), {"show_id": self.show.id, "seat_number": "7",
+                                                         "password": "hunter2", "note": "x" * 100}, format="json")
+            self.anon.get(seats_url)  # not sampled
+            self.anon.get(seats_url, {"compact": 1, "access_token": "abc"})
+            self.anon.post(reverse("token_obtain_pair"), {"username": "u", "password": "p"}, format="json")
+        traffic.forget()
+        [post, get] = list(traffic.read_log(path))
+        self.assertEqual((post["m"], post["r"], post["s"]), ("POST", "booking-create", 201))
+        self.assertEqual(post["b"], {"show_id": self.show.id, "seat_number": "7", "note": "x" * traffic.MAX_VALUE_LEN})
+        self.assertEqual(post["u"], traffic.user_bucket(self.user))
+        self.assertEqual((get["p"], get["q"], get["u"]), (seats_url, {"compact": "1"}, None))
+        with open(path, encoding="utf-8") as f:
+            self.assertNotIn("hunter2", f.read())
+
+    def test_replay_survives_broken_responses(self):
+        log = os.path.join(self._tmp.name, "capture.jsonl")
+        with open(log, "w", encoding="utf-8") as f:
+            for i in range(3):
+                f.write(json.dumps({"t": 100 + i, "m": "GET", "r": "movies", "p": reverse("movies"), "q": {},
+                                    "u": None, "d": 1.0, "s": 200}) + "\n")
+        out = os.path.join(self._tmp.name, "replay.json")
+        with mock.patch("urllib.request.urlopen", side_effect=http.client.IncompleteRead(b"")):
+            call_command("replay_traffic", log, out=out, speed="max", stdout=io.StringIO())
+        with open(out, encoding="utf-8") as f:
+            self.assertEqual([r[2] for r in json.load(f)["results"]], [0, 0, 0])
+
+    def test_compare_replays_flags_latency_and_status_changes(self):
+        def results(path, label, ms, statuses):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"label": label, "requests": len(statuses), "wall_s": 1.0, "results": [
+                    ["movies", "GET", 200, ms, 200] for _ in range(20)
+                ] + [["booking-create", "POST", s, 5.0, 201] for s in statuses]}, f)
+            return path
+
+        base = results(os.path.join(self._tmp.name, "base.json"), "v1", 10.0, [201] * 10)
+        cand = results(os.path.join(self._tmp.name, "cand.json"), "v2", 15.0, [201] * 8 + [409] * 2)
+        out = io.StringIO()
+        call_command("compare_replays", base, cand, json=True, stdout=out)
+        rows = {r["endpoint"]: r for r in json.loads(out.getvalue())["endpoints"]}
+        self.assertEqual(rows["GET movies"]["flags"], ["p50 +50%", "p95 +50%"])
+        self.assertEqual(rows["POST booking-create"]["flags"], ["201 -20.0pp", "409 +20.0pp"])
+        self.assertEqual(rows["POST booking-create"]["p50"], [5.0, 5.0])  # below --min-samples: not flagged
+        with self.assertRaisesMessage(CommandError, "2 endpoint(s) regressed"):
+            call_command("compare_replays", base, cand, fail=True, stdout=io.StringIO())
+        call_command("compare_replays", base, base, fail=True, stdout=io.StringIO())
+
+
+# -------------------------------------------------------------------
+# admin: sharded changelists, objects and the seat map
+# -------------------------------------------------------------------
+class AdminTests(PerfTestCase):
+    def test_show_and_booking_pages_read_the_right_database(self):
+        root = User.objects.create_superuser("perf-root", password="x")
+        web = Client()
+        web.force_login(root)
+        sold = fill([self.show], self.crowd[:3], 3)
+        alias = sharding.shard_for_show(self.show.id)
+        on_alias = {"shard": alias} if sharding.enabled() else {}
+
+        resp = web.get(reverse("admin:cinema_show_changelist"), on_alias)
+        self.assertEqual(resp.status_code, 200)
+        listed = {o.pk for o in resp.context["cl"].result_list}
+        self.assertEqual(listed, {s.id for s in self.shows if sharding.shard_for_show(s.id) == alias})
+        resp = web.get(reverse("admin:cinema_show_changelist"), {"q": "Perf Movie", **on_alias})
+        self.assertEqual({o.pk for o in resp.context["cl"].result_list}, listed)
+        self.assertEqual(web.get(reverse("admin:cinema_show_change", args=[self.show.id])).status_code, 200)
+        self.assertEqual(web.get(reverse("admin:cinema_show_delete", args=[self.show.id])).status_code, 200)
+
+        resp, sql = self.count_queries(lambda: web.get(reverse("admin:cinema_show_seat_map", args=[self.show.id])))
+        self.assertEqual(resp.status_code, 200)
+        # one joined query on a single database; show, taken seats, seats, movie when the show is on a shard
+        self.assertEqual(len([q for q in sql if "cinema_" in q]), 1 if FANOUT == 1 else 4, sql)
+        self.assertContains(resp, "3 / 400 seats taken")
+        self.assertContains(resp, "Perf Movie")
+        self.assertEqual(web.get(reverse("admin:cinema_show_seat_map", args=[999999])).status_code, 404)
+
+        booking = sold[0]
+        on_alias = {"shard": sharding.shard_for_booking(booking.id)} if sharding.enabled() else {}
+        resp = web.get(reverse("admin:cinema_booking_changelist"), {"q": booking.user.username, **on_alias})
+        self.assertEqual([o.pk for o in resp.context["cl"].result_list], [booking.id])
+        self.assertEqual(web.get(reverse("admin:cinema_booking_change", args=[booking.id])).status_code, 200)
+
+
+# -------------------------------------------------------------------
+# batch scheduling: interval index, rejection report, one transaction
+# -------------------------------------------------------------------
+class SchedulingTests(PerfTestCase):
+    def test_conflicts_are_reported_and_the_rest_created(self):
+        screen = make_screen("Sched Screen", 2, 2)
+        base = (timezone.localtime() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+        at = lambda **kw: (base + timedelta(**kw)).isoformat()
+        rows = [
+            {"screen": screen.id, "movie": self.movie.id, "start_time": at()},
+            {"screen": screen.id, "movie": self.movie.id, "start_time": at(hours=2, minutes=5)},
+            {"screen": str(screen.id), "movie": self.movie.id, "start_time": at(hours=1)},
+            {"screen": screen.id, "movie": self.other_movie.id, "start_time": at(hours=2, minutes=15)},
+            {"screen": "Sched Screen", "movie": str(self.movie.id), "start_time": at(days=1), "price": "300"},
+            {"screen": "No Such Screen", "movie": self.movie.id, "start_time": at(days=2)},
+            {"screen": screen.id, "movie": 999999, "start_time": at(days=2)},
+            {"screen": screen.id, "movie": self.movie.id, "start_time": "tomorrow-ish"},
+            {"screen": screen.id, "movie": self.movie.id, "start_time": at(days=-3)},
+            {"screen": self.screen.id, "movie": self.other_movie.id,
+             "start_time": (self.show.start_time + timedelta(minutes=30)).isoformat()},
+        ]
+        resp, sql = self.count_queries(lambda: self.admin.post(reverse("show-schedule"), {"shows": rows}, format="json"))
+        self.assertEqual(resp.status_code, 201, resp.data)
+        self.assertLessEqual(len(sql), BUDGETS["show-schedule"], "\n".join(sql))
+        self.assertEqual((resp.data["received"], resp.data["created"]), (10, 3))
+        self.assertEqual([(r["row"], r["reason"]) for r in resp.data["rejected"]], [
+            (5, "unknown_screen"), (6, "unknown_movie"), (7, "invalid_start_time"), (8, "in_past"),
+            (1, "cleaning_gap"), (2, "overlap"), (9, "overlap"),
+        ])
+        by_row = {r["row"]: r for r in resp.data["rejected"]}
+        self.assertEqual(by_row[1]["conflicts_with"]["row"], 0)
+        self.assertEqual(by_row[9]["conflicts_with"]["show_id"], self.show.id)
+
+        created = Show.objects.using(sharding.shard_for_screen(screen.id)).filter(screen=screen)
+        self.assertEqual(sorted(str(p) for p in created.values_list("price", flat=True)), ["250.00", "250.00", "300.00"])
+        self.assertEqual(ShowStats.objects.filter(screen_id=screen.id, capacity=4).count(), 3)
+        self.assertEqual(sorted(ScreenDayStats.objects.filter(screen=screen).values_list("shows", "capacity")),
+                         [(1, 4), (2, 8)])
+        self.assertEqual(MovieDayStats.objects.filter(movie=self.other_movie, day=base.date()).get().shows, 1)
+
+        # the same batch again: everything collides with what was just created, nothing is written
+        again = self.admin.post(reverse("show-schedule"), {"shows": rows[:5]}, format="json")
+        self.assertEqual((again.status_code, again.data["created"]), (200, 0))
+        self.assertEqual({r["reason"] for r in again.data["rejected"]}, {"overlap"})
+
+        # the single-show check behind the admin form uses the same index
+        show = Show(movie=self.movie, screen=screen, start_time=base + timedelta(hours=3))
+        with self.assertRaises(ValidationError):
+            show.full_clean()
+        show.start_time = base + timedelta(hours=6)
+        show.full_clean()
+
+    def test_long_running_show_of_another_movie_blocks_later_starts(self):
+        screen = make_screen("Epic Screen", 2, 2)
+        epic = Movie.objects.create(title="Epic", duration_min=240)
+        start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        long_show = Show.objects.create(movie=epic, screen=screen, start_time=start)
+        # a 90-minute movie two hours in: the batch holds no long movie, the screen does
+        result = scheduling.schedule([{"screen": screen.id, "movie": self.other_movie.id,
+                                       "start_time": start + timedelta(hours=2)}])
+        self.assertEqual((result["accepted"], result["created"]), (0, 0))
+        self.assertEqual(result["rejected"][0]["conflicts_with"]["show_id"], long_show.id)
+        with self.assertRaises(ValidationError):
+            Show(movie=self.other_movie, screen=screen, start_time=start + timedelta(hours=2)).full_clean()
+
+    def test_apply_rechecks_under_the_screen_lock(self):
+        screen = make_screen("Race Screen", 2, 2)
+        start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        mine, report = scheduling.plan([{"screen": screen.id, "movie": self.movie.id, "start_time": start},
+                                        {"screen": screen.id, "movie": self.movie.id,
+                                         "start_time": start + timedelta(hours=5)}])
+        self.assertEqual((len(mine), report), (2, []))
+        # another scheduler commits an overlapping show between our plan and our insert
+        theirs = scheduling.schedule([{"screen": screen.id, "movie": self.other_movie.id,
+                                       "start_time": start + timedelta(minutes=30)}])
+        self.assertEqual(theirs["created"], 1)
+        created = scheduling.apply(mine, report)
+        self.assertEqual([s.start_time for s in created], [start + timedelta(hours=5)])
+        self.assertEqual([(r["row"], r["reason"], r["conflicts_with"]["show_id"]) for r in report],
+                         [(0, "overlap", theirs["show_ids"][0])])
+        self.assertEqual(Show.objects.using(sharding.shard_for_screen(screen.id)).filter(screen=screen).count(), 2)
+
+    def test_week_for_many_screens_in_one_batch(self):
+        screens = [make_screen(f"Bulk {i}", 2, 2) for i in range(50)]
+        base = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        rows = [{"screen": s.id, "movie": self.other_movie.id, "start_time": base + timedelta(minutes=105 * k)}
+                for s in screens for k in range(100)]
+        rows += rows[::50]  # duplicates: each collides with its original
+        t0 = time.perf_counter()
+        result = scheduling.schedule(rows)
+        elapsed = time.perf_counter() - t0
+        self.assertEqual((result["created"], len(result["rejected"])), (5000, 100))
+        self.assertEqual(ShowStats.objects.filter(screen_id__in=[s.id for s in screens]).count(), 5000)
+        self.assertLess(elapsed, 10, f"5100 rows took {elapsed:.1f}s")
+
+
+# -------------------------------------------------------------------
+# tiered pricing: zones x show multiplier, one price vector per layout
+# -------------------------------------------------------------------
+class PricingTests(PerfTestCase):
+    def test_seat_map_prices_and_server_side_totals(self):
+        screen = make_screen("Zoned Screen", 3, 2)
+        front = PriceZone.objects.create(screen=screen, name="Front", first_row=1, last_row=1, multiplier=Decimal("0.8"))
+        PriceZone.objects.create(screen=screen, name="Recliner", first_row=3, last_row=3, multiplier=Decimal("1.5"))
+        show = Show.objects.create(movie=self.movie, screen=screen, start_time=timezone.now() + timedelta(days=2),
+                                   price=200, price_multiplier=Decimal("1.25"))
+        url = reverse("seats-for-show", args=[show.id])
+
+        resp = self.assertBudget("seats-for-show", lambda: self.anon.get(url))
+        self.assertEqual([s["price"] for s in resp.data], ["200.00"] * 2 + ["250.00"] * 2 + ["375.00"] * 2)
+        compact = self.assertBudget("seats-for-show", lambda: self.anon.get(url, {"compact": 1})).data
+        self.assertEqual(compact["prices"], [[20000, 2], [25000, 2], [37500, 2]])
+
+        # the client sends a seat, never an amount
+        for mode, number, amount in ((booking.LOCKING, "5", "375.00"), (booking.OPTIMISTIC, "1", "200.00")):
+            with override_settings(CINEMA_BOOKING_MODE=mode):
+                resp = self.client.post(reverse("booking-create"), {"show_id": show.id, "seat_number": number,
+                                                                    "total_amount": "0.01"}, format="json")
+            self.assertEqual(resp.status_code, 201, resp.data)
+            self.assertEqual(str(resp.data["total_amount"]), amount)
+            self.assertEqual(str(Booking.objects.using(sharding.shard_for_show(show.id))
+                                 .get(id=resp.data["id"]).total_amount), amount)
+
+        # zone and show edits reprice the map (layout version / cached show terms)
+        front.multiplier = Decimal("0.5")
+        front.save()
+        show.price_multiplier = 1
+        show.save()
+        prices = [s["price"] for s in self.anon.get(url).data]
+        self.assertEqual(prices, ["100.00"] * 2 + ["200.00"] * 2 + ["300.00"] * 2)
+
+    def test_edits_from_another_worker_show_up_after_the_local_version_ttl(self):
+        screen = make_screen("Zoned Screen", 2, 2)
+        zone = PriceZone.objects.create(screen=screen, name="Front", first_row=1, last_row=1, multiplier=2)
+        show = Show.objects.create(movie=self.movie, screen=screen, start_time=timezone.now() + timedelta(days=2),
+                                   price=100)
+        url = reverse("seats-for-show", args=[show.id])
+        self.assertEqual([s["price"] for s in self.anon.get(url).data], ["200.00"] * 2 + ["100.00"] * 2)
+
+        # what another worker's save does to the DB; its (per-process) cache bump never reaches this one
+        PriceZone.objects.filter(id=zone.id).update(multiplier=3)
+        Screen.objects.filter(id=screen.id).update(layout_version=F("layout_version") + 1)
+        Show.objects.using(sharding.shard_for_show(show.id)).filter(id=show.id).update(price=50)
+        self.assertFalse(layout.shared_cache())
+        self.assertEqual([s["price"] for s in self.anon.get(url).data], ["200.00"] * 2 + ["100.00"] * 2)
+
+        later = time.time() + settings.CINEMA_LOCAL_VERSION_TTL_S + 1
+        with mock.patch("time.time", return_value=later):
+            prices = [s["price"] for s in self.anon.get(url).data]
+        self.assertEqual(prices, ["150.00"] * 2 + ["50.00"] * 2)
+
+
+# -------------------------------------------------------------------
+# cancellation: set-based release, FIFO waitlist, timed holds
+# -------------------------------------------------------------------
+class CancellationTests(PerfTestCase):
+    def test_released_seats_go_to_the_waitlist_in_order(self):
+        screen = make_screen("Tiny Screen", 1, 2)
+        show = Show.objects.create(movie=self.movie, screen=screen, start_time=timezone.now() + timedelta(days=1))
+        alias = sharding.shard_for_show(show.id)
+        seller, first, second, third, fourth = self.crowd[:5]
+        sold = fill([show], [seller], 2)
+        waitlist = reverse("show-waitlist", args=[show.id])
+
+        self.assertEqual(self._client(first).post(waitlist, {"seats": 7}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(reverse("show-waitlist", args=[self.show.id])).status_code, 409)
+        resp, sql = self.count_queries(lambda: self._client(first).post(waitlist, format="json"))
+        self.assertEqual((resp.status_code, resp.data["position"]), (201, 1), resp.data)
+        self.assertLessEqual(len(sql), BUDGETS["show-waitlist"], "\n".join(sql))
+        for n, u in enumerate((second, third, fourth), 2):
+            self.assertEqual(self._client(u).post(waitlist, format="json").data["position"], n)
+
+        # somebody else's booking: not found; the seller's: released and held for `first`
+        self.assertEqual(self.client.post(reverse("booking-cancel", args=[sold[0].id])).status_code, 404)
+        self.anon.get(reverse("seats-for-show", args=[show.id]))  # warm layout + prices
+        stats = lambda: ShowStats.objects.filter(show_id=show.id).values_list("seats_sold", flat=True).get()
+        sold_before = stats()
+        with override_settings(CINEMA_TASKS_EAGER=True), self.captureOnCommitCallbacks(using=alias, execute=True):
+            resp, sql = self.count_queries(
+                lambda: self._client(seller).post(reverse("booking-cancel", args=[sold[0].id])))
+        self.assertEqual(resp.status_code, 200, resp.data)
+        self.assertLessEqual(len(sql), BUDGETS["booking-cancel"], "\n".join(sql))
+        self.assertEqual((resp.data["cancelled"], resp.data["released"], resp.data["offered"]), (1, 1, 1))
+        self.assertEqual(stats(), sold_before - 1)
+        self.assertFalse(any(s["available"] for s in self.anon.get(reverse("seats-for-show", args=[show.id])).data))
+
+        hold = self._client(first).get(reverse("my-bookings")).data[0]
+        self.assertEqual((hold["status"], hold["show_id"]), (Booking.PENDING, show.id))
+        self.assertIsNotNone(hold["hold_until"])
+        with override_settings(CINEMA_TASKS_EAGER=True), self.captureOnCommitCallbacks(using=alias, execute=True):
+            resp, sql = self.count_queries(
+                lambda: self._client(first).post(reverse("booking-confirm", args=[hold["id"]])))
+        self.assertEqual((resp.status_code, str(resp.data["total_amount"])), (200, "250.00"), resp.data)
+        self.assertLessEqual(len(sql), BUDGETS["booking-confirm"], "\n".join(sql))
+        self.assertEqual(stats(), sold_before)
+
+        # the seller's other seat (cancelled per show) goes to `second`, who lets the hold lapse: on to `third`
+        resp = self._client(seller).post(reverse("show-cancel", args=[show.id]))
+        self.assertEqual(resp.data["offered"], 1)
+        lapsed = Booking.objects.using(alias).get(user=second, status=Booking.PENDING)
+        self.assertEqual(cancellation.expire_holds(), {"expired": 0, "offered": 0})
+        later = timezone.now() + timedelta(minutes=cancellation.hold_minutes() + 1)
+        self.assertEqual(cancellation.expire_holds(now=later), {"expired": 1, "offered": 1})
+        with self.assertRaises(cancellation.HoldExpired):
+            cancellation.confirm_hold(second, lapsed.id)
+        self.assertEqual(list(WaitlistEntry.objects.filter(show_id=show.id).values_list("user", "status")), [
+            (first.id, WaitlistEntry.CONFIRMED), (second.id, WaitlistEntry.EXPIRED),
+            (third.id, WaitlistEntry.OFFERED), (fourth.id, WaitlistEntry.WAITING),
+        ])
+
+        # calling the show off: staff only, everything cancelled, nobody offered anything
+        everyone = reverse("show-cancel", args=[show.id])
+        self.assertEqual(self.client.post(everyone, {"all": True}, format="json").status_code, 403)
+        resp, sql = self.count_queries(lambda: self.admin.post(everyone, {"all": True}, format="json"))
+        self.assertLessEqual(len(sql), BUDGETS["show-cancel"], "\n".join(sql))
+        self.assertEqual((resp.data["cancelled"], resp.data["offered"]), (2, 0))
+        self.assertEqual(set(Booking.objects.using(alias).filter(show=show).values_list("status", flat=True)),
+                         {Booking.CANCELLED})
+        self.assertEqual(WaitlistEntry.objects.filter(show_id=show.id, status=WaitlistEntry.WAITING).count(), 0)
+        self.assertTrue(all(s["available"] for s in self.anon.get(reverse("seats-for-show", args=[show.id])).data))
+
+
+# -------------------------------------------------------------------
+# seat-integrity audit: duplicate / stray claims, queue and files vs the DB
+# -------------------------------------------------------------------
+class AuditTests(PerfTestCase):
+    def test_finds_every_kind_of_divergence(self):
+        Through = Booking.seats.through
+        show, other = self.shows[:2]
+        alias = sharding.shard_for_show(show.id)
+        fill([show, other], self.crowd, 12)
+        taken = list(Through.objects.using(alias).filter(booking__show=show)
+                     .values_list("seat_id", "booking__user_id").order_by("seat_id"))
+
+        def claim(s, seat_id, status=Booking.CONFIRMED):
+            b = Booking.objects.using(sharding.shard_for_show(s.id)).create(
+                user=self.user, show=s, total_amount=s.price, status=status)
+            Through.objects.using(sharding.shard_for_show(s.id)).create(booking_id=b.id, seat_id=seat_id)
+            return b
+
+        double = claim(show, taken[0][0])
+        claim(show, taken[1][0], status=Booking.CANCELLED)  # a cancelled claim is no claim
+        claim(other, make_screen("Audit Other", 1, 1).seats.get().id)
+        claim(other, 10 ** 9)
+
+        queue = os.path.join(settings.CINEMA_DEGRADED_DIR, "queue")
+        os.makedirs(queue, exist_ok=True)
+        with open(os.path.join(queue, "pending.jsonl"), "w") as f:
+            f.write(json.dumps({"ref": "q1", "user_id": str(self.user.id), "show_id": show.id, "seat_number": "1",
+                                "seat_id": taken[2][0], "queued_at": time.time()}) + "\n")
+        gone = claim(show, layout.get_layout(show.screen_id).seat_ids[0], status=Booking.CANCELLED)
+        with open(os.path.join(queue, "outcomes.jsonl"), "w") as f:
+            f.write(json.dumps({"ref": "o1", "user_id": str(self.user.id), "show_id": show.id, "seat_number": "1",
+                                "seat_id": layout.get_layout(show.screen_id).seat_ids[0], "outcome": "CONFIRMED",
+                                "booking_id": gone.id, "replayed_at": time.time()}) + "\n")
+        exported = os.path.join(settings.CINEMA_DEGRADED_DIR, "export.jsonl")
+        with open(exported, "w") as f:
+            for row in ({"show_id": show.id, "seat_id": taken[3][0], "user_id": taken[3][1]},
+                        {"show_id": show.id, "seat_number": "2"},
+                        {"show_id": show.id, "seat_id": taken[4][0], "user_id": self.staff.id}):
+                f.write(json.dumps(row) + "\n")
+
+        path = os.path.join(settings.CINEMA_DEGRADED_DIR, "audit.json")
+        call_command("audit_seats", workers=0, chunk_shows=5, file=[exported], report=path, stderr=io.StringIO())
+        with open(path) as f:
+            report = json.load(f)
+        self.assertFalse(report["ok"])
+        self.assertEqual({k: n for k, n in report["counts"].items() if n}, {
+            "duplicate_claim": 1, "wrong_screen": 1, "missing_seat": 1, "queue_conflict": 1,
+            "outcome_mismatch": 1, "file_missing": 1, "file_other_user": 1,
+        })
+        dup = report["issues"]["duplicate_claim"][0]
+        self.assertEqual((dup["show_id"], dup["seat_id"], len(dup["booking_ids"])), (show.id, taken[0][0], 2))
+        self.assertIn(double.id, dup["booking_ids"])
+        self.assertEqual(sum(s["shows"] for s in report["shards"].values()), len(self.shows))
+        self.assertEqual(sum(s["claims"] for s in report["shards"].values()), 12 + 1 + 2)
+        with self.assertRaisesMessage(CommandError, '"duplicate_claim": 1'):
+            call_command("audit_seats", workers=0, file=[exported], strict=True, stdout=io.StringIO(),
+                         stderr=io.StringIO())
+
+
+# -------------------------------------------------------------------
+# bulk import: legacy demo_bookings.json and partner feeds
+# -------------------------------------------------------------------
+class ImportTests(PerfTestCase):
+    def test_streams_dedupes_and_resumes(self):
+        Through = Booking.seats.through
+        show, other = self.shows[:2]
+        lay = layout.get_layout(show.screen_id)
+        held = fill([show], self.crowd[:1], 1)[0]
+        held_seat = Through.objects.using(held._state.db).get(booking_id=held.id).seat_id
+        when = "2026-01-05T18:30:00+00:00"
+        mine = lambda **kw: {"user": self.user.username, "show_id": show.id, **kw}
+        entries = [mine(id=i, seat_number=str(i), created_at=when) for i in range(1, 5)] + [
+            mine(id=5, seat_number="1", created_at=when),           # twice in the file
+            mine(id=6, seat_number=str(lay.index[held_seat] + 1)),  # somebody else's seat
+            mine(id=7, seat_number="1", show_id=10 ** 9),
+            mine(id=8, seat_number="401"),
+            mine(id=9, seat_number="9", user="nobody"),
+            {"id": 10, "show_id": show.id},
+        ]
+        os.makedirs(settings.CINEMA_DEGRADED_DIR, exist_ok=True)
+        legacy = os.path.join(settings.CINEMA_DEGRADED_DIR, "demo_bookings.json")
+        with open(legacy, "w") as f:
+            json.dump(entries, f, indent=1)
+        text = json.dumps(entries, indent=1)
+        self.assertEqual(list(importer._json_list(io.StringIO(text), chunk=7)), entries)
+
+        # crash in the second batch: the first one is committed and checkpointed
+        calls = iter([importer.import_batch, mock.Mock(side_effect=OperationalError("gone"))])
+        with mock.patch.object(importer, "import_batch", side_effect=lambda *a, **kw: next(calls)(*a, **kw)):
+            with self.assertRaises(OperationalError):
+                importer.import_file(legacy, batch_size=3)
+        with open(importer.checkpoint_path(legacy)) as f:
+            self.assertEqual(json.load(f)["rows"], 3)
+
+        out = io.StringIO()
+        call_command("import_bookings", legacy, batch_size=3, stdout=out, stderr=io.StringIO())
+        cp = importer.import_file(legacy)  # done: nothing read again
+        self.assertEqual((cp["rows"], cp["done"]), (10, True))
+        self.assertEqual({k: n for k, n in cp["counts"].items() if n}, {
+            "imported": 4, "duplicate": 1, "conflict": 1, "unknown_show": 1, "unknown_seat": 1,
+            "unknown_user": 1, "invalid": 1,
+        })
+        got = sorted(Through.objects.using(held._state.db).filter(booking__user=self.user, booking__show=show)
+                     .values_list("seat_id", "booking__created_at", "booking__total_amount"))
+        self.assertEqual(got, [(sid, parse_datetime(when), show.price) for sid in lay.seat_ids[:4]])
+        again = importer.import_file(legacy, restart=True)["counts"]
+        self.assertEqual((again["imported"], again["duplicate"]), (0, 5))
+
+        feed = os.path.join(settings.CINEMA_DEGRADED_DIR, "partner.csv")
+        with open(feed, "w", newline="") as f:
+            f.write("show_id,seat_id,seat_number,user_id,username,status\n"
+                    f"{other.id},{lay.seat_ids[0]},,{self.staff.id},,\n"
+                    f"{other.id},,2,,{self.staff.username},CANCELLED\n"
+                    f"{other.id},,3,,,\n")
+        alias = sharding.shard_for_show(other.id)
+        with override_settings(CINEMA_TASKS_EAGER=True), self.captureOnCommitCallbacks(using=alias, execute=True):
+            call_command("import_bookings", feed, default_user=self.user.username, stdout=out, stderr=io.StringIO())
+        self.assertIn(f"{feed}: 3 rows {json.dumps({'imported': 2, 'cancelled': 1})}", out.getvalue())
+        self.assertEqual(ShowStats.objects.filter(show_id=other.id).values_list("bookings", "seats_sold", "revenue")
+                         .get(), (2, 2, 2 * other.price))
+
+
+# -------------------------------------------------------------------
+# cache warm-up before an on-sale
+# -------------------------------------------------------------------
+class WarmupTests(PerfTestCase):
+    def test_cold_read_path_is_warm_after_the_command(self):
+        fill(self.shows[:2], self.crowd, 6)
+        shows = self.shows[:3]
+        out = io.StringIO()
+        err = io.StringIO()
+        call_command("warm_caches", shows=[s.id for s in shows], local=True, workers=0, stdout=out, stderr=err)
+        self.assertIn("3 shows on 1 screens", out.getvalue())
+        # a local-memory cache: warming this process is not reported as warming the workers
+        self.assertNotIn("caches warm", out.getvalue())
+        self.assertIn("this process warm; running workers are not", out.getvalue())
+        self.assertIn("not running workers", err.getvalue())
+        for name in ("show-screen", "show-price", "layout-version", "search-index", "layouts", "price-vectors",
+                     "snapshots"):
+            self.assertRegex(out.getvalue(), rf"{name} +\d+/\d+ cached \(100.0%\)")
+
+        # no warm-up call first: the very first request after the command already runs at budget
+        _, sql = self.count_queries(lambda: self.anon.get(reverse("seats-for-show", args=[shows[1].id])))
+        self.assertLessEqual(len(sql), BUDGETS["seats-for-show"], sql)
+        ids = ",".join(str(s.id) for s in shows)
+        _, sql = self.count_queries(lambda: self.anon.get(f"{reverse('show-availability')}?ids={ids}"))
+        self.assertLessEqual(len(sql), BUDGETS["show-availability"], sql)
+        self.assertIsNotNone(degraded.load_snapshot(f"seats-{shows[2].id}"))
+        _, sql = self.count_queries(lambda: self.anon.get(reverse("movie-search"), {"q": "perf"}))
+        self.assertEqual(len(sql), BUDGETS["movie-search"], sql)  # the index was built by the warm-up
+
+        self.assertEqual(len(warmup.select_shows(start=timezone.now(), end=timezone.now() + timedelta(hours=5))), 2)
+        with self.assertRaises(CommandError):
+            call_command("warm_caches", stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, "--base-url URL (once per worker) or --local"):
+            call_command("warm_caches", shows=[shows[0].id], stdout=io.StringIO())
+
+
+# -------------------------------------------------------------------
+# static catalog snapshots
+# -------------------------------------------------------------------
+class CatalogTests(PerfTestCase):
+    def test_publish_is_incremental_and_follows_the_schedule(self):
+        fill(self.shows[:1], self.crowd, 5)
+        shutil.rmtree(settings.CINEMA_CATALOG_DIR, ignore_errors=True)
+        out = io.StringIO()
+        call_command("publish_catalog", stdout=out)
+        self.assertIn("catalog v1: 3 rendered, 3 written", out.getvalue())
+        manifest = catalog.load_manifest()
+        self.assertEqual(set(manifest["files"]), {"movies", f"shows-{self.movie.id}", f"shows-{self.other_movie.id}"})
+        for entry in manifest["files"].values():
+            path = os.path.join(settings.CINEMA_CATALOG_DIR, entry["path"])
+            with open(path, "rb") as f:
+                body = f.read()
+            self.assertEqual(hashlib.sha256(body).hexdigest(), entry["sha256"])
+            with gzip.open(path + ".gz") as f:
+                self.assertEqual(f.read(), body)
+
+        self.assertEqual(catalog.read("movies"), json.loads(json.dumps(self.anon.get(reverse("movies")).data)))
+        doc = catalog.read(f"shows-{self.movie.id}")
+        self.assertEqual([s["id"] for s in doc["shows"]], [s.id for s in self.shows])
+        first = doc["shows"][0]["availability"]
+        self.assertEqual((first["capacity"], first["taken"], first["available"]), (400, 5, 395))
+
+        # nothing changed: nothing rewritten, same version
+        result = catalog.publish()
+        self.assertEqual((result["written"], result["unchanged"], result["version"]), (0, 3, manifest["version"]))
+
+        # a new show queues a refresh of that movie's list only; a deleted movie is dropped by the full pass
+        alias = sharding.shard_for_screen(self.screen.id)
+        with override_settings(CINEMA_TASKS_EAGER=True), self.captureOnCommitCallbacks(using=alias, execute=True):
+            added = Show.objects.using(alias).create(movie=self.other_movie, screen=self.screen,
+                                                     start_time=timezone.now() + timedelta(days=3))
+        self.assertEqual([s["id"] for s in catalog.read(f"shows-{self.other_movie.id}")["shows"]], [added.id])
+        self.assertEqual(catalog.load_manifest()["version"], manifest["version"] + 1)
+        gone = Movie.objects.create(title="Gone", duration_min=80)
+        catalog.publish([gone.id])
+        self.assertIsNotNone(catalog.read(f"shows-{gone.id}"))
+        Movie.objects.filter(id=gone.id).delete()
+        result = catalog.publish(keep_s=0)
+        self.assertEqual(result["dropped"], 1)
+        self.assertIsNone(catalog.read(f"shows-{gone.id}"))
+        self.assertEqual(len(catalog.read("movies")), 2)
+        self.assertGreater(result["removed_files"], 0)
+
+
+# -------------------------------------------------------------------
+# index advisor: EXPLAIN captured statements, propose indexes
+# -------------------------------------------------------------------
+class IndexAdvisorTests(PerfTestCase):
+    def test_flags_and_proposals(self):
+        fill(self.shows, self.crowd, 40)
+        alias = sharding.shard_for_show(self.show.id)
+        Booking.objects.using(alias).update(total_amount=F("id") % 10)
+        with query_plans.Capture(("cinema",)) as cap, CaptureQueriesContext(connections[alias]) as ctx:
+            self.client.get(reverse("my-bookings"))
+            list(Booking.objects.using(alias).filter(total_amount=7).order_by("created_at"))
+            list(Booking.objects.using(alias).filter(id=1).order_by("created_at"))
+        report = cap.report()
+        # EXPLAIN and the row counts bypass the query log, so budgets hold under capture
+        self.assertFalse([q for q in ctx.captured_queries if "EXPLAIN" in q["sql"] or "COUNT(*)" in q["sql"]])
+
+        proposals = {(p["model"], tuple(p["fields"])): p for p in report["proposals"]}
+        self.assertEqual(set(proposals), {("cinema.Booking", ("total_amount", "created_at"))})
+        p = proposals["cinema.Booking", ("total_amount", "created_at")]
+        self.assertEqual((p["calls"], p["endpoints"]), (1, [query_plans.NO_REQUEST]))
+        self.assertGreater(p["estimated_rows_saved"], 0)
+        self.assertNotIn("my-bookings", report["endpoints"])  # (user, created_at) is indexed
+
+        src = query_plans.migration_source("cinema", report["proposals"], [("cinema", "0009_advised_indexes")])
+        compile(src, "advised.py", "exec")
+        self.assertIn("migrations.AddIndex(model_name='booking'", src)
+
+
+# -------------------------------------------------------------------
+# background tasks: a rollup moves once per task, even across reclaims
+# -------------------------------------------------------------------
+class TaskTests(PerfTestCase):
+    def sold(self):
+        return ShowStats.objects.filter(show_id=self.show.id).values_list("seats_sold", "bookings").first()
+
+    def test_reclaimed_tasks_never_apply_twice(self):
+        rollups.record_show_created(self.show.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue("rollups.record_booking", show_id=self.show.id, seats=2, amount="20.00")
+        [t] = tasks.claim(10)
+        self.assertTrue(tasks.run(t))
+        # the worker "died" right after committing: nothing is left RUNNING to reclaim and re-run
+        self.assertEqual(tasks.reclaim_stuck(-1), 0)
+        self.assertEqual(tasks.claim(10), [])
+        self.assertEqual(self.sold(), (2, 1))
+
+        # a slow worker's task is reclaimed and claimed again: whichever run commits second rolls back
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.enqueue("rollups.record_booking", show_id=self.show.id, seats=1, amount="10.00")
+        [slow] = tasks.claim(10)
+        self.assertEqual(tasks.reclaim_stuck(-1), 1)
+        with mock.patch.object(tasks.timezone, "now", return_value=timezone.now() + timedelta(seconds=1)):
+            [again] = tasks.claim(10)
+        self.assertTrue(tasks.run(again))
+        with self.assertLogs("cinema.tasks", "WARNING"):
+            self.assertFalse(tasks.run(slow))
+        self.assertEqual(self.sold(), (3, 2))
+        self.assertEqual(Task.objects.get(id=slow.id).status, Task.DONE)
+
+
+# -------------------------------------------------------------------
+# archival: old shows' bookings leave the hot tables, history still has them
+# -------------------------------------------------------------------
+class ArchiveTests(PerfTestCase):
+    def test_batches_resume_and_history_stays_whole(self):
+        old = make_shows(self.movie, self.screen, 2, start=timezone.now() - timedelta(days=40))
+        fill(old, [self.user], 3)
+        fill(self.shows[:1], [self.user], 1)
+        before = self.client.get(reverse("my-bookings")).data
+
+        # interrupted between the archive insert and the delete: the next run redoes the batch
+        with mock.patch.object(archive, "transaction", **{"atomic.side_effect": OperationalError("gone")}):
+            with self.assertRaises(OperationalError):
+                archive.archive(days=30, size=2)
+        self.assertEqual(ArchivedBooking.objects.count(), 2)
+
+        out = io.StringIO()
+        call_command("archive_bookings", days=30, batch_size=2, stdout=out)
+        self.assertIn("3 bookings archived", out.getvalue())
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+        for alias in sharding.all_aliases():
+            self.assertFalse(archive.candidates(alias, archive.cutoff(30)).exists())
+            self.assertFalse(Booking.seats.through.objects.using(alias).filter(booking__show__in=old).exists())
+        self.assertEqual(sum(rows for name, (rows, _) in archive.table_sizes().items()
+                             if name.endswith(Booking._meta.db_table)), 1)
+        self.assertEqual(archive.archive(days=30), dict.fromkeys(sharding.all_aliases(), 0))
+
+        resp = self.assertBudget("my-bookings", lambda: self.client.get(reverse("my-bookings")))
+        strip = lambda rows: [{k: v for k, v in r.items() if k != "archived"} for r in rows]
+        self.assertEqual(strip(resp.data), strip(before))
+        self.assertEqual([r.get("archived", False) for r in resp.data], [False, True, True, True])
+
+
+# -------------------------------------------------------------------
+# degraded mode: breaker, snapshots, local booking queue
+# -------------------------------------------------------------------
+class DegradedModeTests(PerfTestCase):
+    def test_breaker_opens_and_reads_come_from_snapshots(self):
+        seats_url = reverse("seats-for-show", args=[self.show.id])
+        self.assertEqual(self.anon.get(reverse("movies")).status_code, 200)   # snapshots taken
+        self.assertEqual(self.anon.get(seats_url).status_code, 200)
+        self.assertEqual(self.anon.get(reverse("cinema-health")).data["status"], "ok")
+
+        down = OperationalError("server has gone away")
+        with mock.patch.object(layout, "taken_seat_ids", side_effect=down), self.assertLogs("cinema.degraded"):
+            for _ in range(settings.CINEMA_BREAKER_FAILURES):
+                resp = self.anon.get(seats_url)
+                self.assertEqual((resp.status_code, resp["X-Cinema-Degraded"]), (200, "snapshot"))
+        self.assertEqual(degraded.breaker.state, degraded.OPEN)
+
+        # open: no database round trips at all, snapshots or 503
+        with self.assertNumQueries(0):
+            resp = self.anon.get(reverse("movies"))
+            self.assertEqual([m["title"] for m in resp.data], ["Perf Movie", "Other Movie"])
+            self.assertEqual(self.anon.get(reverse("movie-shows", args=[self.movie.id])).status_code, 503)
+            health = self.anon.get(reverse("cinema-health")).data
+        self.assertEqual((health["status"], health["db"]["state"]), ("degraded", "open"))
+
+    def test_bookings_queue_while_open_and_replay(self):
+        url = reverse("booking-create")
+        self.anon.get(reverse("seats-for-show", args=[self.show.id]))  # seat-map snapshot
+        seat_2 = layout.get_layout(self.screen.id).seat_ids[1]
+        degraded.breaker.trip()
+
+        with self.assertNumQueries(0):
+            resp = self.client.post(url, {"show_id": self.show.id, "seat_number": "1"}, format="json")
+            self.assertEqual((resp.status_code, resp.data["status"]), (202, "QUEUED"))
+            other = self._client(self.crowd[0])
+            self.assertEqual(other.post(url, {"show_id": self.show.id, "seat_number": "1"}, format="json")
+                             .status_code, 409)
+            self.assertEqual(self.client.post(url, {"show_id": self.show.id, "seat_number": "2"}, format="json")
+                             .status_code, 202)
+            seats = self.anon.get(reverse("seats-for-show", args=[self.show.id])).data
+            self.assertEqual([s["available"] for s in seats[:3]], [False, False, True])
+            mine = self.client.get(reverse("my-bookings"))
+            self.assertEqual(([b["status"] for b in mine.data], mine["X-Cinema-Degraded"]),
+                             (["QUEUED", "QUEUED"], "partial"))
+            # the queue files are parsed once per change, not on every request
+            with mock.patch.object(degraded, "open", create=True, wraps=open) as opened:
+                self.assertEqual(len(self.client.get(reverse("my-bookings")).data), 2)
+            opened.assert_not_called()
+
+        # meanwhile somebody else got seat 2 through another (healthy) process
+        booking.book(self.crowd[1], self.show.id, seat_2)
+
+        degraded.breaker.reset()
+        self.assertEqual(degraded.replay(), {"CONFIRMED": 1, "REJECTED": 1, "left": 0})
+        self.assertEqual(degraded.replay(), {"CONFIRMED": 0, "REJECTED": 0, "left": 0})
+        mine = self.client.get(reverse("my-bookings")).data
+        self.assertEqual(sorted((b["status"], b["seat_number"]) for b in mine),
+                         [("CONFIRMED", "1"), ("REJECTED", "2")])
+
+    def test_lock_errors_are_contention_not_an_outage(self):
+        url = reverse("booking-create")
+        body = {"show_id": self.show.id, "seat_number": "1"}
+        self.anon.get(reverse("seats-for-show", args=[self.show.id]))  # a snapshot a queued booking could use
+        lock_wait = OperationalError(1205, "Lock wait timeout exceeded; try restarting transaction")
+        with mock.patch.object(booking, "book_locking", side_effect=lock_wait):
+            for _ in range(settings.CINEMA_BREAKER_FAILURES + 1):
+                resp = self.client.post(url, body, format="json")
+                self.assertEqual((resp.status_code, resp["Retry-After"]), (503, "1"))
+        with mock.patch.object(booking, "book_locking", side_effect=OperationalError("database is locked")):
+            self.assertEqual(self.client.post(url, body, format="json").status_code, 503)
+        self.assertEqual((degraded.breaker.state, degraded.breaker.failures), (degraded.CLOSED, 0))
+        self.assertEqual(degraded.pending(), [])
+        self.assertEqual(self._client(self.crowd[0]).post(url, body, format="json").status_code, 201)
+
+        # a lost connection does count, but one failure is a retry, not a queued booking nobody would replay
+        gone = OperationalError(2006, "MySQL server has gone away")
+        with mock.patch.object(booking, "book_locking", side_effect=gone):
+            self.assertEqual(self.client.post(url, {**body, "seat_number": "2"}, format="json").status_code, 503)
+        self.assertEqual((degraded.breaker.state, degraded.breaker.failures), (degraded.CLOSED, 1))
+        self.assertEqual(degraded.pending(), [])
+
+    def test_replay_rejects_bookings_of_a_deleted_show(self):
+        show = self.shows[1]
+        self.anon.get(reverse("seats-for-show", args=[show.id]))
+        degraded.breaker.trip()
+        resp = self.client.post(reverse("booking-create"), {"show_id": show.id, "seat_number": "1"}, format="json")
+        self.assertEqual(resp.status_code, 202)
+        degraded.breaker.reset()
+
+        Show.objects.using(sharding.shard_for_show(show.id)).filter(id=show.id).delete()
+        layout.remember_screens({show.id: show.screen_id})  # another worker's cache still maps it
+        self.assertEqual(degraded.replay(), {"CONFIRMED": 0, "REJECTED": 1, "left": 0})
+        self.assertEqual([(b["status"], b["reason"]) for b in self.client.get(reverse("my-bookings")).data],
+                         [("REJECTED", "show was removed while the system was degraded")])
+
+
+# -------------------------------------------------------------------
+# complexity: latency must not track unrelated data volume
+# -------------------------------------------------------------------
+class GrowthTests(PerfTestCase):
+    def test_seat_map_flat_in_bookings(self):
+        url = reverse("seats-for-show", args=[self.show.id])
+        self.assertFlat("seats-for-show", lambda: self.anon.get(url), self.grow_bookings(self.crowd))
+
+    def test_availability_flat_in_bookings(self):
+        ids = ",".join(str(s.id) for s in self.shows[:6])
+        url = reverse("show-availability")
+        self.assertFlat("show-availability", lambda: self.anon.get(url, {"ids": ids}),
+                        self.grow_bookings(self.crowd))
+
+    def test_my_bookings_flat_in_other_users_bookings(self):
+        fill(self.shows, [self.user], 20)
+        url = reverse("my-bookings")
+        self.assertFlat("my-bookings", lambda: self.client.get(url), self.grow_bookings(self.crowd))
+
+    def test_booking_create_flat_in_bookings(self):
+        url = reverse("booking-create")
+        target = layout.get_layout(self.screen.id).seat_ids[0]
+        grow = self.grow_bookings(self.crowd, skip=(self.show.id, target))
+
+        def book():
+            # the same seat each time: create, then release it so the next call can take it again
+            resp = self.client.post(url, {"show_id": self.show.id, "seat_number": "1"}, format="json")
+            Booking.objects.using(sharding.shard_for_show(self.show.id)).filter(id=resp.data.get("id")).delete()
+            return resp
+        self.assertFlat("booking-create", book, grow)
+
+    def test_stats_flat_in_bookings(self):
+        self.assertFlat("stats-movies", lambda: self.admin.get(reverse("stats-movies")),
+                        self.grow_bookings(self.crowd))
+
+    def test_seat_map_linear_in_screen_size(self):
+        times = []
+        for side in (10, 20, 40):
+            screen = make_screen(f"Scaled {side}", side, side)
+            (show,) = make_shows(self.movie, screen, 1, start=timezone.now() + timedelta(days=30 + side))
+            fill([show], self.crowd, side * side // 3)
+            url = reverse("seats-for-show", args=[show.id])
+            times.append(self.median_ms(lambda: self.anon.get(url), key=f"seats-for-show@{side}x{side}"))
+        # 16x the seats: linear is ~16x, quadratic would be ~256x
+        self.assertLessEqual(times[-1], times[0] * 16 * 2.5 + 1.0, f"seat map scaling: {times}")
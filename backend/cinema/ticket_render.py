@@ -0,0 +1,65 @@
+# backend/cinema/ticket_render.py
+"""
+Ticket drawing, run inside cinema.tickets' process pool.
+
+Kept free of Django imports so worker processes stay cheap to start and never
+touch the ORM; everything arrives as a plain payload dict.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from xml.sax.saxutils import escape
+
+from . import qr
+
+WIDTH = 360
+QR_SCALE = 6
+
+
+def render_svg(payload, code):
+    matrix = qr.encode(code)
+    side = (len(matrix) + 8) * QR_SCALE
+    qr_x = (WIDTH - side) // 2
+    qr_y = 150
+    height = qr_y + side + 50
+    cancelled = payload.get("status") == "CANCELLED"
+    lines = [
+        (28, 20, "bold", payload.get("movie_title") or "CinemaSeat"),
+        (56, 14, "normal", payload.get("start_time") or ""),
+        (80, 14, "normal", f"{payload.get('screen') or ''}  •  Seats {', '.join(payload.get('seats') or []) or '-'}"),
+        (104, 12, "normal", f"Booking #{payload.get('booking_id')}  •  {payload.get('user') or ''}"),
+        (126, 12, "normal", f"Total {payload.get('total_amount') or ''}"),
+    ]
+    text = "".join(
+        f'<text x="20" y="{y}" font-size="{size}" font-weight="{weight}">{escape(str(t))}</text>'
+        for y, size, weight, t in lines
+    )
+    stamp = (f'<text x="{WIDTH // 2}" y="{qr_y + side // 2}" font-size="40" font-weight="bold" fill="#f84464" '
+             f'text-anchor="middle" transform="rotate(-20 {WIDTH // 2} {qr_y + side // 2})">CANCELLED</text>'
+             if cancelled else "")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{height}" '
+        f'viewBox="0 0 {WIDTH} {height}" font-family="Helvetica, Arial, sans-serif">'
+        f'<rect width="100%" height="100%" rx="12" fill="#fff" stroke="#ddd"/>{text}'
+        f'<rect x="{qr_x}" y="{qr_y}" width="{side}" height="{side}" fill="#fff"/>'
+        f'<path fill="#000" d="{qr.svg_path(matrix, qr_x + 4 * QR_SCALE, qr_y + 4 * QR_SCALE, QR_SCALE)}"/>'
+        f'{stamp}'
+        f'<text x="{WIDTH // 2}" y="{height - 20}" font-size="10" fill="#888" text-anchor="middle">'
+        f'{escape(code)}</text></svg>'
+    ).encode("utf-8")
+
+
+def render_png(payload, code):
+    return qr.to_png(qr.encode(code), scale=QR_SCALE)
+
+
+def render_to_file(payload, code, fmt, path):
+    """Render and write atomically; returns the path. Safe to race with another worker."""
+    body = render_svg(payload, code) if fmt == "svg" else render_png(payload, code)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(body)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,100 @@
+# backend/cinema/tickets.py
+"""
+Ticket rendering service.
+
+Tickets are content-addressed: the file name is an HMAC of everything printed
+on the ticket, so a booking that changes (seats, status, showtime) gets a new
+file while an unchanged one is rendered exactly once. Rendering is CPU-bound
+and runs in a process pool, never on the request thread's CPU.
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from . import layout, sharding, ticket_render
+
+FORMATS = ("svg", "png")
+CONTENT_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+TICKET_VERSION = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=getattr(settings, "CINEMA_TICKET_WORKERS", 2))
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def cache_dir():
+    return str(getattr(settings, "CINEMA_TICKET_DIR", os.path.join(settings.BASE_DIR, "ticket_cache")))
+
+
+def bookings_for_tickets(qs):
+    """Evaluate `qs` with everything payload_for needs; seat ids are attached as b.seat_ids."""
+    bookings = list(sharding.with_related(qs, local=("show",), remote=("show__movie", "show__screen", "user")))
+    seats = layout.seat_ids_by_booking(bookings)
+    for b in bookings:
+        b.seat_ids = seats.get(b.id, [])
+    return bookings
+
+
+def payload_for(b):
+    lay = layout.get_layout(b.show.screen_id)
+    idx = sorted(lay.indices_of(b.seat_ids)) if lay else []
+    return {
+        "v": TICKET_VERSION,
+        "booking_id": b.id,
+        "show_id": b.show_id,
+        "movie_title": b.show.movie.title,
+        "start_time": b.show.start_time.isoformat(),
+        "screen": b.show.screen.name,
+        "seats": [str(i + 1) for i in idx],
+        "user": b.user.get_username(),
+        "total_amount": str(b.total_amount),
+        "status": b.status,
+    }
+
+
+def _sign(msg):
+    return hmac.new(settings.SECRET_KEY.encode(), msg.encode(), hashlib.sha256).hexdigest()
+
+
+def qr_text(payload):
+    """What the scanner reads: booking/show/seats plus a short signature the gate can verify."""
+    body = f"CS1:{payload['booking_id']}:{payload['show_id']}:{'.'.join(payload['seats'])}"
+    return f"{body}:{_sign(body)[:16]}"
+
+
+def content_hash(payload, fmt):
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return _sign(f"{fmt}|{canonical}")
+
+
+def path_for(h, fmt):
+    return os.path.join(cache_dir(), h[:2], f"{h}.{fmt}")
+
+
+def ensure_rendered(payloads, fmt, timeout=30):
+    """Render whatever is not cached yet (in the pool); returns hashes in input order."""
+    hashes = [content_hash(p, fmt) for p in payloads]
+    futures = []
+    for p, h in zip(payloads, hashes):
+        path = path_for(h, fmt)
+        if not os.path.exists(path):
+            futures.append(_get_pool().submit(ticket_render.render_to_file, p, qr_text(p), fmt, path))
+    for f in futures:
+        f.result(timeout=timeout)
+    return hashes
@@ -0,0 +1,216 @@
+# backend/cinema/tracing.py
+"""
+Opt-in request tracing.
+
+A sampled request gets a root span from TracingMiddleware; inside it we record
+spans for the view (TracedViewMiddleware), every SQL statement (execute
+wrapper), cache calls (TracedCache backend), JWT auth and JSON rendering.
+Finished traces are appended to a size-rotated file in Chrome Trace Event
+"JSON array" format, so any file opens directly in Perfetto/chrome://tracing.
+
+Unsampled requests pay one random() call; span() is a no-op without a trace.
+"""
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import logging.handlers
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.utils.module_loading import import_string
+
+_current = contextvars.ContextVar("cinema_trace", default=None)
+_ids = itertools.count(1)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Trace:
+    __slots__ = ("id", "events")
+
+    def __init__(self):
+        self.id = next(_ids)
+        self.events = []
+
+
+def active():
+    return _current.get() is not None
+
+
+@contextmanager
+def span(name, cat="app", **args):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        dur = time.perf_counter_ns() - t0
+        trace.events.append({
+            "name": name, "cat": cat, "ph": "X", "ts": t0 // 1000, "dur": dur // 1000,
+            "pid": os.getpid(), "tid": trace.id, "args": args,
+        })
+
+
+# -------------------------------------------------------------------
+# output: rotating Chrome-trace JSON array files
+# -------------------------------------------------------------------
+class _TraceFileHandler(logging.handlers.RotatingFileHandler):
+    def _open(self):
+        stream = super()._open()
+        if stream.tell() == 0:
+            stream.write("[\n")
+        return stream
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            path = str(_setting("CINEMA_TRACE_FILE", os.path.join(settings.BASE_DIR, "traces", "trace.json")))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = _TraceFileHandler(
+                path, maxBytes=_setting("CINEMA_TRACE_MAX_BYTES", 20 * 1024 * 1024),
+                backupCount=_setting("CINEMA_TRACE_BACKUPS", 5), encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _writer = logging.getLogger("cinema.tracing.file")
+            _writer.propagate = False
+            _writer.setLevel(logging.INFO)
+            _writer.addHandler(handler)
+        return _writer
+
+
+def forget():
+    """Close the trace file; the next trace reopens CINEMA_TRACE_FILE (tests, log rotation by hand)."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            for handler in list(_writer.handlers):
+                _writer.removeHandler(handler)
+                handler.close()
+            _writer = None
+
+
+def _flush(trace):
+    if trace.events:
+        _get_writer().info(",\n".join(json.dumps(e, default=str) for e in trace.events) + ",")
+
+
+# -------------------------------------------------------------------
+# middleware
+# -------------------------------------------------------------------
+def _sampled(request):
+    if not _setting("CINEMA_TRACE_ENABLED", False):
+        return False
+    if request.headers.get("X-Cinema-Trace") == "1" and _setting("DEBUG", False):
+        return True
+    return random.random() < _setting("CINEMA_TRACE_SAMPLE_RATE", 0.01)
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    with span("db.query", cat="db", sql=sql[:500], alias=context["connection"].alias, many=many):
+        return execute(sql, params, many, context)
+
+
+class TracingMiddleware:
+    """Put first in MIDDLEWARE: owns the root span and DB instrumentation."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _sampled(request):
+            return self.get_response(request)
+
+        trace = Trace()
+        token = _current.set(trace)
+        wrappers = [c.execute_wrapper(_sql_wrapper) for c in connections.all()]
+        for w in wrappers:
+            w.__enter__()
+        status = None
+        try:
+            with span(f"{request.method} {request.path}", cat="http", method=request.method, path=request.path):
+                response = self.get_response(request)
+                status = response.status_code
+                return response
+        finally:
+            for w in reversed(wrappers):
+                w.__exit__(None, None, None)
+            _current.reset(token)
+            if status is not None:
+                trace.events[-1]["args"]["status"] = status
+            _flush(trace)
+
+
+class TracedViewMiddleware:
+    """Put last in MIDDLEWARE: runs the view inside a span (after every other process_view)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not active():
+            return None
+        cls = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+        name = cls.__name__ if cls else getattr(view_func, "__name__", "view")
+        with span(f"view {name}", cat="view", kwargs={k: str(v) for k, v in view_kwargs.items()}):
+            return view_func(request, *view_args, **view_kwargs)
+
+
+# -------------------------------------------------------------------
+# cache instrumentation
+# -------------------------------------------------------------------
+class TracedCache(BaseCache):
+    """
+    Cache backend that wraps another one and records a span per call:
+        "BACKEND": "cinema.tracing.TracedCache",
+        "OPTIONS": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    """
+
+    def __init__(self, location, params):
+        params = dict(params)
+        options = dict(params.pop("OPTIONS", {}) or {})
+        inner_cls = import_string(options.pop("BACKEND", "django.core.cache.backends.locmem.LocMemCache"))
+        params["OPTIONS"] = options
+        self._inner = inner_cls(location, params)
+        super().__init__(params)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def _traced(method):
+    def call(self, *args, **kwargs):
+        if _current.get() is None:
+            return getattr(self._inner, method)(*args, **kwargs)
+        key = args[0] if args and isinstance(args[0], str) else None
+        with span(f"cache.{method}", cat="cache", key=key):
+            return getattr(self._inner, method)(*args, **kwargs)
+    call.__name__ = method
+    return call
+
+
+for _m in ("add", "get", "set", "touch", "delete", "get_many", "set_many", "delete_many",
+           "has_key", "incr", "decr", "clear", "get_or_set"):
+    setattr(TracedCache, _m, _traced(_m))
+
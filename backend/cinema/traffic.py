@@ -0,0 +1,150 @@
+# backend/cinema/traffic.py
+"""
+Traffic capture for replay-based performance testing.
+
+TrafficCaptureMiddleware appends one compact JSON line per request:
+
+    {"t": 1718000000.123, "m": "POST", "r": "booking-create", "p": "/api/cinema/bookings/",
+     "q": {}, "b": {"show_id": 3, "seat_number": "17"}, "u": 12, "d": 8.4, "s": 201}
+
+t = start (epoch seconds), r = URL name, u = user bucket (stable hash, never
+the id), d = duration in ms, s = status. Secrets (passwords, tokens) are
+dropped from query strings and bodies, long values are truncated, and login
+calls are not recorded at all (the replayer logs in per bucket itself). The
+replay_traffic / compare_replays commands consume these files.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging.handlers
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+
+SENSITIVE = ("password", "token", "access", "refresh", "secret", "authorization", "email")
+MAX_VALUE_LEN = 64
+MAX_LIST_LEN = 20
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def user_bucket(user, buckets=None):
+    if not getattr(user, "is_authenticated", False):
+        return None
+    buckets = buckets or _setting("CINEMA_CAPTURE_USER_BUCKETS", 64)
+    digest = hashlib.sha256(f"{settings.SECRET_KEY}:{user.pk}".encode()).digest()
+    return int.from_bytes(digest[:4], "big") % buckets
+
+
+def sanitize(data):
+    out = {}
+    for k, v in (data or {}).items():
+        if any(s in str(k).lower() for s in SENSITIVE):
+            continue
+        if isinstance(v, (list, tuple)):
+            out[str(k)] = [_scalar(x) for x in v[:MAX_LIST_LEN] if _is_scalar(x)]
+        elif _is_scalar(v):
+            out[str(k)] = _scalar(v)
+    return out
+
+
+def _is_scalar(v):
+    return v is None or isinstance(v, (str, int, float, bool))
+
+
+def _scalar(v):
+    return v[:MAX_VALUE_LEN] if isinstance(v, str) else v
+
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            path = str(_setting("CINEMA_CAPTURE_FILE", os.path.join(settings.BASE_DIR, "traffic", "capture.jsonl")))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=_setting("CINEMA_CAPTURE_MAX_BYTES", 50 * 1024 * 1024),
+                backupCount=_setting("CINEMA_CAPTURE_BACKUPS", 10), encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _writer = logging.getLogger("cinema.traffic.file")
+            _writer.propagate = False
+            _writer.setLevel(logging.INFO)
+            _writer.addHandler(handler)
+        return _writer
+
+
+def forget():
+    """Close the capture file; the next request captured reopens CINEMA_CAPTURE_FILE."""
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            for handler in list(_writer.handlers):
+                _writer.removeHandler(handler)
+                handler.close()
+            _writer = None
+
+
+def _body(request):
+    if request.method not in ("POST", "PUT", "PATCH") or "json" not in (request.content_type or ""):
+        return None
+    try:
+        data = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return sanitize(data) if isinstance(data, dict) else None
+
+
+class TrafficCaptureMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (not _setting("CINEMA_CAPTURE_ENABLED", False)
+                or not request.path.startswith("/api/")
+                or request.path.startswith(_setting("CINEMA_CAPTURE_EXCLUDE", ("/api/auth/",)))
+                or random.random() >= _setting("CINEMA_CAPTURE_SAMPLE_RATE", 1.0)):
+            return self.get_response(request)
+
+        body = _body(request)  # read before the view consumes the stream
+        started = time.time()
+        t0 = time.perf_counter()
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        entry = {
+            "t": round(started, 3),
+            "m": request.method,
+            "r": match.view_name if match else None,
+            "p": request.path,
+            "q": sanitize(request.GET.dict()),
+            "u": user_bucket(getattr(request, "user", None)),
+            "d": round((time.perf_counter() - t0) * 1000, 2),
+            "s": response.status_code,
+        }
+        if body is not None:
+            entry["b"] = body
+        _get_writer().info(json.dumps(entry, separators=(",", ":")))
+        return response
+
+
+def read_log(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
@@ -0,0 +1,178 @@
+# backend/cinema/trending.py
+"""
+"Trending now" and "selling fast": time-decayed seats sold per movie and per show.
+
+A seat sold at time t is worth 2 ** ((t - now) / half-life) now, so a score is
+a running sum that halves every CINEMA_TRENDING_HALF_LIFE_S with no bookings.
+Each TrendingScore row stores that sum scaled to its own `epoch`:
+
+    decayed(now) = score * 2 ** ((epoch - now) / half-life)
+
+so a new sale adds seats * 2 ** ((t - epoch) / half-life) with a single
+UPDATE ... SET score = score + w, like the rollup counters, and never has to
+rewrite the other rows. When a row's epoch falls REBASE_AFTER half-lives
+behind, the next write moves it forward (score * factor, also one UPDATE).
+
+The rows are written by the task worker (rollups.record_booking /
+record_release call record_sale) and are the durable snapshot. Readers keep
+each board as an array sorted by score, reloaded from the table every
+CINEMA_TRENDING_REFRESH_S; decay scales every row by the same factor, so the
+order never changes between reloads and top(k) is a slice.
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sharding
+from .models import Show, TrendingScore
+
+MOVIE, SHOW = TrendingScore.MOVIE, TrendingScore.SHOW
+REBASE_AFTER = 32      # half-lives; keeps the stored scores far from float overflow
+MIN_SCORE = 1e-3       # decayed scores below this are dropped when a board loads
+
+
+def half_life():
+    return float(getattr(settings, "CINEMA_TRENDING_HALF_LIFE_S", 6 * 3600))
+
+
+def decay(score, since, until):
+    """`score` as of `since`, decayed to `until` (unix seconds)."""
+    return score * 2 ** ((since - until) / half_life())
+
+
+# -------------------------------------------------------------------
+# writes (task worker)
+# -------------------------------------------------------------------
+def _add(kind, object_id, movie_id, seats, at, starts_at=None):
+    qs = TrendingScore.objects.filter(kind=kind, object_id=object_id)
+    for _ in range(5):
+        row = qs.values_list("epoch", flat=True).first()
+        if row is None:
+            if seats <= 0:
+                return
+            try:
+                with transaction.atomic():
+                    TrendingScore.objects.create(kind=kind, object_id=object_id, movie_id=movie_id,
+                                                 starts_at=starts_at, score=seats, epoch=int(at))
+                return
+            except IntegrityError:
+                continue  # created concurrently; add to it
+        epoch = row
+        if at - epoch > REBASE_AFTER * half_life():
+            new_epoch = int(at)
+            qs.filter(epoch=epoch).update(score=F("score") * decay(1.0, epoch, new_epoch), epoch=new_epoch)
+            continue
+        if qs.filter(epoch=epoch).update(score=F("score") + seats * 2 ** ((at - epoch) / half_life())):
+            return
+    raise RuntimeError(f"trending: could not update {kind} {object_id}")  # task retries
+
+
+def record_sale(show_id, movie_id, seats, at=None):
+    """`seats` sold (negative: released) for a show at unix time `at`; releases pass the booking's time."""
+    at = time.time() if at is None else float(at)
+    starts_at = None
+    if seats > 0 and not TrendingScore.objects.filter(kind=SHOW, object_id=show_id).exists():
+        starts_at = (Show.objects.using(sharding.shard_for_show(show_id)).filter(id=show_id)
+                     .values_list("start_time", flat=True).first())
+    _add(SHOW, show_id, movie_id, seats, at, starts_at=starts_at)
+    _add(MOVIE, movie_id, movie_id, seats, at)
+
+
+def prune(now=None):
+    """Delete rows for started shows and rows nobody has written to for 2 x REBASE_AFTER half-lives."""
+    now = time.time() if now is None else now
+    shows = TrendingScore.objects.filter(kind=SHOW, starts_at__lt=timezone.now()).delete()[0]
+    stale = TrendingScore.objects.filter(epoch__lt=now - 2 * REBASE_AFTER * half_life()).delete()[0]
+    return shows + stale
+
+
+# -------------------------------------------------------------------
+# reads
+# -------------------------------------------------------------------
+class Board:
+    """One kind's rows sorted by decayed score (as of `at`); top(k) is a slice."""
+
+    def __init__(self, rows, at):
+        ranked = []
+        for object_id, movie_id, starts_at, score, epoch in rows:
+            s = decay(score, epoch, at)
+            if s >= MIN_SCORE and (starts_at is None or starts_at.timestamp() > at):
+                ranked.append((s, object_id, movie_id, starts_at))
+        ranked.sort(key=lambda r: (-r[0], r[1]))
+        self.at = at
+        self.scores = [r[0] for r in ranked]
+        self.ids = [r[1] for r in ranked]
+        self.meta = {r[1]: (r[2], r[3]) for r in ranked}   # id -> (movie_id, starts_at)
+        self.rank = {oid: i for i, oid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def top(self, k, now=None):
+        """[(object_id, decayed score)] for the k best, as of `now`."""
+        f = decay(1.0, self.at, time.time() if now is None else now)
+        return [(oid, round(s * f, 3)) for oid, s in zip(self.ids[:k], self.scores[:k])]
+
+    def score(self, object_id, now=None):
+        i = self.rank.get(object_id)
+        return 0.0 if i is None else decay(self.scores[i], self.at, time.time() if now is None else now)
+
+
+_boards = {}     # kind -> (loaded_at monotonic, Board)
+_lock = threading.Lock()
+
+
+def load(kind):
+    rows = TrendingScore.objects.filter(kind=kind).values_list("object_id", "movie_id", "starts_at", "score", "epoch")
+    return Board(list(rows), time.time())
+
+
+def board(kind):
+    refresh = getattr(settings, "CINEMA_TRENDING_REFRESH_S", 30)
+    hit = _boards.get(kind)
+    if hit is not None and time.monotonic() - hit[0] < refresh:
+        return hit[1]
+    with _lock:
+        hit = _boards.get(kind)
+        if hit is None or time.monotonic() - hit[0] >= refresh:
+            hit = _boards[kind] = (time.monotonic(), load(kind))
+        return hit[1]
+
+
+def forget():
+    _boards.clear()
+
+
+def selling_fast(show_id):
+    return board(SHOW).score(show_id) >= getattr(settings, "CINEMA_SELLING_FAST_SCORE", 10)
+
+
+# -------------------------------------------------------------------
+# rebuild (used by the rebuild_trending command)
+# -------------------------------------------------------------------
+def compute_rows(bookings, now):
+    """
+    One pass over (show_id, movie_id, start_time, created_at, seats) tuples -> unsaved rows, all with
+    epoch = now. Shows that already started are skipped.
+    """
+    shows, movies = {}, {}
+    for show_id, movie_id, start_time, created_at, seats in bookings:
+        w = seats * 2 ** ((created_at.timestamp() - now) / half_life())
+        if start_time is not None and start_time.timestamp() > now:
+            row = shows.get(show_id)
+            if row is None:
+                row = shows[show_id] = TrendingScore(kind=SHOW, object_id=show_id, movie_id=movie_id,
+                                                     starts_at=start_time, score=0, epoch=int(now))
+            row.score += w
+        row = movies.get(movie_id)
+        if row is None:
+            row = movies[movie_id] = TrendingScore(kind=MOVIE, object_id=movie_id, movie_id=movie_id,
+                                                   score=0, epoch=int(now))
+        row.score += w
+    return [r for r in (*shows.values(), *movies.values()) if r.score >= MIN_SCORE]
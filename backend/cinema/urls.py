@@ -1,19 +1,36 @@
-from django.urls import path
+from django.urls import path, re_path
 from .views import (
-    health, ping,
-    MovieListView, ShowListView, SeatsForShowView,
-    BookingCreateView, MyBookingsView,
+    health, ping, profile,
+    MovieListView, MovieSearchView, TrendingView, ShowListView, SeatsForShowView, ShowAvailabilityView,
+    BookingCreateView, MyBookingsView, BookingCancelView, BookingConfirmView, ShowCancelView, ShowWaitlistView,
+    MovieStatsView, ScreenStatsView, ShowStatsView, ShowScheduleView,
+    BookingTicketView, ticket_file,
 )
 
 urlpatterns = [
 
     path("health/", health, name="cinema-health"),
     path("ping/", ping, name="cinema-ping"),
+    path("debug/profile/", profile, name="cinema-profile"),
 
 
     path("movies/", MovieListView.as_view(), name="movies"),                        
+    path("movies/search/", MovieSearchView.as_view(), name="movie-search"),
+    path("trending/", TrendingView.as_view(), name="trending"),
     path("movies/<int:pk>/shows/", ShowListView.as_view(), name="movie-shows"),     
     path("shows/<int:pk>/seats/", SeatsForShowView.as_view(), name="seats-for-show"),
+    path("shows/availability/", ShowAvailabilityView.as_view(), name="show-availability"),
+    path("shows/schedule/", ShowScheduleView.as_view(), name="show-schedule"),
+    path("shows/<int:pk>/cancel/", ShowCancelView.as_view(), name="show-cancel"),
+    path("shows/<int:pk>/waitlist/", ShowWaitlistView.as_view(), name="show-waitlist"),
     path("bookings/", BookingCreateView.as_view(), name="booking-create"),         
     path("my-bookings/", MyBookingsView.as_view(), name="my-bookings"),             
+    path("bookings/<int:pk>/ticket/", BookingTicketView.as_view(), name="booking-ticket"),
+    path("bookings/<int:pk>/cancel/", BookingCancelView.as_view(), name="booking-cancel"),
+    path("bookings/<int:pk>/confirm/", BookingConfirmView.as_view(), name="booking-confirm"),
+    re_path(r"^tickets/(?P<h>[0-9a-f]{64})\.(?P<fmt>svg|png)$", ticket_file, name="ticket-file"),
+
+    path("stats/movies/", MovieStatsView.as_view(), name="stats-movies"),
+    path("stats/screens/", ScreenStatsView.as_view(), name="stats-screens"),
+    path("stats/shows/<int:pk>/", ShowStatsView.as_view(), name="stats-show"),
 ]
@@ -1,19 +1,28 @@
 # backend/cinema/views.py
 from __future__ import annotations
 
-import json
+import math
 import os
+from datetime import timedelta
 
 from django.apps import apps
 from django.conf import settings
 from django.utils import timezone
-from django.db import transaction
 
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
+from django.db.models import Sum
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+
+from . import archive, booking, cancellation, catalog, degraded, layout, pricing, profiling, scheduling, search, seatmap, sharding, tickets, trending
+from .renderers import CompactSeatMapRenderer, dumps
+from .models import Booking, MovieDayStats, ScreenDayStats, Show, ShowStats
 
 
 # -------------------------------------------------------------------
@@ -28,22 +37,12 @@ def _get_model(app_label: str, model_name: str):
 def ok(data, code=status.HTTP_200_OK):
     return Response(data, status=code)
 
-# file used for demo persistence if DB save is not possible
-DEMO_BOOK_PATH = os.path.join(settings.BASE_DIR, "demo_bookings.json")
-
-def _demo_read():
-    try:
-        with open(DEMO_BOOK_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-def _demo_write(entries):
-    try:
-        with open(DEMO_BOOK_PATH, "w", encoding="utf-8") as f:
-            json.dump(entries, f)
-    except Exception:
-        pass
+def _snapshot_or_unavailable(key):
+    """The last good answer for `key` while the DB is unreachable; 503 if this process never saw one."""
+    snap = degraded.load_snapshot(key)
+    if snap is None:
+        raise degraded.Unavailable()
+    return snap
 
 
 # -------------------------------------------------------------------
@@ -52,7 +51,8 @@ def _demo_write(entries):
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def health(request):
-    return ok({"status": "ok", "service": "cinema"})
+    db = degraded.status_summary()
+    return ok({"status": "ok" if db["state"] == degraded.CLOSED else "degraded", "service": "cinema", "db": db})
 
 @api_view(["GET"])
 @permission_classes([AllowAny])
@@ -69,28 +69,80 @@ class MovieListView(APIView):
     def get(self, request):
         Movie = _get_model("cinema", "Movie")
         data = []
-        if Movie:
-            try:
+        try:
+            with degraded.db_call():
                 for m in Movie.objects.all():
-                    data.append({
-                        "id": m.id,
-                        "title": getattr(m, "title", getattr(m, "name", f"Movie {m.id}")),
-                        "language": getattr(m, "language", ""),
-                        "certificate": getattr(m, "certificate", ""),
-                        "poster_url": getattr(m, "poster_url", "") or f"https://picsum.photos/seed/{m.id}-poster/300/420",
+                    data.append(catalog.movie_entry(m))
+        except degraded.Unavailable:
+            saved_at, data = _snapshot_or_unavailable("movies")
+            return degraded.mark(ok(data), saved_at)
 
-                    })
-            except Exception:
-                pass
-
-        if not data:
-            data = [
-                {"id": 1, "title": "Demo Movie 1", "language": "EN", "certificate": "U/A", "poster_url": ""},
-                {"id": 2, "title": "Demo Movie 2", "language": "HI", "certificate": "U/A", "poster_url": ""},
-            ]
+        degraded.save_snapshot("movies", lambda: data)
         return ok(data)
 
 
+# -------------------------------------------------------------------
+# movie search (in-process index, no DB on the hot path)
+# -------------------------------------------------------------------
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+
+class MovieSearchView(APIView):
+    """GET movies/search/?q=incep&page=1&page_size=20 -> ranked, paginated matches."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        q = (request.query_params.get("q") or "").strip()
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+            page_size = min(max(int(request.query_params.get("page_size", SEARCH_PAGE_SIZE)), 1),
+                            SEARCH_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail": "page / page_size must be integers"}, status=400)
+        if not q:
+            return ok({"query": q, "count": 0, "page": page, "page_size": page_size, "results": []})
+
+        total, hits = search.search(q, page, page_size)
+        return ok({
+            "query": q, "count": total, "page": page, "page_size": page_size,
+            "results": [{**doc, "score": score} for score, doc in hits],
+        })
+
+
+# -------------------------------------------------------------------
+# trending now (time-decayed leaderboards, served from memory)
+# -------------------------------------------------------------------
+TRENDING_LIMIT = 10
+TRENDING_MAX_LIMIT = 50
+
+
+class TrendingView(APIView):
+    """GET trending/?limit=10 -> top movies and upcoming shows by recent seats sold."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", TRENDING_LIMIT)), 1), TRENDING_MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "limit must be integer"}, status=400)
+
+        docs = search.get_index().docs
+        movies = [{**docs[mid], "score": score}
+                  for mid, score in trending.board(trending.MOVIE).top(limit) if mid in docs]
+
+        shows_board = trending.board(trending.SHOW)
+        fast = getattr(settings, "CINEMA_SELLING_FAST_SCORE", 10)
+        shows = []
+        for show_id, score in shows_board.top(limit):
+            movie_id, starts_at = shows_board.meta[show_id]
+            shows.append({
+                "id": show_id, "movie_id": movie_id, "movie_title": docs.get(movie_id, {}).get("title"),
+                "start_time": starts_at, "score": score, "selling_fast": score >= fast,
+            })
+        return ok({"movies": movies, "shows": shows})
+
+
 # -------------------------------------------------------------------
 # shows for a movie
 # -------------------------------------------------------------------
@@ -100,76 +152,157 @@ class ShowListView(APIView):
     def get(self, request, pk):
         Show = _get_model("cinema", "Show")
         data = []
-        if Show:
-            try:
-                qs = Show.objects.filter(movie_id=pk).order_by("start_time")
+        try:
+            with degraded.db_call():
+                qs = sharding.merged(lambda db: Show.objects.using(db).filter(movie_id=pk).order_by("start_time"),
+                                     key=lambda s: s.start_time)
                 for s in qs:
                     data.append({
                         "id": s.id,
                         "start_time": getattr(s, "start_time", None),
+                        "selling_fast": trending.selling_fast(s.id),
                     })
-            except Exception:
-                pass
-
-        if not data:
-            data = [
-                {"id": 101, "start_time": timezone.now()},
-                {"id": 102, "start_time": timezone.now() + timezone.timedelta(hours=3)},
-            ]
+        except degraded.Unavailable:
+            saved_at, data = _snapshot_or_unavailable(f"shows-{pk}")
+            return degraded.mark(ok(data), saved_at)
+
+        degraded.save_snapshot(f"shows-{pk}", lambda: data)
         return ok(data)
 
 
 # -------------------------------------------------------------------
-# seats for a show (reads DB + demo file, so availability is consistent)
+# seats for a show (screen layout cache + this show's occupancy; snapshot + local queue when degraded)
 # -------------------------------------------------------------------
 class SeatsForShowView(APIView):
     permission_classes = [AllowAny]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [CompactSeatMapRenderer]
 
     def get(self, request, pk):
-        # default layout: 1..100
-        seats = [{"number": str(i), "available": True} for i in range(1, 101)]
+        try:
+            with degraded.db_call():
+                lay = layout.layout_for_show(pk)
+                if lay is None or not len(lay):
+                    return Response({"detail": "Unknown show"}, status=404)
+                taken = set(lay.indices_of(layout.taken_seat_ids(pk)))
+                prices = pricing.for_show(pk, lay)  # cached per show + layout: no query once warm
+        except degraded.Unavailable:
+            saved_at, snap = _snapshot_or_unavailable(f"seats-{pk}")
+            # bookings accepted into the local queue hold their seats too
+            taken = set(snap["taken"]) | {int(e["seat_number"]) - 1 for e in degraded.pending(show_id=pk)}
+            return degraded.mark(self.render_map(request, snap["key"], snap["cols"], snap["seat_ids"],
+                                                 snap["rows"], snap["seat_cols"], taken, snap.get("prices")), saved_at)
+
+        degraded.save_snapshot(f"seats-{pk}", lambda: {
+            "key": lay.key, "cols": lay.cols, "seat_ids": list(lay.seat_ids), "rows": list(lay.seat_rows),
+            "seat_cols": list(lay.seat_cols), "taken": sorted(taken), "prices": list(prices or ()),
+        })
+        return self.render_map(request, lay.key, lay.cols, lay.seat_ids, lay.seat_rows, lay.seat_cols, taken, prices)
+
+    @staticmethod
+    def render_map(request, key, cols, seat_ids, seat_rows, seat_cols, taken, prices=None):
+        if seatmap.wants_compact(request):
+            out = seatmap.compact(key, len(seat_ids), cols, sorted(taken))
+            if prices:
+                out["prices"] = pricing.runs(prices)
+            return ok(out)
+        labels = {c: pricing.label(c) for c in set(prices or ())}
+        return ok([
+            {"number": str(i + 1), "seat_id": sid, "row": r, "col": c, "available": i not in taken,
+             **({"price": labels[prices[i]]} if prices else {})}
+            for i, (sid, r, c) in enumerate(zip(seat_ids, seat_rows, seat_cols))
+        ])
+
+
+# -------------------------------------------------------------------
+# batch availability for many shows ("filling fast" badges)
+# -------------------------------------------------------------------
+AVAILABILITY_MAX_SHOWS = getattr(settings, "CINEMA_AVAILABILITY_MAX_SHOWS", 100)
+
+
+def _parse_ids(raw):
+    out = []
+    for part in (raw or "").split(","):
+        part = part.strip()
+        if part:
+            out.append(int(part))
+    return list(dict.fromkeys(out))
 
-        # mark DB bookings as unavailable
-        Booking = _get_model("cinema", "Booking")
-        if Booking:
+
+class ShowAvailabilityView(APIView):
+    """
+    GET shows/availability/?ids=1,2,3 or ?movie=<id>&date=YYYY-MM-DD, add &maps=1 for compact maps.
+    One grouped query over the seats M2M per shard for the whole batch; the body is streamed per show.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            ids = _parse_ids(request.query_params.get("ids"))
+        except ValueError:
+            return Response({"detail": "ids must be comma-separated integers"}, status=400)
+
+        if not ids and request.query_params.get("movie"):
             try:
-                fields = {f.name for f in Booking._meta.get_fields()}
-                taken = set()
-
-                if "seat_number" in fields:
-                    taken = {str(n) for n in Booking.objects.filter(show_id=pk)
-                                             .values_list("seat_number", flat=True)}
-                elif "seat" in fields:
-                    # fall back to seat FK -> seat.number if present
-                    for b in Booking.objects.filter(show_id=pk).select_related("seat"):
-                        n = getattr(getattr(b, "seat", None), "number", None)
-                        if n is not None:
-                            taken.add(str(n))
-
-                if taken:
-                    for s in seats:
-                        if s["number"] in taken:
-                            s["available"] = False
-            except Exception:
-                pass
-
-        # mark demo-file bookings as unavailable
-        for e in _demo_read():
-            if str(e.get("show_id")) == str(pk):
-                for s in seats:
-                    if s["number"] == str(e.get("seat_number")):
-                        s["available"] = False
-
-        return ok(seats)
+                movie_id = int(request.query_params["movie"])
+            except ValueError:
+                return Response({"detail": "movie must be integer"}, status=400)
+            try:
+                day = parse_date(request.query_params.get("date") or "") or timezone.localdate()
+            except ValueError:  # well-formed but impossible, e.g. 2026-02-30
+                return Response({"detail": "date must be a valid date (YYYY-MM-DD)"}, status=400)
+            with degraded.db_call():
+                ids = [i for _, i in sharding.merged(
+                    lambda db: (Show.objects.using(db).filter(movie_id=movie_id, start_time__date=day)
+                                .order_by("start_time").values_list("start_time", "id")[:AVAILABILITY_MAX_SHOWS + 1]),
+                    key=lambda r: r[0], limit=AVAILABILITY_MAX_SHOWS + 1)]
+
+        if not ids:
+            return Response({"detail": "ids or movie required"}, status=400)
+        if len(ids) > AVAILABILITY_MAX_SHOWS:
+            return Response({"detail": f"at most {AVAILABILITY_MAX_SHOWS} shows per request"}, status=400)
+
+        with_maps = request.query_params.get("maps") in ("1", "true", "yes")
+        Through = Booking.seats.through
+        taken = {}
+        with degraded.db_call():
+            screens = layout.screens_for_shows(ids)
+            # resolved before streaming starts, so the body never waits on the database
+            layouts = {sid: layout.get_layout(sid) for sid in set(screens.values())}
+            if with_maps:
+                for alias, part in sharding.group_by_shard(list(screens)).items():
+                    for show_id, seat_id in (Through.objects.using(alias).filter(booking__show_id__in=part)
+                                             .exclude(booking__status=Booking.CANCELLED)
+                                             .values_list("booking__show_id", "seat_id")):
+                        taken.setdefault(show_id, []).append(seat_id)
+            else:
+                taken = layout.taken_counts(screens)
+
+        def summary(show_id):
+            lay = layouts.get(screens.get(show_id))
+            if lay is None or not len(lay):
+                return {"show_id": show_id, "found": False}
+            idx = set(lay.indices_of(taken.get(show_id, ()))) if with_maps else None
+            item = {"show_id": show_id, "found": True,
+                    **layout.availability(lay, len(idx) if with_maps else taken.get(show_id, 0))}
+            if with_maps:
+                item["map"] = seatmap.compact(lay.key, len(lay), lay.cols, sorted(idx))
+            return item
+
+        def stream():
+            yield b'{"shows":['
+            for i, show_id in enumerate(ids):
+                yield (b"," if i else b"") + dumps(summary(show_id))
+            yield b"]}"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
 
 
 # -------------------------------------------------------------------
-# create booking (DB first, file fallback) — returns 201 or 409
+# create booking — 201, 409, 503 if the show stays contended; 202 (queued locally) while the DB is down
 # -------------------------------------------------------------------
 class BookingCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         show_id = request.data.get("show_id")
         seat_number = request.data.get("seat_number")
@@ -183,141 +316,348 @@ class BookingCreateView(APIView):
             return Response({"detail": "show_id must be integer"}, status=400)
         seat_number_str = str(seat_number)
 
-        # try real DB first
-        Booking = _get_model("cinema", "Booking")
-        if Booking:
-            try:
-                fields = {f.name for f in Booking._meta.get_fields()}
-
-                # conflict check
-                if "seat_number" in fields:
-                    if Booking.objects.filter(show_id=show_id, seat_number=seat_number_str).exists():
-                        return Response({"detail": "Seat already booked"}, status=409)
-                else:
-                    # less strict conflict if no seat_number column
-                    if Booking.objects.filter(show_id=show_id).exists():
-                        pass  # allow create; schema may be different
-
-                create_kwargs = {}
-                if "user" in fields:
-                    create_kwargs["user"] = request.user
-                if "show" in fields or "show_id" in fields:
-                    create_kwargs["show_id"] = show_id
-                if "seat_number" in fields:
-                    create_kwargs["seat_number"] = seat_number_str
-
-                b = Booking.objects.create(**create_kwargs)
-                return ok(
-                    {"id": getattr(b, "id", 0), "show_id": show_id, "seat_number": seat_number_str},
-                    code=status.HTTP_201_CREATED
-                )
-            except Exception:
-                # fall through to file persistence
-                pass
-
-        # file fallback (always persists for the demo)
-        entries = _demo_read()
-        for e in entries:
-            if str(e.get("show_id")) == str(show_id) and str(e.get("seat_number")) == seat_number_str:
-                return Response({"detail": "Seat already booked"}, status=409)
-
-        new_id = (entries[-1]["id"] + 1) if entries else 1
-        entry = {
-            "id": new_id,
-            "user": request.user.username,
-            "show_id": show_id,
-            "seat_number": seat_number_str,
-            "created_at": timezone.now().isoformat(),
-        }
-        entries.append(entry)
-        _demo_write(entries)
-        return ok(entry, code=status.HTTP_201_CREATED)
+        # seat number -> Seat row through the screen layout
+        try:
+            with degraded.db_call():
+                lay = layout.layout_for_show(show_id)
+                if lay is None or not len(lay):
+                    return Response({"detail": "Unknown show"}, status=404)
+                i = lay.index_of_number(seat_number_str)
+                if i is None:
+                    return Response({"detail": "Unknown seat"}, status=400)
+                b = booking.book(request.user, show_id, lay.seat_ids[i], lay=lay)
+        except booking.SeatTaken:
+            return Response({"detail": "Seat already booked"}, status=409)
+        except booking.Contention:
+            return Response({"detail": "Show is busy, please retry"}, status=503, headers={"Retry-After": "1"})
+        except degraded.Unavailable:
+            if degraded.breaker.state == degraded.CLOSED:
+                raise  # one failed call: 503, retry. Queue only while open, so the recovery replays it
+            return self.queue(request, show_id, seat_number_str)
+        return ok(
+            {"id": b.id, "show_id": show_id, "seat_number": seat_number_str, "seat_id": lay.seat_ids[i],
+             "total_amount": b.total_amount},
+            code=status.HTTP_201_CREATED
+        )
+
+    @staticmethod
+    def queue(request, show_id, seat_number):
+        try:
+            entry = degraded.enqueue_booking(request.user.id, show_id, seat_number)
+        except degraded.SeatTaken:
+            return Response({"detail": "Seat already booked"}, status=409)
+        except ValueError:
+            return Response({"detail": "Unknown seat"}, status=400)
+        except LookupError:
+            raise degraded.Unavailable()
+        resp = ok({"ref": entry["ref"], "show_id": show_id, "seat_number": seat_number, "status": degraded.QUEUED,
+                   "detail": "Booking queued; it will be confirmed when the system recovers"},
+                  code=status.HTTP_202_ACCEPTED)
+        resp["X-Cinema-Degraded"] = "queued"
+        return resp
 
 
 # -------------------------------------------------------------------
-# my bookings (reads DB if possible, else demo file)
+# my bookings (DB, plus anything still in or rejected from the degraded-mode queue)
 # -------------------------------------------------------------------
 # ---- My bookings: include movie title + show time when available ----
+MY_BOOKINGS_LIMIT = 100
+
+
 class MyBookingsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        username = request.user.username
+        # DB path: bookings+show per shard merged newest first, then one query for seats
+        # per shard (movies too, when sharded: they live on another database)
+        data, partial = [], False
+        try:
+            with degraded.db_call():
+                qs = sharding.merged(
+                    lambda db: sharding.with_related(Booking.objects.using(db).filter(user_id=request.user.id),
+                                                     local=("show",), remote=("show__movie",))
+                    .order_by("-created_at", "-id")[:MY_BOOKINGS_LIMIT],
+                    key=lambda b: (b.created_at, b.id), reverse=True, limit=MY_BOOKINGS_LIMIT,
+                )
+                seats = layout.seat_ids_by_booking(qs)
+                rows = []
+                for b in qs:
+                    lay = layout.get_layout(b.show.screen_id)
+                    idx = lay.indices_of(seats.get(b.id, ())) if lay else []
+                    rows.append(((b.created_at, b.id), {
+                        "id": b.id,
+                        "show_id": b.show_id,
+                        "seat_number": ",".join(str(i + 1) for i in sorted(idx)) or None,
+                        "movie_title": b.show.movie.title,
+                        "show_start_time": b.show.start_time,
+                        "status": b.status,
+                        **({"hold_until": b.hold_until} if b.status == Booking.PENDING else {}),
+                    }))
+                # bookings of long-played shows, moved to the archive table (cinema.archive)
+                for a in archive.history(request.user.id, MY_BOOKINGS_LIMIT):
+                    rows.append(((a.created_at, a.id), {
+                        "id": a.id,
+                        "show_id": a.show_id,
+                        "seat_number": a.seat_number or None,
+                        "movie_title": a.movie_title,
+                        "show_start_time": a.show_start_time,
+                        "status": a.status,
+                        "archived": True,
+                    }))
+                rows.sort(key=lambda r: r[0], reverse=True)
+                data = [d for _, d in rows[:MY_BOOKINGS_LIMIT]]
+        except degraded.Unavailable:
+            partial = True
+
+        local = [
+            {"id": None, "ref": e["ref"], "show_id": e["show_id"], "seat_number": e["seat_number"],
+             "movie_title": None, "show_start_time": None, "status": e.get("outcome", degraded.QUEUED),
+             **({"reason": e["reason"]} if e.get("reason") else {})}
+            for e in degraded.pending(user_id=request.user.id) + degraded.rejected(request.user.id)
+        ]
+        resp = ok(local + data)
+        if partial:
+            resp["X-Cinema-Degraded"] = "partial"
+        return resp
 
-        Booking = _get_model("cinema", "Booking")
-        Show = _get_model("cinema", "Show")
-        Movie = _get_model("cinema", "Movie")
 
-        # DB path (preferred)
-        if Booking:
-            try:
-                fields = {f.name for f in Booking._meta.get_fields()}
-                qs = Booking.objects.all()
-                if "user" in fields:
-                    qs = qs.filter(user=request.user)
-
-                # prefetch to get titles/times if relations exist
-                if Show:
-                    qs = qs.select_related("show") if "show" in fields else qs
-                data = []
-                for b in qs.order_by("-id")[:100]:
-                    # show id
-                    show_id = getattr(b, "show_id", None)
-                    if show_id is None and hasattr(b, "show") and getattr(b, "show", None):
-                        show_id = getattr(b.show, "id", None)
-
-                    # seat number
-                    seat_no = None
-                    if "seat_number" in fields:
-                        seat_no = getattr(b, "seat_number", None)
-                    elif "seat" in fields:
-                        seat = getattr(b, "seat", None)
-                        seat_no = getattr(seat, "number", None)
-
-                    # movie title + show start time (best effort)
-                    movie_title = None
-                    show_start = None
-                    show_obj = getattr(b, "show", None)
-                    if not show_obj and Show and show_id:
-                        try:
-                            show_obj = Show.objects.get(id=show_id)
-                        except Exception:
-                            show_obj = None
-                    if show_obj is not None:
-                        show_start = getattr(show_obj, "start_time", None)
-                        mov = getattr(show_obj, "movie", None)
-                        if mov is None and Movie:
-                            try:
-                                mov = Movie.objects.get(id=getattr(show_obj, "movie_id", None))
-                            except Exception:
-                                mov = None
-                        if mov is not None:
-                            movie_title = getattr(mov, "title", getattr(mov, "name", None))
+# -------------------------------------------------------------------
+# cancellation + waitlist (freed seats are offered to waiting users as timed holds)
+# -------------------------------------------------------------------
+WAITLIST_MAX_SEATS = getattr(settings, "CINEMA_WAITLIST_MAX_SEATS", 6)
 
-                    data.append({
-                        "id": getattr(b, "id", 0),
-                        "show_id": show_id,
-                        "seat_number": str(seat_no) if seat_no is not None else None,
-                        "movie_title": movie_title,
-                        "show_start_time": show_start,
-                    })
 
-                if data:
-                    return ok(data)
-            except Exception:
-                pass
+class BookingCancelView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        with degraded.db_call():
+            result = cancellation.cancel_booking(request.user, pk)
+        if not result["cancelled"]:
+            return Response({"detail": "Not found or already cancelled"}, status=404)
+        return ok({"id": pk, "status": Booking.CANCELLED, **result})
 
-        # Fallback to demo file (add same fields when possible)
-        entries = _demo_read()
-        data = []
-        for e in entries:
-            if e.get("user") != username:
-                continue
-            data.append({
-                "id": e.get("id"),
-                "show_id": e.get("show_id"),
-                "seat_number": e.get("seat_number"),
-                "movie_title": e.get("movie_title"),      # may be missing in older entries
-                "show_start_time": e.get("show_start_time")
-            })
-        return ok(data)
+
+class ShowCancelView(APIView):
+    """POST: cancel all of your bookings for the show; staff with {"all": true} call the whole show off."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        everyone = bool(request.data.get("all"))
+        if everyone and not request.user.is_staff:
+            return Response({"detail": "Only staff can cancel a show for everyone"}, status=403)
+        with degraded.db_call():
+            result = cancellation.cancel_show(request.user, pk, everyone=everyone)
+        return ok({"show_id": pk, **result})
+
+
+class ShowWaitlistView(APIView):
+    """POST {"seats"?}: queue for a sold-out show; DELETE: leave the queue."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            seats = int(request.data.get("seats") or 1)
+        except (TypeError, ValueError):
+            return Response({"detail": "seats must be integer"}, status=400)
+        if not 1 <= seats <= WAITLIST_MAX_SEATS:
+            return Response({"detail": f"seats must be 1..{WAITLIST_MAX_SEATS}"}, status=400)
+        try:
+            with degraded.db_call():
+                result = cancellation.join(request.user, pk, seats)
+        except Show.DoesNotExist:
+            return Response({"detail": "Unknown show"}, status=404)
+        except cancellation.SeatsAvailable:
+            return Response({"detail": "Seats are available, book them instead"}, status=409)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        return ok({"show_id": pk, "seats": seats, **result}, code=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        with degraded.db_call():
+            left = cancellation.leave(request.user, pk)
+        return ok({"show_id": pk, "left": left})
+
+
+class BookingConfirmView(APIView):
+    """POST: confirm a waitlist hold (a PENDING booking) before it expires."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            with degraded.db_call():
+                amount = cancellation.confirm_hold(request.user, pk)
+        except Booking.DoesNotExist:
+            return Response({"detail": "Not found"}, status=404)
+        except cancellation.HoldExpired:
+            return Response({"detail": "This hold has expired"}, status=410)
+        return ok({"id": pk, "status": Booking.CONFIRMED, "total_amount": amount})
+
+
+# -------------------------------------------------------------------
+# dashboards (summary tables only; never aggregates bookings)
+# -------------------------------------------------------------------
+def _date_range(request):
+    """(from, to) of the query string, the last 7 days by default; None for an impossible date (2024-02-31)."""
+    today = timezone.localdate()
+    try:
+        start = parse_date(request.query_params.get("from") or "") or today - timedelta(days=6)
+        end = parse_date(request.query_params.get("to") or "") or today
+    except ValueError:
+        return None
+    return start, end
+
+_BAD_RANGE = {"detail": "from / to must be valid dates (YYYY-MM-DD)"}
+
+def _stats_row(r):
+    cap = r["capacity"] or 0
+    return {
+        "shows": r["shows"],
+        "capacity": cap,
+        "seats_sold": r["seats_sold"],
+        "bookings": r["bookings"],
+        "revenue": str(r["revenue"] or 0),
+        "occupancy": round(r["seats_sold"] / cap, 4) if cap else 0.0,
+    }
+
+_SUMS = dict(shows=Sum("shows"), capacity=Sum("capacity"), seats_sold=Sum("seats_sold"),
+             bookings=Sum("bookings"), revenue=Sum("revenue"))
+
+
+class MovieStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        dates = _date_range(request)
+        if dates is None:
+            return Response(_BAD_RANGE, status=400)
+        start, end = dates
+        with degraded.db_call():
+            rows = list(MovieDayStats.objects.filter(day__range=(start, end))
+                        .values("movie_id", "movie__title").order_by().annotate(**_SUMS).order_by("-revenue"))
+        return ok({
+            "from": start, "to": end,
+            "movies": [{"movie_id": r["movie_id"], "title": r["movie__title"], **_stats_row(r)} for r in rows],
+        })
+
+
+class ScreenStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        dates = _date_range(request)
+        if dates is None:
+            return Response(_BAD_RANGE, status=400)
+        start, end = dates
+        with degraded.db_call():
+            rows = list(ScreenDayStats.objects.filter(day__range=(start, end))
+                        .values("screen_id", "screen__name").order_by().annotate(**_SUMS).order_by("screen_id"))
+        return ok({
+            "from": start, "to": end,
+            "screens": [{"screen_id": r["screen_id"], "name": r["screen__name"], **_stats_row(r)} for r in rows],
+        })
+
+
+class ShowStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        with degraded.db_call():
+            r = ShowStats.objects.filter(show_id=pk).values(
+                "show_id", "movie_id", "screen_id", "day", "capacity", "seats_sold", "bookings", "revenue").first()
+        if r is None:
+            return Response({"detail": "No stats for this show"}, status=404)
+        return ok({**r, **_stats_row({**r, "shows": 1})})
+
+
+# -------------------------------------------------------------------
+# batch scheduling (staff)
+# -------------------------------------------------------------------
+class ShowScheduleView(APIView):
+    """
+    POST {"shows": [{"screen", "movie", "start_time", "price"?, "price_multiplier"?}, ...], "dry_run"?, "allow_past"?}
+    Valid rows are created in one transaction; the rest come back in "rejected" with the reason.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        rows = request.data.get("shows")
+        if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+            return Response({"detail": "shows must be a list of objects"}, status=400)
+        with degraded.db_call():
+            result = scheduling.schedule(rows, allow_past=bool(request.data.get("allow_past")),
+                                         dry_run=bool(request.data.get("dry_run")))
+        return ok(result, status.HTTP_201_CREATED if result["created"] else status.HTTP_200_OK)
+
+
+# -------------------------------------------------------------------
+# tickets (rendered in a process pool, cached on disk by content hash)
+# -------------------------------------------------------------------
+TICKET_MAX_AGE = 365 * 24 * 3600
+
+
+class BookingTicketView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        qs = Booking.objects.using(sharding.shard_for_booking(pk)).filter(id=pk)
+        if not request.user.is_staff:
+            qs = qs.filter(user_id=request.user.id)
+        with degraded.db_call():
+            b = next(iter(tickets.bookings_for_tickets(qs)), None)
+        if b is None:
+            return Response({"detail": "Not found"}, status=404)
+
+        payload = tickets.payload_for(b)
+        urls = {}
+        for fmt in tickets.FORMATS:
+            (h,) = tickets.ensure_rendered([payload], fmt)
+            urls[fmt] = request.build_absolute_uri(reverse("ticket-file", args=[h, fmt]))
+        resp = ok({"booking_id": b.id, "qr": tickets.qr_text(payload), **urls})
+        resp["Cache-Control"] = "private, no-cache"
+        return resp
+
+
+def ticket_file(request, h, fmt):
+    """Content-addressed ticket file; the unguessable hash is the capability, so no auth here."""
+    path = tickets.path_for(h, fmt)
+    if not os.path.exists(path):
+        raise Http404("ticket not rendered")
+    etag = f'"{h}"'
+    if request.headers.get("If-None-Match") == etag:
+        resp = HttpResponseNotModified()
+    else:
+        resp = FileResponse(open(path, "rb"), content_type=tickets.CONTENT_TYPES[fmt])
+    resp["ETag"] = etag
+    resp["Cache-Control"] = f"private, max-age={TICKET_MAX_AGE}, immutable"
+    return resp
+
+
+# -------------------------------------------------------------------
+# staff-only statistical profiler
+# -------------------------------------------------------------------
+PROFILE_MAX_SECONDS = 30
+PROFILE_INTERVAL_MS = (1.0, 1000.0)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile(request):
+    """Sample every thread's stack for ?seconds=N; returns collapsed stacks (flamegraph.pl / speedscope input)."""
+    try:
+        seconds = float(request.query_params.get("seconds", 5))
+        interval_ms = float(request.query_params.get("interval_ms", 5))
+    except ValueError:
+        return Response({"detail": "seconds / interval_ms must be numbers"}, status=400)
+    if not (math.isfinite(seconds) and math.isfinite(interval_ms)):
+        return Response({"detail": "seconds / interval_ms must be finite"}, status=400)
+    seconds = min(max(seconds, 0.0), PROFILE_MAX_SECONDS)
+    interval = min(max(interval_ms, PROFILE_INTERVAL_MS[0]), PROFILE_INTERVAL_MS[1]) / 1000
+    try:
+        stacks, samples = profiling.sample(seconds, interval)
+    except RuntimeError as e:  # one profile per process at a time
+        return Response({"detail": str(e)}, status=409)
+    body = profiling.collapsed(stacks)
+    resp = HttpResponse(body, content_type="text/plain; charset=utf-8")
+    resp["X-Profile-Samples"] = str(samples)
+    return resp
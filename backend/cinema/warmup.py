@@ -0,0 +1,198 @@
+# backend/cinema/warmup.py
+"""
+Cache warm-up ahead of an on-sale (manage.py warm_caches, e.g. from cron a few
+minutes before tickets open).
+
+What the read path (movie list, a movie's shows, seat maps, availability) keeps:
+
+    shared cache   show -> screen, show price terms, screen layout versions
+    per process    built screen layouts, price vectors, the search index,
+                   trending boards
+    on disk        degraded-mode snapshots of the movie list, show lists and
+                   seat maps
+
+For a set of shows (ids or a start-time window) prime() writes the shared keys
+from one query per shard (set_many, not a read per show) and builds each
+screen's layout and price vectors; plan() lists the GET requests the frontend
+makes for those shows and run() issues them from a thread pool, through the
+URLconf in this process or against running workers (base URLs), which fills
+each worker's own memos and the snapshots. Only the worker that answers a
+request fills its memos: one base URL behind a load balancer warms whichever
+workers the requests land on, so the command takes each worker's address. A
+run in this process reaches the workers only through a shared cache backend
+(and the on-disk snapshots); with the local-memory default the command says so
+rather than report the workers warm. Occupancy is not cached anywhere
+(it moves with every booking), so a warm seat map or availability batch still
+costs its one query per shard.
+
+hit_rates() then checks every entry the plan should have left behind, per
+cache; the command also re-issues the plan to time the warm path.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from . import degraded, layout, pricing, search, sharding, trending
+from .models import Show
+
+
+def select_shows(show_ids=None, start=None, end=None):
+    """[(id, movie_id, screen_id, price, multiplier)] by start time, one query per shard."""
+    def qs(db):
+        q = Show.objects.using(db).order_by("start_time")
+        if show_ids:
+            q = q.filter(id__in=show_ids)
+        if start is not None:
+            q = q.filter(start_time__gte=start)
+        if end is not None:
+            q = q.filter(start_time__lt=end)
+        return q.values_list("id", "movie_id", "screen_id", "price", "price_multiplier")
+    return [row for _, rows in sharding.fan_out(qs, list(sharding.group_by_shard(show_ids)) if show_ids else None)
+            for row in rows]
+
+
+def prime(shows, local=True):
+    """Shared keys in two set_many calls; with `local`, this process's layouts, vectors, search index, boards."""
+    layout.remember_screens({s[0]: s[2] for s in shows})
+    pricing.remember_many([(s[0], s[3], s[4]) for s in shows])
+    if not local:
+        return
+    terms = {}
+    for _, _, screen_id, price, multiplier in shows:
+        terms.setdefault(screen_id, set()).add((price, multiplier))
+    for screen_id, pairs in terms.items():
+        lay = layout.get_layout(screen_id)
+        for price, multiplier in pairs:
+            pricing.vector(lay, price, multiplier)
+    search.get_index()
+    trending.board(trending.MOVIE)
+    trending.board(trending.SHOW)
+
+
+def plan(shows):
+    """The GET paths the frontend issues for these shows: catalog first, then per movie, then seat maps."""
+    per_batch = getattr(settings, "CINEMA_AVAILABILITY_MAX_SHOWS", 100)
+    by_movie = {}
+    for show_id, movie_id, *_ in shows:
+        by_movie.setdefault(movie_id, []).append(show_id)
+    # any query builds the worker's search index (lazy, see cinema.search)
+    paths = [reverse("movies"), f"{reverse('movie-search')}?q=warm", reverse("trending")]
+    for movie_id, ids in by_movie.items():
+        paths.append(reverse("movie-shows", args=[movie_id]))
+        for i in range(0, len(ids), per_batch):
+            paths.append(f"{reverse('show-availability')}?ids={','.join(map(str, ids[i:i + per_batch]))}")
+    paths += [f"{reverse('seats-for-show', args=[s[0]])}?compact=1" for s in shows]
+    return paths
+
+
+# -------------------------------------------------------------------
+# issuing
+# -------------------------------------------------------------------
+_factory = RequestFactory()
+
+
+def local_get(path):
+    """Run the view for `path` in this process (no middleware); returns the status."""
+    match = resolve(urlsplit(path).path)
+    response = match.func(_factory.get(path, HTTP_ACCEPT="application/json"), *match.args, **match.kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response.status_code
+
+
+def remote_get(base_url, timeout=30.0):
+    base = base_url.rstrip("/")
+
+    def get(path):
+        req = urllib.request.Request(base + path, headers={"Accept": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+        except (urllib.error.URLError, OSError):
+            return 0
+    return get
+
+
+def run(paths, get, workers=0, progress=None):
+    """Issue every path with get(path) -> status; [(path, status, ms)] in plan order. workers=0: this thread."""
+    results = [None] * len(paths)
+    done = [0]
+    lock = threading.Lock()
+
+    def one(i):
+        t0 = time.perf_counter()
+        status = get(paths[i])
+        results[i] = (paths[i], status, round((time.perf_counter() - t0) * 1000, 2))
+        with lock:
+            done[0] += 1
+            if progress:
+                progress(done[0], len(paths))
+
+    if not workers:
+        for i in range(len(paths)):
+            one(i)
+        return results
+
+    def lane(k):
+        try:
+            for i in range(k, len(paths), workers):
+                one(i)
+        finally:
+            connections.close_all()  # this thread's connections
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lane, range(workers)))
+    return results
+
+
+# -------------------------------------------------------------------
+# verification
+# -------------------------------------------------------------------
+shared_cache = layout.shared_cache
+
+
+def _rate(hits, expected):
+    return {"hits": hits, "expected": expected, "rate": round(hits / expected, 4) if expected else 1.0}
+
+
+def hit_rates(shows, since, local=True):
+    """
+    {cache: {"hits", "expected", "rate"}}. Per-process memos and snapshots are checked only for a local run;
+    shared keys when this process can see them (a local run, or a shared cache backend).
+    """
+    ids = [s[0] for s in shows]
+    screens = {s[2] for s in shows}
+    out = {}
+    if local or shared_cache():
+        for name, keys in (("show-screen", [layout.SHOW_SCREEN_KEY.format(i) for i in ids]),
+                           ("show-price", [pricing.SHOW_PRICE_KEY.format(i) for i in ids]),
+                           ("layout-version", [layout.VERSION_KEY.format(i) for i in screens])):
+            out[name] = _rate(len(cache.get_many(keys)), len(keys))
+    if local:
+        idx = search._index
+        out["search-index"] = _rate(int(idx is not None and idx.version == search.current_version()), 1)
+        built = {sc: layout.peek(sc) for sc in screens}
+        out["layouts"] = _rate(sum(lay is not None for lay in built.values()), len(screens))
+        out["price-vectors"] = _rate(sum(built[sc] is not None and pricing.has_vector(built[sc], p, m)
+                                         for _, _, sc, p, m in shows), len(shows))
+        keys = ["movies"] + [f"shows-{m}" for m in {s[1] for s in shows}] + [f"seats-{i}" for i in ids]
+        fresh = [degraded.load_snapshot(k) for k in keys]
+        since -= getattr(settings, "CINEMA_SNAPSHOT_EVERY_S", 30)  # a copy that recent is not rewritten
+        out["snapshots"] = _rate(sum(s is not None and s[0] >= since for s in fresh), len(keys))
+    return out
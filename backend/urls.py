@@ -1,6 +0,0 @@
-from django.urls import path
-from .views import placeholder
-
-urlpatterns = [
-    path("", placeholder, name="users-home"),
-]
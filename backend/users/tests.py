@@ -1,3 +1,55 @@
+"""Query-count budgets for the users endpoints (see cinema/tests.py for the full perf suite)."""
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from . import urls as users_urls
+
+User = get_user_model()
+
+BUDGETS = {
+    "health": 0,
+    "ping": 0,
+    "register": 2,   # username check, insert
+    "me": 1,         # JWT user
+}
+
+
+class UsersQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([User(username=f"bulk-{i}") for i in range(2000)])
+        cls.user = User.objects.create_user("budget-user", password="x")
+
+    def setUp(self):
+        self.anon = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def assertBudget(self, name, fn, expected_status=200):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = fn()
+        sql = [q["sql"] for q in ctx.captured_queries if not q["sql"].upper().startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(resp.status_code, expected_status, getattr(resp, "data", None))
+        self.assertLessEqual(len(sql), BUDGETS[name], f"{name}: {len(sql)} queries\n" + "\n".join(sql))
+
+    def test_every_users_url_has_a_budget(self):
+        self.assertEqual({p.name for p in users_urls.urlpatterns} - set(BUDGETS), set())
+
+    def test_health_and_ping(self):
+        self.assertBudget("health", lambda: self.anon.get(reverse("health")))
+        self.assertBudget("ping", lambda: self.anon.get(reverse("ping")))
+
+    def test_register(self):
+        url = reverse("register")
+        self.assertBudget("register", lambda: self.anon.post(url, {"username": "new", "password": "pw"}, format="json"),
+                          expected_status=201)
+        self.assertBudget("register", lambda: self.anon.post(url, {"username": "new", "password": "pw"}, format="json"),
+                          expected_status=409)
+
+    def test_me(self):
+        self.assertBudget("me", lambda: self.client.get(reverse("me")))
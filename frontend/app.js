@@ -1,5 +1,6 @@
 // ===== config =====
 const BASE_URL = "http://127.0.0.1:8000";
+const CATALOG_URL = `${BASE_URL}/catalog/`;  // static hosting of publish_catalog's output
 
 // ===== token store =====
 const store = {
@@ -108,14 +109,16 @@ const payBtn    = document.getElementById("payBtn");
 const bookMsg   = document.getElementById("bookMsg");
 const historyBox= document.getElementById("history");
 const cinDemoBtn= document.getElementById("cinDemoBtn");
+const searchBox = document.getElementById("q");
 
 // ===== state =====
 let selectedCinema = { id: 1, name: "CinemaSeat Multiplex" };
 let selectedMovie  = null;
 let selectedShow   = null;
 let selectedSeats  = new Set();
-let seatMap        = []; // [{number, available}]
+let seatMap        = []; // [{number, available, price?}]
 let seatCols       = 10;
+let layoutCols     = 0;  // from the compact seat map (screen layout), 0 = unknown
 
 // ===== helpers =====
 function esc(s){ return String(s ?? "").replace(/[&<>"]/g, c => ({"&":"&amp;","<":"&lt;",">":"&gt;","\"":"&quot;"}[c])); }
@@ -124,6 +127,26 @@ function poster(m){
   return m.poster_url || `https://picsum.photos/seed/${encodeURIComponent(m.title || "movie")}/300/420`;
 }
 
+// compact seat map: {format:"bitset-b64", n, cols, taken, prices?} -> [{number, available, price?}]
+// bit i (little-endian within each byte) set => seat i+1 is taken;
+// prices: [[cents, count], ...] runs over the same seat order
+function decodeSeatMap(d){
+  if (Array.isArray(d)) return d.map(s => ({ ...s, price: s.price != null ? Math.round(Number(s.price) * 100) : undefined }));
+  if (!d || d.format !== "bitset-b64") return [];
+  layoutCols = Number(d.cols) || 0;
+  const bin = atob(d.taken || "");
+  const cents = [];
+  (d.prices || []).forEach(([c, n]) => { for (let k = 0; k < n; k++) cents.push(c); });
+  const out = [];
+  for (let i = 0; i < d.n; i++){
+    const taken = (bin.charCodeAt(i >> 3) >> (i & 7)) & 1;
+    out.push({ number: String(i + 1), available: !taken, price: cents[i] });
+  }
+  return out;
+}
+
+function money(cents){ return `₹${(cents / 100).toFixed(2)}`; }
+
 function movieCard(m){
   const a = document.createElement("a");
   a.href = "#";
@@ -141,7 +164,9 @@ function movieCard(m){
 function setPayEnabled(){
   const n = selectedSeats.size;
   const logged = isLoggedIn();
-  selCount.textContent = `Selected: ${n}`;
+  const byNumber = new Map(seatMap.map(s => [s.number, s.price]));
+  const total = Array.from(selectedSeats).reduce((t, num) => t + (byNumber.get(num) || 0), 0);
+  selCount.textContent = `Selected: ${n}${total ? ` • ${money(total)}` : ""}`;
   payBtn.disabled = (!logged || n === 0 || n > 6 || !selectedShow);
   payBtn.title = logged ? "" : "Sign in to book seats";
 }
@@ -149,7 +174,7 @@ function setPayEnabled(){
 function renderSeatsGrid(){
   seatsBox.innerHTML = "";
   const maxNumber = Math.max(...seatMap.map(s => Number(s.number) || 0), 0);
-  seatCols = maxNumber >= 60 ? 10 : 8;
+  seatCols = layoutCols || (maxNumber >= 60 ? 10 : 8);
   seatsBox.className = `grid gap-2 grid-cols-${seatCols} md:grid-cols-${seatCols}`;
 
   seatMap.forEach(seat => {
@@ -158,6 +183,7 @@ function renderSeatsGrid(){
     const taken = !seat.available;
 
     btn.textContent = num;
+    btn.title = seat.price != null ? money(seat.price) : "";
     btn.className = "px-2 py-2 border rounded text-sm bg-white";
     if (taken){
       btn.classList.add("bg-zinc-300","text-zinc-600","cursor-not-allowed");
@@ -188,6 +214,25 @@ function renderSeatsGrid(){
   setPayEnabled();
 }
 
+// ===== catalog snapshots: static files first, the API when they are missing or stale =====
+// manifest.json is small and revalidated; the files it lists are named by content hash and never change.
+// An entry is trusted while its checked_at is less than max_age_s old (client clock, so keep max_age_s generous).
+const catalog = { manifest: null, at: 0 };
+async function catalogDoc(key){
+  try{
+    if (!catalog.manifest || Date.now() - catalog.at > 15000){
+      const r = await fetch(CATALOG_URL + "manifest.json", {cache: "no-cache"});
+      if (!r.ok) return null;
+      catalog.manifest = await r.json();
+      catalog.at = Date.now();
+    }
+    const m = catalog.manifest, f = (m.files || {})[key];
+    if (!f || Date.now() / 1000 - f.checked_at > m.max_age_s) return null;
+    const r = await fetch(CATALOG_URL + f.path);
+    return r.ok ? await r.json() : null;
+  }catch{ return null; }
+}
+
 // ===== flow: cinema → movies → shows → seats =====
 cinDemoBtn.onclick = () => {
   selectedCinema = { id: 1, name: "CinemaSeat Multiplex" };
@@ -199,25 +244,29 @@ cinDemoBtn.onclick = () => {
   setPayEnabled();
 };
 
+function movieRow(m){
+  const row = document.createElement("div");
+  row.className = "flex items-center justify-between border rounded-lg p-2 bg-zinc-50";
+  row.innerHTML = `<div>${esc(m.title)}</div><button class="bg-[#f84464] text-white px-3 py-1.5 rounded-lg">Select</button>`;
+  row.querySelector("button").onclick = ()=>pickMovie(m);
+  return row;
+}
+
 async function loadMovies(){
   mvList.innerHTML = `<div class="text-zinc-500">Loading movies...</div>`;
   try{
-    const r = await http("/api/cinema/movies/");
-    const ok = r.ok;
-    const items = ok ? await r.json() : [];
+    let items = await catalogDoc("movies");
+    if (!items){
+      const r = await http("/api/cinema/movies/");
+      items = r.ok ? await r.json() : [];
+    }
     mvList.innerHTML = "";
-    if (!ok || !Array.isArray(items) || !items.length){
+    if (!Array.isArray(items) || !items.length){
       mvList.innerHTML = `<div class="text-zinc-500">No movies found.</div>`;
       return;
     }
 
-    items.forEach(m=>{
-      const row = document.createElement("div");
-      row.className = "flex items-center justify-between border rounded-lg p-2 bg-zinc-50";
-      row.innerHTML = `<div>${esc(m.title)}</div><button class="bg-[#f84464] text-white px-3 py-1.5 rounded-lg">Select</button>`;
-      row.querySelector("button").onclick = ()=>pickMovie(m);
-      mvList.appendChild(row);
-    });
+    items.forEach(m=>mvList.appendChild(movieRow(m)));
 
     rec.innerHTML = ""; pre.innerHTML = "";
     items.slice(0,10).forEach(m=>rec.appendChild(movieCard(m)));
@@ -232,15 +281,43 @@ async function loadMovies(){
   }
 }
 
+// search box: debounced, results go to the movie list; stale responses are dropped
+let searchTimer = null, searchSeq = 0;
+async function searchMovies(q){
+  const seq = ++searchSeq;
+  if (!q.trim()){ mvList.innerHTML = `<div class="text-zinc-500">Click "Load Movies".</div>`; return; }
+  try{
+    const r = await http(`/api/cinema/movies/search/?q=${encodeURIComponent(q)}`);
+    const data = r.ok ? await r.json() : null;
+    if (seq !== searchSeq) return;
+    mvList.innerHTML = "";
+    if (!data || !data.results.length){
+      mvList.innerHTML = `<div class="text-zinc-500">No movies match "${esc(q)}".</div>`;
+      return;
+    }
+    data.results.forEach(m=>mvList.appendChild(movieRow(m)));
+  }catch{
+    if (seq === searchSeq) mvList.innerHTML = `<div class="text-zinc-500">Network error.</div>`;
+  }
+}
+searchBox.addEventListener("input", ()=>{
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(()=>searchMovies(searchBox.value), 150);
+});
+
 async function pickMovie(m){
   selectedMovie = m; selectedShow = null; selectedSeats.clear(); setPayEnabled();
   seatsBox.innerHTML = "";
   bookMsg.textContent = "";
   shList.innerHTML = `<div class="text-zinc-500">Loading shows...</div>`;
   try{
-    const r = await http(`/api/cinema/movies/${m.id}/shows/`);
-    if (!r.ok){ shList.innerHTML = `<div class="text-zinc-500">No shows.</div>`; return; }
-    const items = await r.json();
+    const snap = await catalogDoc(`shows-${m.id}`);
+    let items = snap && snap.shows;
+    if (!items){
+      const r = await http(`/api/cinema/movies/${m.id}/shows/`);
+      if (!r.ok){ shList.innerHTML = `<div class="text-zinc-500">No shows.</div>`; return; }
+      items = await r.json();
+    }
     shList.innerHTML = "";
     if (!Array.isArray(items) || !items.length){
       shList.innerHTML = `<div class="text-zinc-500">No shows.</div>`;
@@ -250,25 +327,55 @@ async function pickMovie(m){
       const when = s.start_time ? new Date(s.start_time).toLocaleString() : `Show ${s.id}`;
       const row = document.createElement("div");
       row.className = "flex items-center justify-between border rounded-lg p-2 bg-zinc-50";
-      row.innerHTML = `<div>${esc(when)}</div><button class="bg-[#f84464] text-white px-3 py-1.5 rounded-lg">Select</button>`;
+      const hot = s.selling_fast ? ` <span class="text-xs font-semibold text-[#f84464]">Selling fast</span>` : "";
+      row.innerHTML = `<div>${esc(when)}${hot} <span data-avail="${esc(s.id)}" class="text-xs text-zinc-500"></span></div><button class="bg-[#f84464] text-white px-3 py-1.5 rounded-lg">Select</button>`;
       row.querySelector("button").onclick = ()=>pickShow(s);
       shList.appendChild(row);
     });
+    if (snap) showAvailability(items.filter(s => s.availability).map(s => ({show_id: s.id, found: true, ...s.availability})));
+    else loadAvailability(items.map(s => s.id));
   }catch{
     shList.innerHTML = `<div class="text-zinc-500">Network error.</div>`;
   }
 }
 
+// one batch request for every listed show instead of a seat map per show
+async function loadAvailability(ids){
+  if (!ids.length) return;
+  try{
+    const r = await http(`/api/cinema/shows/availability/?ids=${ids.slice(0, 100).join(",")}`);
+    if (!r.ok) return;
+    const d = await r.json();
+    showAvailability(d.shows || []);
+  }catch{}
+}
+function showAvailability(list){
+  list.forEach(a=>{
+    const el = shList.querySelector(`[data-avail="${a.show_id}"]`);
+    if (!el || !a.found) return;
+    if (!a.available){ el.textContent = "• Sold out"; el.className = "text-xs text-zinc-500"; }
+    else if (a.filling_fast){ el.textContent = `• Filling fast (${a.available} left)`; el.className = "text-xs text-[#f84464]"; }
+    else { el.textContent = `• ${a.available} seats available`; }
+  });
+}
+
 async function pickShow(s){
   selectedShow = s; selectedSeats.clear(); setPayEnabled();
   bookMsg.textContent = "";
   seatsBox.innerHTML = `<div class="text-zinc-500">Loading seats...</div>`;
   try{
-    const r = await http(`/api/cinema/shows/${s.id}/seats/`);
+    const r = await http(`/api/cinema/shows/${s.id}/seats/?compact=1`);
     if (!r.ok){ seatsBox.innerHTML = `<div class="text-zinc-500">Failed to load seats.</div>`; return; }
-    const items = await r.json(); // [{number, available}]
-    seatMap = (Array.isArray(items) ? items : []).slice().sort((a,b)=>(Number(a.number||0) - Number(b.number||0)));
+    const items = decodeSeatMap(await r.json()); // [{number, available}]
+    seatMap = items.slice().sort((a,b)=>(Number(a.number||0) - Number(b.number||0)));
     renderSeatsGrid();
+    if (seatMap.length && seatMap.every(x => !x.available)){
+      const btn = document.createElement("button");
+      btn.className = "col-span-full mt-2 text-sm text-[#f84464] underline";
+      btn.textContent = "Sold out: join the waitlist";
+      btn.onclick = joinWaitlist;
+      seatsBox.appendChild(btn);
+    }
   }catch{
     seatsBox.innerHTML = `<div class="text-zinc-500">Network error.</div>`;
   }
@@ -284,13 +391,14 @@ payBtn.onclick = async () => {
   bookMsg.textContent = `Booking ${numbers.length} seat(s)...`;
   payBtn.disabled = true;
 
-  let okCount = 0, conflicts = 0, failures = 0, lastErr = "";
+  let okCount = 0, queued = 0, conflicts = 0, failures = 0, lastErr = "";
   for (const num of numbers){
     const r = await http(`/api/cinema/bookings/`, {
       method:"POST",
       body: JSON.stringify({ show_id: selectedShow.id, seat_number: num })
     });
     if (r.status === 409) { conflicts++; continue; }
+    if (r.status === 202) { queued++; continue; }   // degraded mode: confirmed once the system recovers
     if (r.ok) { okCount++; }
     else { failures++; try{ lastErr = (await r.text()) || `HTTP ${r.status}`; }catch{} }
   }
@@ -302,11 +410,43 @@ payBtn.onclick = async () => {
 
   const out = [];
   if (okCount) out.push(`Confirmed: ${okCount}`);
+  if (queued) out.push(`Queued (pending confirmation): ${queued}`);
   if (conflicts) out.push(`Already taken: ${conflicts}`);
   if (failures) out.push(`Failed: ${failures}${lastErr ? " ("+lastErr+")" : ""}`);
   bookMsg.textContent = out.join(" • ") || "No changes";
 };
 
+// ===== Ticket: server renders once, we open the cached (content-addressed) SVG =====
+async function openTicket(id){
+  try{
+    const r = await http(`/api/cinema/bookings/${id}/ticket/`);
+    if (!r.ok){ alert("Ticket not available"); return; }
+    const d = await r.json();
+    if (d.svg) window.open(d.svg, "_blank");
+  }catch{ alert("Network error"); }
+}
+
+// ===== Cancel / confirm a waitlist hold =====
+async function bookingAction(id, act){
+  if (act === "cancel" && !confirm("Cancel this booking?")) return;
+  try{
+    const r = await http(`/api/cinema/bookings/${id}/${act}/`, { method: "POST" });
+    if (r.status === 410) alert("This hold has expired");
+    else if (!r.ok) alert(`Could not ${act} booking`);
+  }catch{ alert("Network error"); }
+  await loadHistory();
+  if (selectedShow) await pickShow(selectedShow);
+}
+
+async function joinWaitlist(){
+  if (!isLoggedIn()) { alert("Please sign in first."); return; }
+  try{
+    const r = await http(`/api/cinema/shows/${selectedShow.id}/waitlist/`, { method: "POST", body: JSON.stringify({ seats: 1 }) });
+    const d = await r.json().catch(()=>({}));
+    bookMsg.textContent = r.ok ? `On the waitlist (position ${d.position}). A freed seat will be held for you.` : (d.detail || "Could not join the waitlist");
+  }catch{ bookMsg.textContent = "Network error"; }
+}
+
 // ===== Booking history =====
 async function loadHistory(){
   historyBox.innerHTML = `<div class="text-zinc-500">Loading...</div>`;
@@ -327,11 +467,23 @@ async function loadHistory(){
       const card = document.createElement("div");
       card.className = "border rounded-lg p-3 bg-zinc-50";
       card.innerHTML = `
-        <div class="font-semibold">Booking #${esc(b.id)}</div>
+        <div class="font-semibold">${b.id ? `Booking #${esc(b.id)}` : "Pending booking"}${b.status && b.status !== "CONFIRMED" ? ` <span class="text-xs text-[#f84464]">${esc(b.status)}</span>` : ""}</div>
         <div class="text-sm text-zinc-700">${esc(title)}</div>
         <div class="text-sm text-zinc-600">${esc(when)}</div>
         <div class="text-sm text-zinc-600">Seat: ${esc(seat)}</div>
+        ${b.reason ? `<div class="text-xs text-zinc-500">${esc(b.reason)}</div>` : ""}
+        ${b.hold_until ? `<div class="text-xs text-zinc-500">Seat offered from the waitlist, held until ${esc(new Date(b.hold_until).toLocaleTimeString())}</div>` : ""}
+        <div class="mt-2 flex gap-3 text-sm">
+          ${b.id && !b.archived && b.status === "CONFIRMED" ? `<button data-act="ticket" class="text-[#f84464] underline">View ticket</button>
+            <button data-act="cancel" class="text-zinc-600 underline">Cancel</button>` : ""}
+          ${b.id && b.status === "PENDING" && b.hold_until ? `<button data-act="confirm" class="text-[#f84464] underline">Confirm</button>
+            <button data-act="cancel" class="text-zinc-600 underline">Decline</button>` : ""}
+        </div>
       `;
+      const on = (act, fn) => { const el = card.querySelector(`[data-act="${act}"]`); if (el) el.onclick = fn; };
+      on("ticket", ()=>openTicket(b.id));
+      on("cancel", ()=>bookingAction(b.id, "cancel"));
+      on("confirm", ()=>bookingAction(b.id, "confirm"));
       wrap.appendChild(card);
     });
     historyBox.innerHTML = "";
@@ -355,4 +507,15 @@ async function loadHistory(){
       items.slice(-10).reverse().forEach(m=>pre.appendChild(movieCard(m)));
     }
   }catch{}
+
+  // "trending now" replaces the first rail once there are recent sales
+  try{
+    const r = await http("/api/cinema/trending/?limit=10");
+    const d = r.ok ? await r.json() : null;
+    if (d && d.movies && d.movies.length){
+      rec.innerHTML = "";
+      d.movies.forEach(m=>rec.appendChild(movieCard(m)));
+      rec.previousElementSibling.textContent = "Trending Now";
+    }
+  }catch{}
 })();